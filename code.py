@@ -1,25 +1,30 @@
 import time
+import gc
+from boot_sequence import BootSequence
+
+# Startup runs in timed stages. Those up to the first frame (the Radiation
+# tab with the Geiger count running) run here; the network, SD log, sensors
+# and other tabs are queued for the "boot" task and load between the Geiger,
+# touch and display tasks. The timings are printed when the last one is done.
+boot = BootSequence()
+boot.begin("imports")
 import sys
 import board
 import displayio
-import busio
-import digitalio
-from adafruit_bitmap_font import bitmap_font
-from adafruit_display_text.label import Label
-from adafruit_display_shapes.rect import Rect
-import adafruit_touchscreen
-from adafruit_pyportal import PyPortal
-import adafruit_ltr390
-from adafruit_button import Button
-import json
-import adafruit_requests as requests
 import terminalio
-import gc
-
-try:
-    from secrets import secrets
-except ImportError:
-    raise
+from scheduler import Scheduler
+from dose_accumulator import DoseAccumulator, span_text
+from view_model import ViewModel
+from view_manager import ViewManager
+from touch_router import TouchRouter, accelerated
+from calibration import AutoCalibration, CalibrationStore
+from baked_font import load_font
+from audio_queue import AudioService
+from chrome import Chrome
+from widgets import (add_centred_label, add_label, build_calibration_window, draw_kp_bars,
+                     draw_sparkline, kp_bar_grid, palette_grid, solid_rect)
+from instrumentation import Instrumentation
+import pyportal_hal as hal
 
 cwd = ("/" + __file__).rsplit('/', 1)[0]
 sys.path.append(cwd)
@@ -27,269 +32,274 @@ sys.path.append(cwd)
 # NOAA endpoints for solar wind data (for telemetry)
 SOLAR_DATA_SOURCE = "https://services.swpc.noaa.gov/products/solar-wind/plasma-5-minute.json"
 SOLAR_MAG_DATA_SOURCE = "https://services.swpc.noaa.gov/products/solar-wind/mag-5-minute.json"
-
-pyportal = PyPortal()
+# Longer feeds that fill the sparkline after boot or a gap
+SOLAR_HISTORY_SOURCE = "https://services.swpc.noaa.gov/products/solar-wind/plasma-6-hour.json"
+SOLAR_MAG_HISTORY_SOURCE = "https://services.swpc.noaa.gov/products/solar-wind/mag-6-hour.json"
+SOLAR_HISTORY_SECONDS = 6 * 3600
+KP_DATA_SOURCE = "https://services.swpc.noaa.gov/products/noaa-planetary-k-index.json"
+KP_HISTORY_LENGTH = 8  # 3 hour values, so the last 24 hours
+KP_HEAP_BUDGET = 8192  # bytes a Kp refresh may use before it is aborted
+
+# Loop, heap and per-task diagnostics. Off unless INSTRUMENT is set or the
+# hidden Diag tab is opened (three taps on the top-left corner), then dumped
+# to the serial console every DIAG_DUMP_INTERVAL seconds.
+INSTRUMENT = False
+DIAG_DUMP_INTERVAL = 60
+DIAG_LINES = 12  # lines of text that fit the Diag tab
+instrumentation = Instrumentation(enabled=INSTRUMENT)
 
 # Global variables
-button_active = True
-last_connection_attempt = 0
-CONNECTION_COOLDOWN = 5
-
 # Calibration globals
 calibration_active = False
-calibration_group = None  # Will be built once at startup.
+calibration_group = None  # Built when first opened.
 calibration_elements = {}
+autocal = None  # AutoCalibration while AUTO is on
 
 # Pocket Geiger Setup
+boot.begin("geiger")
 SIGNAL_PIN = board.D3
 HISTORY_LENGTH = 60
 HISTORY_UNIT = 60  # seconds (adjustable)
 K_ALPHA = 53.032  # Calibration constant
+K_STEP = 0.1
+UNIT_STEP = 0.5  # seconds
+AUTO_REFERENCE_STEP = 0.005  # µSv/h
+auto_reference = 0.1  # µSv/h at the detector for auto-cal, kept between runs
+
+# Calibration profiles (K and HISTORY_UNIT) are kept in microcontroller.nvm,
+# see lib/calibration.py. The active one replaces the defaults above before
+# the history is sized. The calibration window edits it, PROFILE switches to
+# the next one and SAVE stores them all.
+calibration_store = CalibrationStore(hal.open_nvm(), K_ALPHA, HISTORY_UNIT)
+calibration_store.load()
+K_ALPHA = calibration_store.profile[1]
+HISTORY_UNIT = calibration_store.profile[2]
 
-radiation_count = 0
-count_history = [0] * HISTORY_LENGTH
-history_index = 0
-history_length = 0
 last_history_time = time.monotonic()
+dose = DoseAccumulator(HISTORY_LENGTH, HISTORY_UNIT, K_ALPHA)
 
-# Fonts
-font_greek = bitmap_font.load_font("fonts/Greek03-Regular-25.bdf")
-font_trek = bitmap_font.load_font("fonts/LeagueSpartan-Bold-16.bdf")
-
-last_button_flash = 0
-BUTTON_FLASH_INTERVAL = 1.0
-
-# Setup digital input for Geiger counter
+# Setup pulse capture for Geiger counter (hardware edge counting if available)
 try:
-    signal_pin = digitalio.DigitalInOut(SIGNAL_PIN)
-    signal_pin.direction = digitalio.Direction.INPUT
-    signal_pin.pull = digitalio.Pull.UP
+    pulse_counter = hal.open_geiger(SIGNAL_PIN)
     geiger_found = True
 except Exception:
     geiger_found = False
 
-# UV Sensor setup
-try:
-    i2c = busio.I2C(board.SCL, board.SDA)
-    ltr = adafruit_ltr390.LTR390(i2c)
-    ltr.integration_time = 200
-    ltr.gain = 1
-    uv_sensor_found = True
-except Exception:
-    uv_sensor_found = False
+# Data log on the SD card (or CIRCUITPY if boot.py made it writable). The
+# last hour of counts is replayed so a reload does not reset the CPM. That
+# needs the RTC to have kept running, which it does over a soft reload but
+# not a hard reset, see RadiationLog.replay.
+LOG_FILE = "radiation.log"
+LOG_REPLAY_SECONDS = 3600
+LOG_UV_INTERVAL = 60  # seconds between logged UV readings
+UV_SAMPLE_PERIOD = 0.25  # seconds between UV sensor samples
 
 # Network Connection
-def try_connect_wifi():
-    try:
-        if pyportal.network._wifi.is_connected:
-            return True
-        pyportal.network.connect()
-        start = time.monotonic()
-        timeout = 10  # seconds
-        while not pyportal.network._wifi.is_connected:
-            if time.monotonic() - start > timeout:
-                return False
-            time.sleep(0.5)
-        return True
-    except Exception:
-        return False
+WIFI_CONNECT_TIMEOUT = 10  # seconds
+
+# Opened by the boot stages further down; None until then.
+pyportal = None
+audio = None
+radiation_log = None
+wifi = None
+uv_sampler = None
+uv_sensor_found = False
+
+# Display Setup
+boot.begin("display")
+display = hal.open_display()
 
-# Display & Sound Setup
-display = board.DISPLAY
+# Fonts (baked glyph subsets from tools/bake_fonts.py, BDF if not baked)
+font_greek = load_font("fonts/Greek03-Regular-25.bdf")
+font_trek = load_font("fonts/LeagueSpartan-Bold-16.bdf")
 
-# Create the main splash group and set its background.
+last_button_flash = 0
+BUTTON_FLASH_INTERVAL = 1.0
+
+# Create the main splash group.
 splash = displayio.Group()
 display.root_group = splash
-# This background rect provides a black background for the display.
-bg_rect = Rect(0, 0, 320, 240, fill=0x000000)
-splash.append(bg_rect)
 
 # Create a group for the normal UI elements.
 normal_ui = displayio.Group()
 splash.append(normal_ui)
 
-# Panels and Top Bar
-left_panel = Rect(0, 0, 50, 240, fill=0x165FC5)
-normal_ui.append(left_panel)
-right_panel = Rect(315, 1, 10, 240, fill=0xFDCD06)
-normal_ui.append(right_panel)
-top_panel = Rect(0, 1, 320, 35, fill=0x165FC5)
-normal_ui.append(top_panel)
-
-# Tab Buttons (Radiation, UV, Probes)
-buttons = []
-button_radiation = Button(x=55, y=200, width=70, height=30,
-                          label="γ", label_font=font_greek, fill_color=0xB9C92F)
-button_uv = Button(x=152, y=200, width=70, height=30,
-                   label="Δ", label_font=font_greek, fill_color=0xBF0F0F)
-button_probes = Button(x=242, y=200, width=70, height=30,
-                       label="Probes", label_font=font_trek, fill_color=0xBF0F0F)
-buttons.extend([button_radiation, button_uv, button_probes])
-for b in buttons:
-    normal_ui.append(b)
+# Side panels, top bar and tab bar are one tile map (see lib/chrome.py), so
+# every rectangle drawn in it is on its 5 pixel grid. Against the Rect and
+# Button layout this replaced, the UV and Probes tabs moved 2 px left (from
+# x=152 and 242), the top bar and right panel start at y=0 (not 1), and the
+# right panel is 5 px wide: it was a 10 px Rect at x=315, of which only 5 px
+# were on screen. The boxes of each tab are drawn in its group at their old
+# places. The black background shows wherever nothing else is drawn.
+BLUE = 0x165FC5
+GOLD = 0xFDCD06
+GREEN = 0xB9C92F
+RED = 0xBF0F0F
+NAVY = 0x000022
+TEAL = 0x11709F
+TAB_RECTS = ((55, 200, 70, 30), (150, 200, 70, 30), (240, 200, 70, 30))  # x, y, width, height
+CAL_RECT = (50, 35, 40, 30)
+CONNECT_RECT = (165, 160, 90, 30)
+SOLAR_FRAME_RECT = (52, 45, 225, 150)
+chrome = Chrome((0x000000, BLUE, GOLD, GREEN, RED), RED, GREEN)
+chrome.fill(0, 0, 50, 240, BLUE)  # left panel
+chrome.fill(315, 0, 5, 240, GOLD)  # right panel
+chrome.fill(0, 0, 320, 35, BLUE)  # top bar
+normal_ui.append(chrome.grid)
+
+# Tabs (Radiation, UV, Probes)
+TAB_NAMES = ("Radiation", "UV", "Probes")
+for tab_name, tab_rect in zip(TAB_NAMES, TAB_RECTS):
+    chrome.add_tab(tab_name, *tab_rect)
+add_centred_label(normal_ui, None, font_greek, "γ", 0x000000, *TAB_RECTS[0])
+add_centred_label(normal_ui, None, font_greek, "Δ", 0x000000, *TAB_RECTS[1])
+add_centred_label(normal_ui, None, font_trek, "Probes", 0x000000, *TAB_RECTS[2])
 
 # Create a group for the content area (tab contents)
 content_group = displayio.Group()
 normal_ui.append(content_group)
 
-view_radiation = displayio.Group()
-radiation_label = Label(font=font_trek, text="CPM: --", color=0x00FFFF, scale=1)
-radiation_label.x = 70
-radiation_label.y = 80
-
-# Header for Radiation Tab
-top_left_label = Label(font=font_trek, text="GAMMA", color=0xFFFFFF, scale=1)
-top_left_label.x = 10   # Adjust x coordinate as needed
-top_left_label.y = 20   # Adjust y coordinate as needed
-view_radiation.append(top_left_label)
-view_radiation.append(radiation_label)
-dose_label = Label(font=font_trek, text="DOSE: -- µSv/h", color=0xFFFF00, scale=1)
-dose_label.x = 70
-dose_label.y = 115
-view_radiation.append(dose_label)
-sensor_warning_label = Label(font=font_trek, text="", color=0xFF0000, scale=1)
-sensor_warning_label.x = 70
-sensor_warning_label.y = 145
-view_radiation.append(sensor_warning_label)
-button_cal = Button(x=50, y=35, width=40, height=30,
-                    label="C", label_font=font_trek, fill_color=0xBF0F0F)
-view_radiation.append(button_cal)
+# Widgets are written through bindings, which skip unchanged values. A
+# binding keeps its value while its tab is torn down and restores it when the
+# tab is rebuilt.
+view_model = ViewModel()
+radiation_text = view_model.bind(None)
+dose_text = view_model.bind(None)
+sensor_warning_text = view_model.bind(None)
+dose_range_text = view_model.bind(None)
+cpm_windows_text = view_model.bind(None)
+uv_index_text = view_model.bind(None, min_interval=0.5)
+uv_intensity_text = view_model.bind(None, min_interval=0.5)
+no_uv_text = view_model.bind(None)
+uv_range_text = view_model.bind(None, min_interval=0.5)
+probes_connection_text = view_model.bind(None, min_interval=1.0)
+probes_connection_color = view_model.bind(None, "color", min_interval=1.0)
+wind_speed_text = view_model.bind(None)
+wind_density_text = view_model.bind(None)
+mag_field_text = view_model.bind(None)
+kp_text = view_model.bind(None)
+kp_color = view_model.bind(None, "color")
+status_text = view_model.bind(None)
+status_color = view_model.bind(None, "color")
+connect_label = view_model.bind(None)
+diag_text = view_model.bind(None, min_interval=1.0)
+
+# Tabs are built on first show by the view manager. With VIEW_CACHE they stay
+# built until free memory drops under VIEW_LOW_MEMORY; without it only the
+# shown tab is resident.
+VIEW_CACHE = True
+VIEW_LOW_MEMORY = 24 * 1024
+views = ViewManager(content_group, cache=VIEW_CACHE, low_memory=VIEW_LOW_MEMORY)
+
+def build_radiation_view():
+    group = displayio.Group()
+    # Header for Radiation Tab
+    add_label(group, None, font_trek, "GAMMA", 0xFFFFFF, 10, 20)
+    add_label(group, radiation_text, font_trek, "CPM: --", 0x00FFFF, 70, 80)
+    add_label(group, dose_text, font_trek, "DOSE: -- µSv/h", 0xFFFF00, 70, 115)
+    add_label(group, sensor_warning_text, font_trek, "", 0xFF0000, 70, 145)
+    add_label(group, dose_range_text, terminalio.FONT, "", 0xFFFF00, 70, 165)
+    add_label(group, cpm_windows_text, terminalio.FONT, "", 0x00FFFF, 70, 180)
+    # Calibrate button
+    group.append(solid_rect(*CAL_RECT, RED))
+    add_centred_label(group, None, font_trek, "C", 0x000000, *CAL_RECT)
+    return group
 
 # UV Sensor Tab UI
-view_uv = displayio.Group()
-top_left_label_uv = Label(font=font_trek, text="ULTRA VIOLET", color=0xFFFFFF, scale=1)
-top_left_label_uv.x = 10   # Adjust x coordinate as desired
-top_left_label_uv.y = 20   # Adjust y coordinate as desired
-view_uv.append(top_left_label_uv)
-
-uv_index_label = Label(font=font_trek, text="UV Index: --", color=0x00FFFF, scale=1)
-uv_index_label.x = 70
-uv_index_label.y = 80
-view_uv.append(uv_index_label)
-uv_intensity_label = Label(font=font_trek, text="UV I: --", color=0xFFFF00, scale=1)
-uv_intensity_label.x = 70
-uv_intensity_label.y = 115
-view_uv.append(uv_intensity_label)
-no_uv_label = Label(font=font_trek, text="Sensor offline", color=0xFF0000, scale=1)
-no_uv_label.x = 70
-no_uv_label.y = 150
-view_uv.append(no_uv_label)
+def build_uv_view():
+    group = displayio.Group()
+    add_label(group, None, font_trek, "ULTRA VIOLET", 0xFFFFFF, 10, 20)
+    add_label(group, uv_index_text, font_trek, "UV Index: --", 0x00FFFF, 70, 80)
+    add_label(group, uv_intensity_text, font_trek, "UV I: --", 0xFFFF00, 70, 115)
+    add_label(group, no_uv_text, font_trek, "Sensor offline", 0xFF0000, 70, 150)
+    add_label(group, uv_range_text, terminalio.FONT, "", 0x00FFFF, 70, 175)
+    return group
+
+# Kp history bars, one palette-indexed bitmap instead of a Rect per bar.
+KP_BAR_WIDTH = 10
+KP_BAR_GAP = 2
+KP_BAR_HEIGHT = 18
+kp_bitmap = None
+
+# Solar wind sparkline along the top of the frame: speed, density and Bz, each
+# scaled to its own range, over the last SOLAR_HISTORY_SECONDS.
+SPARK_X = 125
+SPARK_Y = 46
+SPARK_WIDTH = 150
+SPARK_HEIGHT = 12
+SPARK_COLORS = (0x000022, 0x00FF00, 0xFFFF00, 0x00FFFF)
+SPEED, DENSITY, BZ = range(3)
+spark_bitmap = None
 
 # Probes Tab UI
-view_probes = displayio.Group()
-probes_status_label = Label(font=font_trek, text="Network Status:", color=0x00FFFF)
-probes_status_label.x = 70
-probes_status_label.y = 80
-view_probes.append(probes_status_label)
-probes_connection_label = Label(font=font_trek, text="Not Connected", color=0xFF0000)
-probes_connection_label.x = 70
-probes_connection_label.y = 100
-view_probes.append(probes_connection_label)
-solar_frame = Rect(52, 45, 225, 150, fill=0x000022)
-view_probes.append(solar_frame)
-solar_header = Label(font=font_trek, text="SOLAR WEATHER", color=0xFFFFFF, scale=1)
-solar_header.x = 10
-solar_header.y = 20
-view_probes.append(solar_header)
-wind_speed = Label(font=terminalio.FONT, text="SPEED: - km/s", color=0x00FF00, scale=2)
-wind_speed.x = 60
-wind_speed.y = 70
-view_probes.append(wind_speed)
-wind_density = Label(font=terminalio.FONT, text="DENSITY: - p/cm³", color=0x00FF00, scale=2)
-wind_density.x = 60
-wind_density.y = 100
-view_probes.append(wind_density)
-mag_field = Label(font=terminalio.FONT, text="MAG FIELD: - nT", color=0x00FF00, scale=2)
-mag_field.x = 60
-mag_field.y = 130
-view_probes.append(mag_field)
-status_label = Label(font=terminalio.FONT, text="", color=0xFFFF00)
-status_label.x = 60
-status_label.y = 165
-view_probes.append(status_label)
-connect_button = Button(x=165, y=160, width=90, height=30,
-                        label="CONNECT", label_font=terminalio.FONT,
-                        label_color=0xFDCD06, fill_color=0x11709F)
-view_probes.append(connect_button)
-
-# Set up the touchscreen.
-ts = adafruit_touchscreen.Touchscreen(
-    board.TOUCH_XL, board.TOUCH_XR, board.TOUCH_YD, board.TOUCH_YU,
-    calibration=((5200, 59000), (5800, 57000)),
-    size=(display.width, display.height)
-)
+def build_probes_view():
+    global kp_bitmap, spark_bitmap
+    group = displayio.Group()
+    # Solar frame, behind everything else on the tab
+    group.append(solid_rect(*SOLAR_FRAME_RECT, NAVY))
+    add_label(group, None, font_trek, "Network Status:", 0x00FFFF, 70, 80)
+    add_label(group, probes_connection_text, font_trek, "Not Connected", 0xFF0000, 70, 100)
+    probes_connection_color.attach(group[-1])
+    spark_bitmap, spark_grid = palette_grid(SPARK_WIDTH, SPARK_HEIGHT, SPARK_COLORS,
+                                            SPARK_X, SPARK_Y)
+    group.append(spark_grid)
+    redraw_sparkline()
+    add_label(group, None, font_trek, "SOLAR WEATHER", 0xFFFFFF, 10, 20)
+    add_label(group, wind_speed_text, terminalio.FONT, "SPEED: - km/s", 0x00FF00, 60, 70, 2)
+    add_label(group, wind_density_text, terminalio.FONT, "DENSITY: - p/cm³", 0x00FF00, 60, 100, 2)
+    add_label(group, mag_field_text, terminalio.FONT, "MAG FIELD: - nT", 0x00FF00, 60, 130, 2)
+    add_label(group, kp_text, terminalio.FONT, "Kp: -", 0x00FF00, 60, 150)
+    kp_color.attach(group[-1])
+    kp_bitmap, kp_bars = kp_bar_grid(KP_HISTORY_LENGTH, KP_BAR_WIDTH, KP_BAR_GAP, KP_BAR_HEIGHT,
+                                     60, 175)
+    group.append(kp_bars)
+    redraw_kp_bars()
+    add_label(group, status_text, terminalio.FONT, "", 0xFFFF00, 60, 165)
+    status_color.attach(group[-1])
+    group.append(solid_rect(*CONNECT_RECT, TEAL))
+    add_centred_label(group, connect_label, terminalio.FONT, "CONNECT", GOLD, *CONNECT_RECT)
+    return group
+
+def release_probes_view():
+    # Drop the bitmaps with the tab, so they are freed and not redrawn.
+    global kp_bitmap, spark_bitmap
+    kp_bitmap = None
+    spark_bitmap = None
+
+# Diagnostics Tab UI (hidden, see INSTRUMENT)
+def build_diag_view():
+    group = displayio.Group()
+    add_label(group, None, font_trek, "DIAGNOSTICS", 0xFFFFFF, 10, 20)
+    add_label(group, diag_text, terminalio.FONT, "", 0x00FF00, 55, 48)
+    return group
+
+views.add("Radiation", build_radiation_view,
+          (radiation_text, dose_text, sensor_warning_text, dose_range_text, cpm_windows_text))
+views.add("UV", build_uv_view, (uv_index_text, uv_intensity_text, no_uv_text, uv_range_text))
+views.add("Probes", build_probes_view,
+          (probes_connection_text, probes_connection_color, wind_speed_text, wind_density_text,
+           mag_field_text, kp_text, kp_color, status_text, status_color, connect_label),
+          release_probes_view)
+views.add("Diag", build_diag_view, (diag_text,))
+
+# Set up the touchscreen. It is read once per touch task run by the router,
+# which debounces presses and dispatches them to the shown view's regions.
+ts = hal.open_touchscreen(display)
 display.rotation = 0
+router = TouchRouter(lambda: ts.touch_point)
 
 # --- Calibration Window ---
-def create_calibration_button(x, y, width, height, text, fill_color=0xBF0F0F, text_color=0xFFFFFF, scale=1):
-    grp = displayio.Group()
-    rect = Rect(x, y, width, height, fill=fill_color)
-    grp.append(rect)
-    label = Label(font=terminalio.FONT, text=text, color=text_color, scale=scale)
-    label.x = x + 3
-    label.y = y + 3
-    grp.append(label)
-    return {"group": grp, "x": x, "y": y, "width": width, "height": height, "label": label}
-
-def build_calibration_window():
-    grp = displayio.Group()
-    title_label = Label(font=terminalio.FONT, text="Calibration", color=0x00FFFF, scale=2)
-    title_label.x = 50
-    title_label.y = 20
-    grp.append(title_label)
-    
-    label_k = Label(font=terminalio.FONT, text="K: {:.3f}".format(K_ALPHA), color=0xFFFFFF, scale=2)
-    label_k.x = 60
-    label_k.y = 50
-    grp.append(label_k)
-    
-    button_k_minus = create_calibration_button(70, 65, 30, 20, "-", fill_color=0xBF0F0F, text_color=0xFFFFFF, scale=2)
-    button_k_plus  = create_calibration_button(140, 65, 30, 20, "+", fill_color=0xB9C92F, text_color=0x11709F, scale=2)
-    grp.append(button_k_minus["group"])
-    grp.append(button_k_plus["group"])
-    
-    button_k_minus["label"].x = button_k_minus["x"] + 10
-    button_k_minus["label"].y = button_k_minus["y"] + 9
-    button_k_plus["label"].x  = button_k_plus["x"] + 10
-    button_k_plus["label"].y  = button_k_plus["y"] + 9
-    
-    label_t = Label(font=terminalio.FONT, text="Time: {}s".format(HISTORY_UNIT), color=0xFFFFFF, scale=2)
-    label_t.x = 60
-    label_t.y = 105
-    grp.append(label_t)
-    
-    button_t_minus = create_calibration_button(70, 120, 30, 20, "-", fill_color=0xBF0F0F, text_color=0xFFFFFF, scale=2)
-    button_t_plus  = create_calibration_button(140, 120, 30, 20, "+", fill_color=0xB9C92F, text_color=0x11709F, scale=2)
-    grp.append(button_t_minus["group"])
-    grp.append(button_t_plus["group"])
-    
-    button_t_minus["label"].x = button_t_minus["x"] + 10
-    button_t_minus["label"].y = button_t_minus["y"] + 9
-    button_t_plus["label"].x = button_t_plus["x"] + 10
-    button_t_plus["label"].y = button_t_plus["y"] + 9
-    
-    button_done = create_calibration_button(140, 160, 70, 30, "DONE", fill_color=0x11709F, scale=2)
-    grp.append(button_done["group"])
-    button_done["label"].x = button_done["x"] + 15
-    button_done["label"].y = button_done["y"] + 15
-    
-    elements = {
-        "label_k": label_k,
-        "button_k_minus": button_k_minus,
-        "button_k_plus": button_k_plus,
-        "label_t": label_t,
-        "button_t_minus": button_t_minus,
-        "button_t_plus": button_t_plus,
-        "button_done": button_done
-    }
-    return grp, elements
-
-# Build the calibration window once at startup.
-calibration_group, calibration_elements = build_calibration_window()
-
 # Show/hide the calibration window by swapping the normal UI and calibration UI.
+# The window is built when first opened and, like a tab, dropped on close
+# when the view cache is off or memory is low.
 def show_calibration_window():
-    global calibration_active
+    global calibration_active, calibration_group, calibration_elements
+    if calibration_group is None:
+        calibration_group, calibration_elements = build_calibration_window(
+            K_ALPHA, HISTORY_UNIT, calibration_store.profile[0])
+        route_calibration()
+    show_calibration()
+    router.active = ("calibration",)
     if normal_ui in splash:
         splash.remove(normal_ui)
     if calibration_group not in splash:
@@ -298,235 +308,576 @@ def show_calibration_window():
     gc.collect()
 
 def hide_calibration_window():
-    global calibration_active
+    global calibration_active, calibration_group, calibration_elements
     if calibration_group in splash:
         splash.remove(calibration_group)
     if normal_ui not in splash:
         splash.append(normal_ui)
     calibration_active = False
+    router.active = ("main", view_live)
+    if not views.cache or views.memory_low():
+        calibration_group = None
+        calibration_elements = {}
     gc.collect()
 
 def calibrate_pocketgeiger():
     show_calibration_window()
 
-def in_button(touch, button):
-    x, y = touch
-    bx = button["x"]
-    by = button["y"]
-    bw = button["width"]
-    bh = button["height"]
-    return (bx <= x <= bx + bw) and (by <= y <= by + bh)
-
 # --- Radiation Processing ---
 def process_radiation():
-    global last_history_time, radiation_count, history_index, history_length
+    global last_history_time
     current_time = time.monotonic()
-    if geiger_found and not signal_pin.value:
-        radiation_count += 1
-    if current_time - last_history_time >= HISTORY_UNIT:
+    if geiger_found:
+        pulse_counter.poll()
+    elapsed = current_time - last_history_time
+    if elapsed >= HISTORY_UNIT:
         last_history_time = current_time
-        count_history[history_index] = radiation_count
-        radiation_count = 0
-        history_index = (history_index + 1) % HISTORY_LENGTH
-        history_length = min(history_length + 1, HISTORY_LENGTH)
+        count = pulse_counter.take() if geiger_found else 0
+        dose.add(count)
+        if geiger_found and radiation_log is not None:
+            radiation_log.log_counts(count, dose.usvh(), HISTORY_UNIT)
+        if geiger_found and autocal is not None:
+            # The pulses were counted over the time that actually passed,
+            # which is longer than HISTORY_UNIT when this run is late.
+            autocal.add(count, elapsed)
+            if calibration_active:
+                show_autocal()
 
 def calculate_cpm():
-    return (sum(count_history) * 60) / (history_length * HISTORY_UNIT) if history_length else 0
+    return dose.cpm()
 
 def calculate_uSvh():
-    return calculate_cpm() / K_ALPHA if geiger_found else 0
+    return dose.usvh() if geiger_found else 0
 
 # --- Update Display ---
 def update_display():
     if view_live == "Radiation":
-        if sum(count_history) == 0:
-            radiation_label.text = "CPM: --"
-            dose_label.text = "DOSE: -- µSv/h"
-            sensor_warning_label.text = "Sensor offline"
+        if dose.total == 0:
+            radiation_text.set("CPM: --")
+            dose_text.set("DOSE: -- µSv/h")
+            sensor_warning_text.set("Sensor offline")
+            dose_range_text.set("")
+            cpm_windows_text.set("")
         else:
-            radiation_label.text = f"CPM: {calculate_cpm():.1f}"
-            dose_label.text = f"DOSE: {calculate_uSvh():.3f} µSv/h"
-            sensor_warning_label.text = ""
+            radiation_text.set(f"CPM: {calculate_cpm():.1f}")
+            dose_text.set(f"DOSE: {calculate_uSvh():.3f} µSv/h")
+            sensor_warning_text.set("")
+            low, high = dose.usvh_interval()
+            dose_range_text.set(f"95%: {low:.3f}-{high:.3f}")
+            # A short unit caps the windows at the HISTORY_LENGTH slots there
+            # are, so they are labelled with the span they cover.
+            cpm_windows_text.set(f"{span_text(dose.window_seconds(1))} {dose.window_cpm(1):.1f} "
+                                 f"{span_text(dose.window_seconds(2))} {dose.window_cpm(2):.1f} "
+                                 f"PK {dose.peak_cpm:.1f}")
     elif view_live == "UV":
         if uv_sensor_found:
-            uv_index_label.text = f"UV Index: {ltr.uvi:.2f}"
-            uv_intensity_label.text = f"UV I: {ltr.lux:.2f}"
-            no_uv_label.text = ""
+            # Cached values from the background sampler, no I2C here.
+            uvi = uv_sampler.uvi
+            lux = uv_sampler.lux
+            uv_index_text.set("UV Index: --" if uvi is None else f"UV Index: {uvi:.2f}")
+            uv_intensity_text.set("UV I: --" if lux is None else f"UV I: {lux:.2f}")
+            no_uv_text.set("")
+            if uvi is not None:
+                low, high = uv_sampler.uvi_range
+                uv_range_text.set(f"MIN {low:.2f} MAX {high:.2f}")
         else:
-            uv_index_label.text = "UV Index: --"
-            uv_intensity_label.text = "UV I: --"
-            no_uv_label.text = "Sensor offline"
+            uv_index_text.set("UV Index: --")
+            uv_intensity_text.set("UV I: --")
+            no_uv_text.set("Sensor offline" if boot.done else "Starting...")
     elif view_live == "Probes":
-        try:
-            if pyportal.network._wifi.is_connected:
-                probes_connection_label.text = "Connected"
-                probes_connection_label.color = 0x00FF00
-                connect_button.fill_color = 0x11709F
-            else:
-                probes_connection_label.text = "Not Connected"
-                probes_connection_label.color = 0xFF0000
-                connect_button.fill_color = 0x11709F
-        except Exception:
-            probes_connection_label.text = "Status Unknown"
-            probes_connection_label.color = 0xFF0000
-            connect_button.fill_color = 0x11709F
+        state = wifi.state if wifi is not None else None
+        if state is None:
+            probes_connection_text.set("No Wi-Fi" if boot.done else "Starting...")
+            probes_connection_color.set(0xFFFF00)
+        elif state == CONNECTED:
+            probes_connection_text.set("Connected" if wifi.rssi is None
+                                       else f"Connected {wifi.rssi} dBm")
+            probes_connection_color.set(0x00FF00)
+        elif state == CONNECTING:
+            probes_connection_text.set("Connecting...")
+            probes_connection_color.set(0xFFFF00)
+        elif state == LOST:
+            probes_connection_text.set("Link lost")
+            probes_connection_color.set(0xFFFF00)
+        elif state == BACKOFF:
+            probes_connection_text.set(f"Retry in {wifi.retry_in:.0f}s")
+            probes_connection_color.set(0xFFFF00)
+        else:
+            probes_connection_text.set("Not Connected")
+            probes_connection_color.set(0xFF0000)
+    elif view_live == "Diag":
+        diag_text.set("\n".join(instrumentation.lines()[:DIAG_LINES]))
+    view_model.flush()
 
-def switch_view(new_view):
-    global view_live
-    pyportal.play_file("/sounds/tab.wav")
-    if content_group:
-        content_group.pop()
-    for view in (view_radiation, view_uv, view_probes):
+# --- Delta Logo ---
+# Loaded on the first tab show and moved to whichever tab is shown.
+delta_logo = None
+delta_parent = None
+
+def load_delta_logo():
+    global delta_logo
+    if delta_logo is None:
         try:
-            view.remove(delta_logo)
+            delta_bitmap = displayio.OnDiskBitmap("/delta.bmp")
+            delta_logo = displayio.TileGrid(delta_bitmap, pixel_shader=delta_bitmap.pixel_shader)
+            delta_logo.x = 272
+            delta_logo.y = 140
         except Exception:
             pass
+    return delta_logo
+
+def show_view(new_view):
+    global view_live, delta_parent
+    if delta_parent is not None:
+        delta_parent.remove(delta_logo)
+        delta_parent = None
+    group = views.show(new_view)
     view_live = new_view
-    if new_view == "Radiation":
-        content_group.append(view_radiation)
-        view_radiation.append(delta_logo)
-        button_radiation.fill_color = 0xB9C92F
-        button_uv.fill_color = 0xBF0F0F
-        button_probes.fill_color = 0xBF0F0F
-    elif new_view == "UV":
-        content_group.append(view_uv)
-        view_uv.append(delta_logo)
-        button_radiation.fill_color = 0xBF0F0F
-        button_uv.fill_color = 0xB9C92F
-        button_probes.fill_color = 0xBF0F0F
-    elif new_view == "Probes":
-        content_group.append(view_probes)
-        view_probes.append(delta_logo)
-        button_radiation.fill_color = 0xBF0F0F
-        button_uv.fill_color = 0xBF0F0F
-        button_probes.fill_color = 0xB9C92F
+    router.active = ("main", new_view)
+    if new_view != "Diag" and load_delta_logo() is not None:
+        group.append(delta_logo)
+        delta_parent = group
+    chrome.show(new_view)
     update_display()
 
-def check_network_status():
-    try:
-        return pyportal.network.check_connectivity()
-    except Exception:
-        return False
+def play(name):
+    # UI sounds start once the portal stage has opened the speaker.
+    if audio is not None:
+        audio.play(name)
 
-# --- Delta Logo ---
-try:
-    delta_bitmap = displayio.OnDiskBitmap("/delta.bmp")
-    delta_logo = displayio.TileGrid(delta_bitmap, pixel_shader=delta_bitmap.pixel_shader)
-    delta_logo.x = 272
-    delta_logo.y = 140
-    view_radiation.append(delta_logo)
-except Exception:
-    pass
+def switch_view(new_view):
+    play("tab")
+    show_view(new_view)
+
+def requests_session():
+    return hal.requests_session(pyportal)
+
+noaa = None
+
+def noaa_client():
+    # One client for every feed, created once the session exists.
+    global noaa
+    if noaa is None:
+        noaa = NOAAClient(requests_session())
+    return noaa
+
+solar_sample = [None, None, None]  # speed km/s, density p/cm³, Bt nT
+# Solar polls follow the feed's row cadence and the activity level.
+solar_planner = None
+# Speed, density and Bz history for the sparkline, filled row by row as the
+# feeds stream in. Both are made by the network stage.
+solar_series = None
+solar_polled = None  # solar_planner.clock() at the last poll that got an answer
+
+def solar_value(text):
+    return None if text is None else float(text)
+
+def add_plasma_row(row):
+    # time_tag, density, speed
+    seconds = parse_time_tag(row[0])
+    if seconds is not None:
+        solar_series.add(seconds, (solar_value(row[2]), solar_value(row[1]), None))
+
+def add_mag_row(row):
+    # time_tag, bz_gsm, bt
+    seconds = parse_time_tag(row[0])
+    if seconds is not None:
+        solar_series.add(seconds, (None, None, solar_value(row[1])))
+
+def redraw_sparkline():
+    # Redrawn from solar_series after a poll and when the Probes tab is rebuilt.
+    if spark_bitmap is None or solar_series is None:
+        return
+    spark_bitmap.fill(0)
+    for metric in (SPEED, DENSITY, BZ):
+        draw_sparkline(spark_bitmap, solar_series, metric, metric + 1)
 
 def update_solar_wind():
+    # Stream both feeds so only the newest rows are ever held in memory; every
+    # row also goes into solar_series. This is a scheduler task, so it yields
+    # between chunks to keep the UI running. A feed that has not changed since
+    # the last poll answers 304 and keeps the values on screen. Returns the
+    # delay until the next poll.
+    global solar_polled
     try:
-        plasma_str = pyportal.fetch(SOLAR_DATA_SOURCE)
-        if isinstance(plasma_str, str):
-            plasma_data = json.loads(plasma_str)
-        else:
-            plasma_data = plasma_str
-        if len(plasma_data) < 2:
-            raise Exception("Plasma data too short")
-        latest = plasma_data[-1]
-        wind_density.text = f"DENSITY: {float(latest[1]):.1f} p/cm³"
-        wind_speed.text = f"SPEED: {float(latest[2]):.1f} km/s"
-        mag_str = pyportal.fetch(SOLAR_MAG_DATA_SOURCE)
-        if isinstance(mag_str, str):
-            mag_data = json.loads(mag_str)
-        else:
-            mag_data = mag_str
-        if len(mag_data) < 2:
-            raise Exception("Mag data too short")
-        latest_mag = mag_data[-1]
-        if len(latest_mag) < 5:
-            raise Exception("Mag data row too short")
-        mag_field.text = f"MAG FIELD: {float(latest_mag[4]):.1f} nT"
-        speed = float(latest[2])
-        if speed > 800:
-            status_label.text = "WARNING: SOLAR STORM"
-            status_label.color = 0xFF0000
-        elif speed > 500:
-            status_label.text = "ELEVATED ACTIVITY"
-            status_label.color = 0xFFFF00
+        client = noaa_client()
+        # After boot, a failed poll or a longer gap than the planner leaves
+        # between polls, the 6-hour feeds refill the sparkline.
+        backfill = solar_planner.overdue(solar_polled)
+        plasma = NOAAStreamParser(2, columns=(0, 1, 2), on_row=add_plasma_row)
+        plasma_changed = yield from client.stream(
+            SOLAR_HISTORY_SOURCE if backfill else SOLAR_DATA_SOURCE, plasma)
+        if plasma_changed:
+            if not plasma.rows:
+                raise Exception("Plasma data too short")
+            latest = plasma.rows[-1]
+            solar_sample[0] = float(latest[2])
+            solar_sample[1] = float(latest[1])
+            solar_planner.observe(parse_time_tag(latest[0]),
+                                  parse_time_tag(plasma.rows[0][0]) if len(plasma.rows) > 1 else None)
+            wind_density_text.set(f"DENSITY: {solar_sample[1]:.1f} p/cm³")
+            wind_speed_text.set(f"SPEED: {solar_sample[0]:.1f} km/s")
+        gc.collect()
+        mag = NOAAStreamParser(columns=(0, 3, 6), on_row=add_mag_row)
+        mag_changed = yield from client.stream(
+            SOLAR_MAG_HISTORY_SOURCE if backfill else SOLAR_MAG_DATA_SOURCE, mag)
+        if mag_changed:
+            if not mag.rows:
+                raise Exception("Mag data too short")
+            latest_mag = mag.rows[-1]
+            if len(latest_mag) < 3:
+                raise Exception("Mag data row too short")
+            solar_sample[2] = float(latest_mag[2])
+            mag_field_text.set(f"MAG FIELD: {solar_sample[2]:.1f} nT")
+        solar_polled = solar_planner.clock()
+        if not plasma_changed:
+            solar_planner.unchanged()
+        if not (plasma_changed or mag_changed):
+            return solar_planner.next_delay()
+        redraw_sparkline()
+        speed = solar_sample[0]
+        if speed is None:
+            raise Exception("No plasma data")
+        solar_planner.level = level_for_speed(speed)
+        if solar_planner.level == STORM:
+            status_text.set("WARNING: SOLAR STORM")
+            status_color.set(0xFF0000)
+        elif solar_planner.level == ELEVATED:
+            status_text.set("ELEVATED ACTIVITY")
+            status_color.set(0xFFFF00)
         else:
-            status_label.text = "NOMINAL"
-            status_label.color = 0x00FF00
+            status_text.set("NOMINAL")
+            status_color.set(0x00FF00)
+        if radiation_log is not None:
+            radiation_log.log_solar(*solar_sample)
     except Exception:
-        status_label.text = "DATA UNAVAILABLE"
-        status_label.color = 0xFF0000
+        if noaa is not None:
+            noaa.forget()
+        solar_planner.failed()
+        status_text.set("DATA UNAVAILABLE")
+        status_color.set(0xFF0000)
+    return solar_planner.next_delay()
+
+kp_history = None
+
+def redraw_kp_bars():
+    # Redrawn from kp_history when the Probes tab is rebuilt.
+    if kp_bitmap is None or kp_history is None:
+        return
+    draw_kp_bars(kp_bitmap, kp_history.values(), KP_BAR_WIDTH, KP_BAR_GAP)
+
+def update_kp_index():
+    try:
+        yield from kp_history.refresh_steps(noaa_client(), KP_DATA_SOURCE)
+        kp = kp_history.latest
+        if kp is None:
+            raise Exception("Kp data too short")
+        kp_text.set(f"Kp: {kp:.2f}")
+        kp_color.set(0xFF0000 if kp >= 5 else 0x00FF00)
+    except Exception:
+        kp_text.set("Kp: --")
+        kp_color.set(0xFF0000)
+    redraw_kp_bars()
+    gc.collect()
 
-last_solar_update = time.monotonic()
 gc.collect()
-SOLAR_UPDATE_INTERVAL = 45
+SOLAR_UPDATE_INTERVAL = 45  # retry period while offline, the planner sets it otherwise
+KP_UPDATE_INTERVAL = 900
+# Hidden corner that opens the Diag tab after DIAG_TAPS taps in a row
+DIAG_TAP_AREA = (0, 0, 45, 30)  # x, y, width, height
+DIAG_TAPS = 3
+DIAG_TAP_WINDOW = 2.0  # seconds the taps must fall within
+
+# --- Touch ---
+diag_taps = 0
+diag_first_tap = 0
+
+def show_k():
+    # While auto-cal runs the K row sets its reference dose instead.
+    if autocal is not None:
+        text = "Ref: {:.3f}uSv/h".format(autocal.reference)
+    else:
+        text = "K: {:.3f}".format(K_ALPHA)
+    calibration_elements["label_k"].text = text
+
+def show_autocal():
+    estimate = autocal.estimate()
+    if estimate is None:
+        text = "Auto: counting at the reference dose"
+    else:
+        text = "Auto: K {:.1f} ({:.1f}-{:.1f}) {} counts".format(*estimate, autocal.count)
+    calibration_elements["label_status"].text = text
+
+def show_calibration():
+    show_k()
+    calibration_elements["label_t"].text = "Time: {:g}s".format(calibration_store.profile[2])
+    calibration_elements["label_profile"].text = "Profile: {}".format(
+        calibration_store.profile[0])
+    if autocal is not None:
+        show_autocal()
+
+def adjust_k(direction, held=0):
+    # Holding a +/- button takes bigger steps the longer it is held.
+    global K_ALPHA
+    if autocal is not None:
+        step = accelerated(AUTO_REFERENCE_STEP, held)
+        autocal.reference = max(AUTO_REFERENCE_STEP, round(autocal.reference + direction * step, 3))
+    else:
+        K_ALPHA = max(K_STEP, round(K_ALPHA + direction * accelerated(K_STEP, held), 3))
+        calibration_store.profile[1] = K_ALPHA
+        dose.k_alpha = K_ALPHA
+    show_k()
+
+def adjust_history_unit(direction, held=0):
+    # Takes effect when the window closes, see apply_calibration.
+    profile = calibration_store.profile
+    profile[2] = max(UNIT_STEP, profile[2] + direction * accelerated(UNIT_STEP, held))
+    calibration_elements["label_t"].text = "Time: {:g}s".format(profile[2])
+
+def apply_calibration():
+    # The recorded counts are resampled to a new unit, so the history keeps
+    # its meaning rather than stretching.
+    global K_ALPHA, HISTORY_UNIT
+    _, K_ALPHA, unit = calibration_store.profile
+    dose.k_alpha = K_ALPHA
+    if unit != HISTORY_UNIT:
+        HISTORY_UNIT = unit
+        dose.resample(unit)
+
+def next_profile():
+    play("keypress")
+    calibration_store.select(calibration_store.active + 1)
+    apply_calibration()
+    calibration_elements["label_status"].text = ""
+    show_calibration()
+
+def save_profiles():
+    play("keypress")
+    apply_calibration()
+    calibration_store.save()
+    if calibration_store.nvm is None:
+        text = "No NVM, kept until reboot"
+    else:
+        text = "Saved {}".format(calibration_store.profile[0])
+    calibration_elements["label_status"].text = text
+
+def toggle_autocal():
+    # AUTO starts counting at the reference dose, AUTO again applies the fit.
+    global autocal, auto_reference, K_ALPHA
+    play("keypress")
+    if autocal is None:
+        autocal = AutoCalibration(auto_reference)
+        show_calibration()
+        return
+    estimate = autocal.estimate()
+    auto_reference = autocal.reference
+    text = "Auto: no counts, K kept"
+    if estimate is not None and autocal.count:
+        K_ALPHA = round(estimate[0], 3)
+        calibration_store.profile[1] = K_ALPHA
+        dose.k_alpha = K_ALPHA
+        text = "Auto: K {:.1f} applied, SAVE keeps it".format(K_ALPHA)
+    autocal = None
+    show_k()
+    calibration_elements["label_status"].text = text
+
+def close_calibration():
+    play("keypress")
+    apply_calibration()
+    hide_calibration_window()
+
+def open_calibration():
+    play("keypress")
+    calibrate_pocketgeiger()
+
+def toggle_connection():
+    play("keypress")
+    if wifi is None:
+        return
+    if wifi.connected:
+        wifi.disconnect()
+    wifi.connect()
+    scheduler.wake(wifi_task)
+
+def handle_diag_tap():
+    # Counts taps on the hidden corner; the third in time opens Diag.
+    global diag_taps, diag_first_tap
+    now = router.clock()
+    if now - diag_first_tap > DIAG_TAP_WINDOW:
+        diag_taps = 0
+        diag_first_tap = now
+    diag_taps += 1
+    if diag_taps >= DIAG_TAPS:
+        diag_taps = 0
+        instrumentation.enabled = True
+        switch_view("Diag")
+
+# Hit regions per view. "main" (the tab bar) is active under every tab.
+main_layer = router.layer("main")
+main_layer.add(*DIAG_TAP_AREA, handle_diag_tap)
+for tab_name, tab_rect in zip(TAB_NAMES, TAB_RECTS):
+    main_layer.add(*tab_rect, lambda name=tab_name: switch_view(name))
+# Calibrate button on Radiation Tab, Connect button on Probes Tab
+router.layer("Radiation").add(*CAL_RECT, open_calibration)
+router.layer("Probes").add(*CONNECT_RECT, toggle_connection)
+
+def route_calibration():
+    layer = router.layer("calibration")
+    if layer.regions:
+        return
+    # Holding a +/- button repeats it, in growing steps.
+    for key, adjust, direction in (("button_k_minus", adjust_k, -1),
+                                   ("button_k_plus", adjust_k, 1),
+                                   ("button_t_minus", adjust_history_unit, -1),
+                                   ("button_t_plus", adjust_history_unit, 1)):
+        button = calibration_elements[key]
+        layer.add(button["x"], button["y"], button["width"], button["height"],
+                  lambda adjust=adjust, direction=direction: adjust(direction),
+                  hold=lambda held, adjust=adjust, direction=direction: adjust(direction, held))
+    for key, handler in (("button_profile", next_profile), ("button_auto", toggle_autocal),
+                         ("button_save", save_profiles), ("button_done", close_calibration)):
+        button = calibration_elements[key]
+        layer.add(button["x"], button["y"], button["width"], button["height"], handler)
 
 view_live = "Radiation"
-content_group.append(view_radiation)
+show_view(view_live)
+boot.end()
+boot.shown()
+
+# --- Tasks ---
+def poll_touch():
+    router.poll()
+
+def refresh_display():
+    if not calibration_active:
+        update_display()
+
+def sample_uv():
+    uv_sampler.poll()
+
+def dump_diagnostics():
+    if instrumentation.enabled:
+        instrumentation.dump()
+
+def log_uv():
+    if radiation_log is not None:
+        radiation_log.log_uv(uv_sampler.uvi, uv_sampler.lux)
+
+def refresh_solar_wind():
+    # Runs whatever tab is showing, so the data is current when Probes opens.
+    if wifi.connected:
+        return update_solar_wind()
+    return None
+
+def refresh_kp_index():
+    if wifi.connected:
+        return update_kp_index()
+    return None
+
+scheduler = Scheduler()
+geiger_task = scheduler.add("geiger", process_radiation, 0, deadline=0.01)
+touch_task = scheduler.add("touch", poll_touch, 0.05, deadline=0.1)
+display_task = scheduler.add("display", refresh_display, 0.25, deadline=0.5)
+views_task = scheduler.add("views", views.poll, 5)
+diag_task = scheduler.add("diag", dump_diagnostics, DIAG_DUMP_INTERVAL, delay=DIAG_DUMP_INTERVAL)
+instrumentation.attach(scheduler)
+
+# --- Boot stages ---
+# Run one per step of the "boot" task, in this order. Each adds the tasks of
+# what it opened.
+def start_portal():
+    # PyPortal brings up the ESP32, the SD card and the speaker, and shows
+    # /pyportal_startup.bmp and plays pyportal_startup.wav if they exist (they
+    # are left off CIRCUITPY for that reason). It also makes its own group the
+    # display's root, so the sketch's is put back.
+    global pyportal, audio, audio_task
+    pyportal = hal.open_portal()
+    display.root_group = splash
+    # UI sounds, opened once and played without blocking the loop
+    audio = AudioService(hal.open_audio(pyportal))
+    audio.load("tab", "sounds/tab.wav")
+    audio.load("keypress", "sounds/tos_keypress3.wav")
+    audio_task = scheduler.add("audio", audio.poll, 0.05, deadline=0.1)
+
+def open_log():
+    # The replay lands before the first HISTORY_UNIT of live counts is added.
+    global radiation_log, log_task
+    from radiation_log import RadiationLog
+    radiation_log = RadiationLog(hal.log_directory(pyportal).rstrip("/") + "/" + LOG_FILE)
+    radiation_log.replay(dose, LOG_REPLAY_SECONDS)
+    log_task = scheduler.add("log", radiation_log.poll, 10)
+
+def wifi_state_changed(state):
+    if state == CONNECTING:
+        connect_label.set("Connecting...")
+    elif state == CONNECTED:
+        connect_label.set("Reconnect")
+        scheduler.wake(solar_task)
+        scheduler.wake(kp_task)
+        play("keypress")
+    else:
+        connect_label.set("CONNECT")
+
+def start_network():
+    global wifi, solar_planner, solar_series, kp_history, solar_task, kp_task, wifi_task
+    global NOAAStreamParser, NOAAClient, level_for_speed, parse_time_tag, STORM, ELEVATED
+    global CONNECTING, CONNECTED, LOST, BACKOFF
+    from secrets import secrets
+    from noaa_stream import NOAAStreamParser
+    from noaa_client import NOAAClient
+    from refresh_planner import RefreshPlanner, level_for_speed, parse_time_tag, STORM, ELEVATED
+    from kp_index import KpHistory
+    from timeseries import TimeSeries
+    from wifi_manager import WiFiManager, CONNECTING, CONNECTED, LOST, BACKOFF
+    # Polled by the scheduler; it connects without blocking and reconnects
+    # with backoff when the link drops.
+    wifi = WiFiManager(hal.esp32(pyportal), secrets["ssid"], secrets["password"],
+                       timeout=WIFI_CONNECT_TIMEOUT, on_change=wifi_state_changed)
+    solar_planner = RefreshPlanner()
+    solar_series = TimeSeries(SPARK_WIDTH, SOLAR_HISTORY_SECONDS, 3)
+    kp_history = KpHistory(KP_HISTORY_LENGTH, heap_budget=KP_HEAP_BUDGET)
+    solar_task = scheduler.add("solar", refresh_solar_wind, SOLAR_UPDATE_INTERVAL,
+                               delay=SOLAR_UPDATE_INTERVAL)
+    kp_task = scheduler.add("kp", refresh_kp_index, KP_UPDATE_INTERVAL,
+                            delay=KP_UPDATE_INTERVAL)
+    wifi_task = scheduler.add("wifi", wifi.poll, None, deadline=0.5)
+
+def start_sensors():
+    global uv_sampler, uv_sensor_found, uv_task, uv_log_task
+    try:
+        import adafruit_ltr390
+        from uv_sampler import UVSampler
+        i2c = hal.open_i2c()
+        ltr = adafruit_ltr390.LTR390(i2c)
+        ltr.integration_time = 200
+        ltr.gain = 1
+        uv_sampler = UVSampler(ltr, period=UV_SAMPLE_PERIOD)
+        uv_sensor_found = True
+    except Exception:
+        return
+    uv_task = scheduler.add("uv", sample_uv, uv_sampler.period / 4)
+    uv_log_task = scheduler.add("uv-log", log_uv, LOG_UV_INTERVAL, delay=LOG_UV_INTERVAL)
+
+def prepare_views():
+    # Build the other tabs now, reading their glyphs from flash, so the first
+    # switch to each does not stall. Skipped without the view cache.
+    for name in TAB_NAMES:
+        views.prepare(name)
+
+def run_boot():
+    if boot.done:
+        return
+    yield from boot.steps()
+    boot.dump()
+
+boot.add("portal", start_portal)
+boot.add("log", open_log)
+boot.add("network", start_network)
+boot.add("sensors", start_sensors)
+boot.add("views", prepare_views)
+boot_task = scheduler.add("boot", run_boot, None, deadline=1)
+scheduler.wake(boot_task)
 
 # --- Main Loop ---
-while True:
-    if calibration_active:
-        touch = ts.touch_point
-        if touch:
-            if in_button((touch[0], touch[1]), calibration_elements["button_k_minus"]):
-                K_ALPHA -= 0.1
-                calibration_elements["label_k"].text = "K: {:.3f}".format(K_ALPHA)
-                time.sleep(0.3)
-            elif in_button((touch[0], touch[1]), calibration_elements["button_k_plus"]):
-                K_ALPHA += 0.1
-                calibration_elements["label_k"].text = "K: {:.3f}".format(K_ALPHA)
-                time.sleep(0.3)
-            elif in_button((touch[0], touch[1]), calibration_elements["button_t_minus"]):
-                if HISTORY_UNIT > 0.5:
-                    HISTORY_UNIT -= 0.5
-                calibration_elements["label_t"].text = "Time: {}s".format(HISTORY_UNIT)
-                time.sleep(0.3)
-            elif in_button((touch[0], touch[1]), calibration_elements["button_t_plus"]):
-                HISTORY_UNIT += 0.5
-                calibration_elements["label_t"].text = "Time: {}s".format(HISTORY_UNIT)
-                time.sleep(0.3)
-            elif in_button((touch[0], touch[1]), calibration_elements["button_done"]):
-                pyportal.play_file("/sounds/tos_keypress3.wav")
-                hide_calibration_window()
-                time.sleep(0.3)
-        continue
-
-    touch = ts.touch_point
-    if touch:
-        for i, button in enumerate(buttons):
-            if button.contains(touch):
-                switch_view(["Radiation", "UV", "Probes"][i])
-                break
-        # Calibrate button on Radiation Tab.
-        if view_live == "Radiation" and button_cal.contains(touch):
-            pyportal.play_file("/sounds/tos_keypress3.wav")
-            calibrate_pocketgeiger()
-            time.sleep(0.3)
-    # Process Connect button on Probes Tab.
-    if view_live == "Probes" and connect_button.contains(ts.touch_point or (0, 0)):
-        if ts.touch_point:
-            pyportal.play_file("/sounds/tos_keypress3.wav")
-            current_time = time.monotonic()
-            if button_active and (current_time - last_connection_attempt) >= CONNECTION_COOLDOWN:
-                last_connection_attempt = current_time
-                button_active = False
-                connect_button.label = "Connecting..."
-                connect_button.fill_color = 0x11709F
-                success = try_connect_wifi()
-                if success:
-                    update_solar_wind()
-                    last_solar_update = time.monotonic()
-                    gc.collect()
-                button_active = True
-                connect_button.fill_color = 0x11709F
-                connect_button.label = "Reconnect" if success else "CONNECT"
-                if success and connect_button.label == "Reconnect":
-                    pyportal.play_file("/sounds/tos_keypress3.wav")
-    process_radiation()
-    update_display()
-    current_time = time.monotonic()
-    if current_time - last_solar_update >= SOLAR_UPDATE_INTERVAL:
-        if view_live == "Probes" and pyportal.network._wifi.is_connected:
-            time.sleep(0.5)
-            if pyportal.network._wifi.is_connected:
-                update_solar_wind()
-                last_solar_update = current_time
+if __name__ == "__main__":
+    scheduler.run()
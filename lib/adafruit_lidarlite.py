@@ -79,6 +79,9 @@ class LIDARLiteV4LED:
     :param i2c_bus: The `busio.I2C` object to use. This is the only
     required parameter.
     :param int address: (optional) The I2C address of the device to set after initialization.
+    :param float poll_interval: (optional) Seconds slept between status polls.
+    :param float timeout: (optional) Seconds a measurement may take before
+        `wait_while_busy` raises ``RuntimeError``.
     """
 
     def __init__(
@@ -86,7 +89,9 @@ class LIDARLiteV4LED:
         i2c_bus,
         *,
         configuration=CONFIG_DEFAULT,
-        address=_ADDR_DEFAULT
+        address=_ADDR_DEFAULT,
+        poll_interval=0.001,
+        timeout=0.1
     ):
         """Initialize the hardware for the LIDAR over I2C. You can pass in an
         optional reset_pin for when you call reset(). There are a few common
@@ -98,6 +103,9 @@ class LIDARLiteV4LED:
         self.i2c_device = I2CDevice(i2c_bus, address)
         self._buf = bytearray(2)
         self._bias_count = 0
+        self._pending = False
+        self.poll_interval = poll_interval
+        self.timeout = timeout
         time.sleep(0.5)
         self.configure(configuration)
 
@@ -118,10 +126,9 @@ class LIDARLiteV4LED:
             self._write_reg(_REG_ACQ_COMMAND, _CMD_DISTANCEWITHBIAS)
         else:
             self._write_reg(_REG_ACQ_COMMAND, _CMD_DISTANCENOBIAS)
+        self._pending = False
         self.wait_while_busy()
-        # Get the reading
-        dist = self._read_reg(_REG_DISTANCE_LOW, 2)
-        return dist[1] << 8 | dist[0]
+        return self._read_distance_reg()
 
     @property
     def distance(self):
@@ -131,13 +138,48 @@ class LIDARLiteV4LED:
             self._bias_count = 100  # every 100 reads, check bias
         return self.read_distance(self._bias_count == 0)
 
+    def read_burst(self, buffer, count=None, *, pipelined=False):
+        """Take ``count`` readings (default ``len(buffer)``) into ``buffer``,
+        such as a preallocated ``array('H')``, in cm. Nothing is allocated
+        per reading. A bias reading is taken every 100 readings, as with
+        `distance`. Returns the number of readings taken.
+
+        With ``pipelined`` the next acquisition is started as soon as a
+        result is read and left running after the burst, so the sensor
+        measures while the caller works and the first reading of the next
+        burst is usually ready at once. That reading is as old as the time
+        between bursts. The V4 LED has no free-running register, so this is
+        how continuous measurement is done."""
+        if count is None:
+            count = len(buffer)
+        for i in range(count):
+            if not self._pending:
+                self._start_acquisition()
+            self.wait_while_busy()
+            buffer[i] = self._read_distance_reg()
+            self._pending = False
+            if pipelined:
+                self._start_acquisition()
+        return count
+
+    def _start_acquisition(self):
+        self._bias_count -= 1
+        if self._bias_count < 0:
+            self._bias_count = 100
+        self._write_reg(
+            _REG_ACQ_COMMAND,
+            _CMD_DISTANCEWITHBIAS if self._bias_count == 0 else _CMD_DISTANCENOBIAS,
+        )
+        self._pending = True
+
+    def _read_distance_reg(self):
+        dist = self._read_reg(_REG_DISTANCE_LOW, 2)
+        return dist[1] << 8 | dist[0]
+
     @property
     def status(self):
         """The status byte, check datasheet for bitmask"""
-        buf = bytearray([_REG_STATUS])
-        with self.i2c_device as i2c:
-            i2c.write_then_readinto(buf, buf)
-        return buf[0]
+        return self._read_reg(_REG_STATUS, 1)[0]
 
     @property
     def firmware_version(self):
@@ -152,20 +194,30 @@ class LIDARLiteV4LED:
         return ver[0]
 
     def wait_while_busy(self):
-        while self.status & STATUS_BUSY:
-            pass
+        """Poll the status every ``poll_interval`` seconds until the
+        measurement is done. Raises ``RuntimeError`` after ``timeout``."""
+        if not self.status & STATUS_BUSY:
+            return
+        start = time.monotonic()
+        while True:
+            if self.poll_interval:
+                time.sleep(self.poll_interval)
+            if not self.status & STATUS_BUSY:
+                return
+            if time.monotonic() - start > self.timeout:
+                raise RuntimeError("LIDAR measurement timed out")
 
     def _write_reg(self, reg, value):
+        # The Arduino library sleeps 1 ms after every write. Nothing needs
+        # it: configuration writes take effect at once and an acquisition
+        # command is followed by status polling.
         self._buf[0] = reg
         self._buf[1] = value
         with self.i2c_device as i2c:
-            # print("Writing: ", [hex(i) for i in self._buf])
             i2c.write(self._buf)
-        time.sleep(0.001)  # there's a delay in arduino library
 
     def _read_reg(self, reg, num):
         self._buf[0] = reg
         with self.i2c_device as i2c:
             i2c.write_then_readinto(self._buf, self._buf, out_end=1, in_end=num)
-        # print("Read from ", hex(reg), [hex(i) for i in self._buf])
         return self._buf
\ No newline at end of file
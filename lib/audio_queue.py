@@ -0,0 +1,94 @@
+"""
+`audio_queue`
+====================================================
+
+Non-blocking playback of short UI sounds.
+
+``PyPortal.play_file`` opens the WAV file, builds a new ``WaveFile`` and then
+spins until the clip ends, so the whole UI stalls for every tap. The
+`AudioService` opens each clip once at startup, shares one stream buffer
+between them (only one plays at a time) and starts playback without waiting.
+Triggers are queued and started from `AudioService.poll`. A repeat of the
+same clip within ``coalesce`` seconds is merged, and triggers that find the
+queue full are dropped rather than blocking.
+"""
+
+import time
+
+import audiocore
+
+
+class AudioService:
+    """Queue of preloaded clips played through an ``audioio.AudioOut``.
+
+    :param peripherals: Object with an ``audio`` AudioOut and a
+        ``speaker_disable`` flag, such as ``PyPortal.peripherals``.
+    :param int queue_size: Most clips waiting to play.
+    :param float coalesce: Seconds in which repeats of a clip are merged.
+    :param int buffer_size: Bytes in the shared stream buffer.
+    """
+
+    def __init__(self, peripherals, *, queue_size=2, coalesce=0.2, buffer_size=1024,
+                 clock=time.monotonic):
+        self.peripherals = peripherals
+        self.queue_size = queue_size
+        self.coalesce = coalesce
+        self.clock = clock
+        self.played = 0
+        self.dropped = 0
+        self._buffer = bytearray(buffer_size)
+        self._clips = {}
+        self._queue = []
+        self._last_name = None
+        self._last_time = -coalesce
+        self._speaker_on = False
+
+    def load(self, name, path):
+        """Open ``path`` as clip ``name``. Returns False if it cannot be read."""
+        try:
+            wav_file = open(path, "rb")  # pylint: disable=consider-using-with
+        except OSError:
+            return False
+        try:
+            self._clips[name] = audiocore.WaveFile(wav_file, self._buffer)
+        except (OSError, ValueError):
+            wav_file.close()
+            return False
+        return True
+
+    @property
+    def playing(self):
+        """True while a clip is playing."""
+        return self.peripherals.audio.playing
+
+    def play(self, name):
+        """Queue clip ``name``. Unknown clips are ignored."""
+        if name not in self._clips:
+            return
+        now = self.clock()
+        if name == self._last_name and now - self._last_time < self.coalesce:
+            self._last_time = now
+            return
+        self._last_name = name
+        self._last_time = now
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(name)
+        self.poll()
+
+    def poll(self):
+        """Start the next queued clip once the current one has finished."""
+        audio = self.peripherals.audio
+        if audio.playing:
+            return
+        if not self._queue:
+            if self._speaker_on:
+                self.peripherals.speaker_disable = True
+                self._speaker_on = False
+            return
+        if not self._speaker_on:
+            self.peripherals.speaker_disable = False
+            self._speaker_on = True
+        audio.play(self._clips[self._queue.pop(0)])
+        self.played += 1
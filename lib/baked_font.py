@@ -0,0 +1,128 @@
+"""
+`baked_font`
+====================================================
+
+Lazy loader for fonts pre-baked by ``tools/bake_fonts.py``.
+
+A baked font holds only the glyphs code.py can display, already converted to
+packed 1-bit rows. Only the header and the glyph index are read at load time.
+Each glyph bitmap is read from flash the first time it is asked for, instead
+of parsing the BDF text.
+
+File layout, all little endian::
+
+    header  "<4sBBHhhhhhh"  magic b"PFNT", version, 0, glyph count,
+                            bounding box w, h, x, y, ascent, descent
+    index   "<HI" x count    codepoint, offset of the glyph record,
+                            sorted by codepoint
+    glyph   "<BBbbbb"        width, height, dx, dy, shift_x, shift_y,
+                            then height rows of ceil(width / 8) bytes
+"""
+
+import struct
+
+try:
+    import displayio
+    from fontio import Glyph
+except ImportError:
+    # tools/bake_fonts.py imports this module on the host for the format.
+    displayio = Glyph = None
+
+MAGIC = b"PFNT"
+VERSION = 1
+HEADER = "<4sBBHhhhhhh"
+INDEX_ENTRY = "<HI"
+GLYPH = "<BBbbbb"
+_INDEX_SIZE = struct.calcsize(INDEX_ENTRY)
+_GLYPH_SIZE = struct.calcsize(GLYPH)
+
+
+class BakedFont:
+    """Font interface used by ``adafruit_display_text`` over a baked file.
+
+    The file stays open for as long as the font is used, as glyphs are read
+    from it on first use (``adafruit_bitmap_font`` keeps a BDF open the same
+    way). code.py's fonts last until reload, which closes it. Call `close`
+    to release it sooner; glyphs not read by then are missing afterwards.
+
+    :param str path: Path of the ``.pfnt`` file.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        header = self._file.read(struct.calcsize(HEADER))
+        (magic, version, _, count, width, height, x, y,
+         self.ascent, self.descent) = struct.unpack(HEADER, header)
+        if magic != MAGIC or version != VERSION:
+            self._file.close()
+            raise OSError("Not a baked font: " + path)
+        self._bounding_box = (width, height, x, y)
+        self._count = count
+        self._index = self._file.read(count * _INDEX_SIZE)
+        self._glyphs = {}
+
+    def close(self):
+        """Close the file. Glyphs already read stay available."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get_bounding_box(self):
+        """The font bounding box as ``(width, height, x, y)``."""
+        return self._bounding_box
+
+    def _find(self, codepoint):
+        low = 0
+        high = self._count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            code, offset = struct.unpack_from(INDEX_ENTRY, self._index, middle * _INDEX_SIZE)
+            if code == codepoint:
+                return offset
+            if code < codepoint:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def load_glyphs(self, code_points):
+        """Read the given glyphs now rather than on first use."""
+        if isinstance(code_points, int):
+            code_points = (code_points,)
+        elif isinstance(code_points, str):
+            code_points = [ord(c) for c in code_points]
+        for codepoint in code_points:
+            self.get_glyph(codepoint)
+
+    def get_glyph(self, codepoint):
+        """The glyph for ``codepoint``, or None if it was not baked."""
+        if codepoint in self._glyphs:
+            return self._glyphs[codepoint]
+        offset = self._find(codepoint)
+        glyph = None
+        if offset is not None and self._file is not None:
+            self._file.seek(offset)
+            width, height, dx, dy, shift_x, shift_y = struct.unpack(
+                GLYPH, self._file.read(_GLYPH_SIZE))
+            stride = (width + 7) // 8
+            rows = self._file.read(stride * height)
+            bitmap = displayio.Bitmap(width, height, 2)
+            for y in range(height):
+                row = y * stride
+                for x in range(width):
+                    if rows[row + (x >> 3)] & (0x80 >> (x & 7)):
+                        bitmap[x, y] = 1
+            glyph = Glyph(bitmap, 0, width, height, dx, dy, shift_x, shift_y)
+        self._glyphs[codepoint] = glyph
+        return glyph
+
+
+def load_font(path):
+    """Load the baked version of the BDF at ``path`` if there is one, and the
+    BDF itself otherwise."""
+    try:
+        return BakedFont(path.rsplit(".", 1)[0] + ".pfnt")
+    except OSError:
+        from adafruit_bitmap_font import bitmap_font  # pylint: disable=import-outside-toplevel
+
+        return bitmap_font.load_font(path)
@@ -0,0 +1,147 @@
+"""
+`boot_sequence`
+====================================================
+
+Startup in named, timed stages.
+
+The stages that put the Radiation tab on screen and start the Geiger count
+run in the foreground, marked out with `BootSequence.begin`. The rest (the
+PyPortal network and audio, the SD log, the NOAA clients, the sensors) are
+queued with `BootSequence.add` and run by `BootSequence.steps` as a scheduler
+task, one stage per step, so the Geiger, touch and display tasks keep running
+between them.
+
+Each stage records the milliseconds it took and, on CircuitPython, the heap
+it kept: ``gc.mem_free()`` after a collection at its start and end. A queued
+stage that raises is recorded with its exception and the next stage runs,
+so one missing peripheral does not stop the rest of startup.
+"""
+
+import gc
+import time
+
+
+def _mem_free():
+    # gc.mem_free() only exists on CircuitPython/MicroPython.
+    mem_free = getattr(gc, "mem_free", None)
+    return mem_free() if mem_free else None
+
+
+class BootSequence:
+    """Times the startup stages.
+
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.names = []
+        self.ms = []
+        self.heap = []
+        self.errors = []
+        self.first_frame_ms = None
+        self._queue = []
+        self._name = None
+        self._start = 0
+        self._free = None
+        self._error = None
+
+    @property
+    def done(self):
+        """True once every queued stage has run."""
+        return self._name is None and not self._queue
+
+    @property
+    def failed(self):
+        """Names of the stages that raised."""
+        return [name for name, error in zip(self.names, self.errors) if error is not None]
+
+    def elapsed_ms(self):
+        """Milliseconds since the sequence was created."""
+        return (self.clock() - self.started) * 1000
+
+    def begin(self, name):
+        """End the current stage, if any, and start timing ``name``."""
+        self.end()
+        gc.collect()
+        self._name = name
+        self._free = _mem_free()
+        self._start = self.clock()
+
+    def end(self):
+        """End the current stage."""
+        if self._name is None:
+            return
+        elapsed = (self.clock() - self._start) * 1000
+        gc.collect()
+        free = _mem_free()
+        self.names.append(self._name)
+        self.ms.append(elapsed)
+        self.heap.append(None if free is None or self._free is None else self._free - free)
+        self.errors.append(self._error)
+        self._name = None
+        self._error = None
+
+    def shown(self):
+        """Record the first frame as on screen now."""
+        if self.first_frame_ms is None:
+            self.first_frame_ms = self.elapsed_ms()
+
+    def add(self, name, func):
+        """Queue ``func()`` as stage ``name`` for `steps` or `finish`."""
+        self._queue.append((name, func))
+
+    def step(self):
+        """Run the next queued stage. Returns False when none was left.
+
+        An exception from the stage is kept in `errors` instead of raised."""
+        self.end()
+        if not self._queue:
+            return False
+        name, func = self._queue.pop(0)
+        self.begin(name)
+        try:
+            func()
+        except Exception as error:  # pylint: disable=broad-except
+            self._error = error
+        self.end()
+        return True
+
+    def steps(self):
+        """Generator running the queued stages, one per step. For a scheduler
+        task."""
+        while self.step():
+            yield 0
+
+    def finish(self):
+        """Run every queued stage now."""
+        while self.step():
+            pass
+
+    def lines(self):
+        """One text line per stage, for the serial console."""
+        lines = []
+        for name, ms, heap, error in zip(self.names, self.ms, self.heap, self.errors):
+            lines.append("{:10} {:7.1f}ms heap {}".format(name[:10], ms, "-" if heap is None else heap))
+            if error is not None:
+                lines.append("  failed: {!r}".format(error))
+        if self.first_frame_ms is not None:
+            lines.append("first frame {:.0f}ms".format(self.first_frame_ms))
+        return lines
+
+    def report(self):
+        """The stage timings as a dict, for tools."""
+        return {
+            "first_frame_ms": self.first_frame_ms,
+            "stages": [{"name": name, "ms": ms, "heap": heap,
+                        "error": None if error is None else repr(error)}
+                       for name, ms, heap, error in zip(self.names, self.ms, self.heap,
+                                                        self.errors)],
+        }
+
+    def dump(self):
+        """Print the stage timings to the serial console."""
+        print("--- boot ---")
+        for line in self.lines():
+            print(line)
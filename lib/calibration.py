@@ -0,0 +1,158 @@
+"""
+`calibration`
+====================================================
+
+Calibration profiles for the PocketGeiger, kept in nonvolatile memory, and
+a fit of K against a known dose rate.
+
+A profile is a name, the CPM per µSv/h constant ``k_alpha`` and the history
+``unit`` in seconds. `CalibrationStore` packs a few of them with ``struct``
+into a small block of ``microcontroller.nvm``, with the active one and a
+checksum, so they survive a reboot. Erased or damaged memory reads as the
+defaults. Saving writes only the span of bytes that changed, in one go, as
+each NVM write wears the flash.
+
+`AutoCalibration` fits K while the detector sits at a known dose rate. The
+counts are Poisson, so the maximum likelihood K is the total count over the
+exposure (reference µSv/h times minutes), and the Poisson interval of the
+count bounds it.
+"""
+
+import struct
+
+from dose_accumulator import poisson_interval
+
+_MAGIC = b"PCAL"
+_VERSION = 1
+_HEADER = "<4sBBBxH"  # magic, version, active, profiles, checksum
+_PROFILE = "<8sff"  # name, k_alpha, unit
+
+
+def _checksum(data):
+    return sum(data) & 0xFFFF
+
+
+class CalibrationStore:
+    """Named ``[name, k_alpha, unit]`` profiles in nonvolatile memory.
+
+    :param nvm: ``microcontroller.nvm``, or None to keep the profiles in RAM.
+    :param float k_alpha: K of the profiles that were never saved.
+    :param float unit: History unit of the profiles that were never saved.
+    :param int slots: Number of profiles.
+    :param int offset: Where the block starts in ``nvm``.
+    """
+
+    def __init__(self, nvm, k_alpha, unit, *, slots=4, offset=0):
+        self.nvm = nvm
+        self.offset = offset
+        self.profiles = [["P{}".format(i + 1), k_alpha, unit] for i in range(slots)]
+        self.active = 0
+        self.size = struct.calcsize(_HEADER) + slots * struct.calcsize(_PROFILE)
+
+    @property
+    def profile(self):
+        """The active profile."""
+        return self.profiles[self.active]
+
+    def select(self, index):
+        """Make profile ``index`` (wrapping around) the active one and return it."""
+        self.active = index % len(self.profiles)
+        return self.profile
+
+    def _pack(self):
+        block = bytearray(self.size)
+        struct.pack_into(_HEADER, block, 0, _MAGIC, _VERSION, self.active, len(self.profiles), 0)
+        offset = struct.calcsize(_HEADER)
+        for name, k_alpha, unit in self.profiles:
+            struct.pack_into(_PROFILE, block, offset, name.encode()[:8], k_alpha, unit)
+            offset += struct.calcsize(_PROFILE)
+        struct.pack_into("<H", block, struct.calcsize(_HEADER) - 2, _checksum(block))
+        return block
+
+    def load(self):
+        """Read the profiles. Returns False, keeping the defaults, if the
+        memory holds none or they are damaged."""
+        if self.nvm is None or len(self.nvm) < self.offset + self.size:
+            return False
+        block = bytearray(self.nvm[self.offset:self.offset + self.size])
+        magic, version, active, count, checksum = struct.unpack_from(_HEADER, block, 0)
+        if magic != _MAGIC or version != _VERSION or count != len(self.profiles):
+            return False
+        struct.pack_into("<H", block, struct.calcsize(_HEADER) - 2, 0)
+        if checksum != _checksum(block) or active >= count:
+            return False
+        profiles = []
+        offset = struct.calcsize(_HEADER)
+        for _ in range(count):
+            name, k_alpha, unit = struct.unpack_from(_PROFILE, block, offset)
+            # NaN fails both comparisons
+            if not (k_alpha > 0 and unit > 0):
+                return False
+            profiles.append([name.rstrip(b"\0").decode(), k_alpha, unit])
+            offset += struct.calcsize(_PROFILE)
+        self.profiles = profiles
+        self.active = active
+        return True
+
+    def save(self):
+        """Write the profiles and the active one. Returns the number of
+        bytes written, 0 if nothing changed or there is no memory."""
+        if self.nvm is None:
+            return 0
+        block = self._pack()
+        start = end = None
+        for i, value in enumerate(block):
+            if self.nvm[self.offset + i] != value:
+                if start is None:
+                    start = i
+                end = i + 1
+        if start is None:
+            return 0
+        # One slice assignment is one flash write; a byte at a time is one each.
+        self.nvm[self.offset + start:self.offset + end] = block[start:end]
+        return end - start
+
+
+class AutoCalibration:
+    """Fit of K from counts taken at ``reference`` µSv/h.
+
+    The reference may change between samples, as when a check source is
+    moved, and the fit still uses every count.
+
+    :param float reference: Dose rate at the detector in µSv/h.
+    """
+
+    def __init__(self, reference=0.1):
+        self.reference = reference
+        self.count = 0
+        self.seconds = 0
+        self.exposure = 0.0  # µSv/h times minutes
+
+    def reset(self):
+        """Drop every sample."""
+        self.count = 0
+        self.seconds = 0
+        self.exposure = 0.0
+
+    def add(self, count, seconds):
+        """Add ``count`` pulses counted over ``seconds`` at the reference."""
+        self.count += count
+        self.seconds += seconds
+        self.exposure += self.reference * seconds / 60
+
+    def estimate(self):
+        """K and its 95% interval as ``(k_alpha, low, high)``, or None before
+        any exposure."""
+        if self.exposure <= 0:
+            return None
+        low, high = poisson_interval(self.count)
+        return (self.count / self.exposure, low / self.exposure, high / self.exposure)
+
+    def precision(self):
+        """Half the width of the interval relative to K, or None while there
+        is no estimate or no count."""
+        estimate = self.estimate()
+        if estimate is None or not self.count:
+            return None
+        k_alpha, low, high = estimate
+        return (high - low) / 2 / k_alpha
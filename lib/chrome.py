@@ -0,0 +1,107 @@
+"""
+`chrome`
+====================================================
+
+The fixed frame of the UI (side panels, top bar and tab bar) drawn as one
+tile map.
+
+Drawn as separate ``Rect`` and ``Button`` widgets, every panel brings its own
+``TileGrid``, ``Palette`` and full-size 1-bit ``Bitmap``, which for the
+PyPortal's layout is about 20 kB and several dozen displayio objects, and
+recoloring a button repaints all of it. `Chrome` instead covers the screen
+with one ``TileGrid`` of ``cell`` pixel tiles over a sheet holding one solid
+tile per color, so the whole frame is three objects and one tile index per
+``cell`` by ``cell`` pixels. Everything it draws must lie on that grid. A
+full-screen indexed bitmap would need at least four bits per pixel instead,
+several times more.
+
+Rectangles are filled by changing tile indexes, and only tiles whose color
+changes are written, so showing another tab repaints just the two tab
+highlights. Text goes on top in labels. Boxes that belong to one tab go in
+that tab's group instead (see `widgets.solid_rect`), so they join and leave
+the screen with it rather than being repainted tile by tile.
+"""
+
+import displayio
+
+
+class Chrome:
+    """Solid-color rectangles on a tile map of the whole screen.
+
+    :param colors: The colors, as ``0xRRGGBB``, rectangles may be filled
+        with. The first is the background.
+    :param int tab_color: Fill of the tabs that are not shown.
+    :param int selected_color: Fill of the tab that is shown.
+    :param int width: Screen width in pixels.
+    :param int height: Screen height in pixels.
+    :param int cell: Tile size in pixels. Rectangles must be multiples of it.
+    """
+
+    def __init__(self, colors, tab_color, selected_color, *, width=320, height=240, cell=5):
+        self.colors = tuple(colors)
+        self.cell = cell
+        self.columns = width // cell
+        self.rows = height // cell
+        self.tab_color = tab_color
+        self.selected_color = selected_color
+        sheet = displayio.Bitmap(cell, cell * len(self.colors), len(self.colors))
+        palette = displayio.Palette(len(self.colors))
+        for i, color in enumerate(self.colors):
+            palette[i] = color
+            for y in range(i * cell, (i + 1) * cell):
+                for x in range(cell):
+                    sheet[x, y] = i
+        self.grid = displayio.TileGrid(sheet, pixel_shader=palette, width=self.columns,
+                                       height=self.rows, tile_width=cell, tile_height=cell)
+        self.tabs = {}
+        self.shown = None
+
+    def _index(self, color):
+        try:
+            return self.colors.index(color)
+        except ValueError:
+            raise ValueError("color {:06X} is not in the palette".format(color)) from None
+
+    def _cells(self, x, y, width, height):
+        cell = self.cell
+        if x % cell or y % cell or width % cell or height % cell:
+            raise ValueError("({}, {}, {}, {}) is off the {} pixel grid".format(
+                x, y, width, height, cell))
+        left = max(0, x // cell)
+        top = max(0, y // cell)
+        right = min(self.columns, (x + width) // cell)
+        bottom = min(self.rows, (y + height) // cell)
+        return left, top, right, bottom
+
+    def fill(self, x, y, width, height, color):
+        """Fill a rectangle, clipped to the screen, with one of the colors.
+        Returns the number of tiles that changed."""
+        index = self._index(color)
+        left, top, right, bottom = self._cells(x, y, width, height)
+        grid = self.grid
+        changed = 0
+        for row in range(top, bottom):
+            for column in range(left, right):
+                if grid[column, row] != index:
+                    grid[column, row] = index
+                    changed += 1
+        return changed
+
+    def add_tab(self, view, x, y, width, height):
+        """Add the tab of ``view``, highlighted while it is shown."""
+        self.tabs[view] = (x, y, width, height)
+        self.fill(x, y, width, height,
+                  self.selected_color if view == self.shown else self.tab_color)
+
+    def show(self, view):
+        """Move the tab highlight to ``view``."""
+        previous = self.shown
+        if view == previous:
+            return
+        self.shown = view
+        if previous in self.tabs:
+            x, y, width, height = self.tabs[previous]
+            self.fill(x, y, width, height, self.tab_color)
+        if view in self.tabs:
+            x, y, width, height = self.tabs[view]
+            self.fill(x, y, width, height, self.selected_color)
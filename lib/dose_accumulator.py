@@ -0,0 +1,204 @@
+"""
+`dose_accumulator`
+====================================================
+
+Count history for the PocketGeiger with O(1) running sums.
+
+Counts are stored one slot per ``unit`` seconds in a compact ``array``. A
+running sum is kept for the whole history and for each statistics window
+(1 minute, 10 minutes and 1 hour by default), and every sum is updated with
+one add and one subtract when a slot is recorded, so reading the CPM never
+walks the history. With a short unit a window can be longer than the whole
+history; it is then capped at the ``length`` slots there are, and
+`DoseAccumulator.window_seconds` gives the span it covers, which
+`span_text` turns into a label.
+"""
+
+import math
+from array import array
+
+# z for a two sided 95% interval
+_Z = 1.96
+
+WINDOWS = (60, 600, 3600)
+
+
+def poisson_interval(count, z=_Z):
+    """Two sided confidence interval ``(low, high)`` for the mean of a
+    Poisson variable observed as ``count``, 95% by default."""
+    center = count + z * z / 2
+    spread = z * math.sqrt(count + z * z / 4)
+    return (max(0.0, center - spread), center + spread)
+
+
+def span_text(seconds):
+    """A short label for a span of ``seconds``, such as ``"10m"`` or
+    ``"1h"``."""
+    if seconds >= 3600:
+        return "{:g}h".format(seconds / 3600)
+    if seconds >= 60:
+        return "{:g}m".format(seconds / 60)
+    return "{:g}s".format(seconds)
+
+
+class DoseAccumulator:
+    """Ring of per-``unit`` pulse counts with windowed CPM and dose.
+
+    :param int length: Number of slots kept.
+    :param float unit: Seconds covered by each slot.
+    :param float k_alpha: CPM per µSv/h for the detector.
+    :param tuple windows: Window lengths, in seconds, to keep running sums
+        for. A window longer than ``length`` slots of ``unit`` is capped at
+        them, see `window_seconds`.
+    """
+
+    def __init__(self, length=60, unit=60, k_alpha=53.032, windows=WINDOWS):
+        self.length = length
+        self.k_alpha = k_alpha
+        self.total = 0
+        self.peak_cpm = 0.0
+        self._counts = array("L", [0] * length)
+        self._index = 0
+        self._filled = 0
+        self._window_seconds = windows
+        self._window_slots = array("H", [1] * len(windows))
+        self._window_sums = array("L", [0] * len(windows))
+        self.unit = unit
+
+    @property
+    def unit(self):
+        """Seconds covered by each slot."""
+        return self._unit
+
+    @unit.setter
+    def unit(self, value):
+        self._unit = value
+        for i, seconds in enumerate(self._window_seconds):
+            slots = int(seconds / value + 0.5)
+            self._window_slots[i] = min(self.length, max(1, slots))
+        self._resum()
+
+    def __len__(self):
+        return self._filled
+
+    def clear(self):
+        """Forget all counts and the peak."""
+        for i in range(self.length):
+            self._counts[i] = 0
+        self._index = 0
+        self._filled = 0
+        self.total = 0
+        self.peak_cpm = 0.0
+        for i in range(len(self._window_sums)):
+            self._window_sums[i] = 0
+
+    def add(self, count):
+        """Record the pulse count for one completed ``unit``."""
+        for i, slots in enumerate(self._window_slots):
+            if self._filled >= slots:
+                self._window_sums[i] -= self._counts[(self._index - slots) % self.length]
+            self._window_sums[i] += count
+        if self._filled == self.length:
+            self.total -= self._counts[self._index]
+        else:
+            self._filled += 1
+        self._counts[self._index] = count
+        self.total += count
+        self._index = (self._index + 1) % self.length
+        cpm = self.window_cpm(0)
+        if cpm > self.peak_cpm:
+            self.peak_cpm = cpm
+
+    def resample(self, unit):
+        """Change ``unit`` and spread the recorded counts over slots of the
+        new length, as if they had been recorded that way.
+
+        Counts are taken to be uniform within a slot. The history keeps its
+        end: the newest slot still ends now, and time before the oldest
+        whole new slot, or beyond ``length`` of them, is dropped. Totals are
+        rounded, never lost to rounding. Setting ``unit`` instead keeps the
+        counts as they are, which changes what they mean.
+        """
+        old_unit = self._unit
+        old = list(self.counts())
+        span = len(old) * old_unit
+        slots = min(self.length, int(span / unit + 1e-6))
+        start = span - slots * unit
+        sums = [0]
+        for count in old:
+            sums.append(sums[-1] + count)
+
+        def counted(seconds):
+            # Pulses before ``seconds`` into the old history
+            i = min(len(old) - 1, int(seconds / old_unit))
+            return round(sums[i] + old[i] * (seconds - i * old_unit) / old_unit)
+
+        for i in range(self.length):
+            self._counts[i] = 0
+        self.total = 0
+        previous = counted(start) if slots else 0
+        for j in range(slots):
+            edge = counted(start + (j + 1) * unit)
+            self._counts[j] = edge - previous
+            self.total += edge - previous
+            previous = edge
+        self._filled = slots
+        self._index = slots % self.length
+        self.unit = unit
+
+    def counts(self):
+        """Iterate the recorded counts from oldest to newest."""
+        start = (self._index - self._filled) % self.length
+        for i in range(self._filled):
+            yield self._counts[(start + i) % self.length]
+
+    def _resum(self):
+        for i, slots in enumerate(self._window_slots):
+            total = 0
+            for back in range(1, min(slots, self._filled) + 1):
+                total += self._counts[(self._index - back) % self.length]
+            self._window_sums[i] = total
+
+    def _seconds(self, slots):
+        return min(slots, self._filled) * self._unit
+
+    def cpm(self):
+        """Counts per minute over the whole history."""
+        if not self._filled:
+            return 0
+        return self.total * 60 / self._seconds(self._filled)
+
+    def window_seconds(self, window):
+        """Seconds window number ``window`` covers once the history is full:
+        its nominal length, or the whole history if that is shorter."""
+        return self._window_slots[window] * self._unit
+
+    def window_cpm(self, window):
+        """Counts per minute over window number ``window`` (0 is the shortest)."""
+        seconds = self._seconds(self._window_slots[window])
+        return self._window_sums[window] * 60 / seconds if seconds else 0
+
+    def usvh(self, cpm=None):
+        """Dose rate in µSv/h, for the whole history unless ``cpm`` is given."""
+        return (self.cpm() if cpm is None else cpm) / self.k_alpha
+
+    def usvh_interval(self, window=None):
+        """95% Poisson confidence interval of the dose rate as ``(low, high)``.
+
+        :param window: Window number, or None for the whole history.
+        """
+        if window is None:
+            count = self.total
+            seconds = self._seconds(self._filled)
+        else:
+            count = self._window_sums[window]
+            seconds = self._seconds(self._window_slots[window])
+        if not seconds:
+            return (0.0, 0.0)
+        low, high = poisson_interval(count)
+        scale = 60 / seconds / self.k_alpha
+        return (low * scale, high * scale)
+
+    def reset_peak(self):
+        """Restart the peak hold."""
+        self.peak_cpm = 0.0
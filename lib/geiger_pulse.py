@@ -0,0 +1,96 @@
+"""
+`geiger_pulse`
+====================================================
+
+Pulse capture backends for the PocketGeiger signal pin.
+
+The PocketGeiger pulls its signal line low for each detected gamma ray. All
+backends count falling edges and share one interface: `take` returns the
+number of pulses seen since the previous call, and `poll` must be called
+often by backends that sample the pin in software.
+
+`make_pulse_counter` picks the best backend the firmware offers:
+``countio`` counts edges in hardware so no pulse is lost while the main loop
+is busy, and `EdgePulseCounter` is the software fallback.
+"""
+
+try:
+    import countio
+except ImportError:
+    countio = None
+
+
+class CountioPulseCounter:
+    """Falling edges counted by the ``countio`` hardware counter."""
+
+    def __init__(self, pin):
+        self._counter = countio.Counter(pin, edge=countio.Edge.FALL, pull=_pull_up())
+
+    def poll(self):
+        """Nothing to do, the counter runs without help."""
+
+    def take(self):
+        """Pulses since the last call. The count taken is subtracted rather
+        than reset, so a pulse landing between the read and the write is
+        kept for the next call."""
+        count = self._counter.count
+        self._counter.count -= count
+        return count
+
+    def deinit(self):
+        """Release the pin."""
+        self._counter.deinit()
+
+
+class EdgePulseCounter:
+    """Software edge detection on a ``digitalio`` input.
+
+    Each high-to-low transition is one pulse, so a pulse that stays low over
+    several polls is only counted once. Pulses shorter than the poll interval
+    can still be missed, use ``countio`` when it is available.
+    """
+
+    def __init__(self, pin):
+        # pylint: disable=import-outside-toplevel
+        import digitalio
+
+        self._pin = digitalio.DigitalInOut(pin)
+        self._pin.direction = digitalio.Direction.INPUT
+        self._pin.pull = digitalio.Pull.UP
+        self._last = True
+        self._count = 0
+
+    def poll(self):
+        """Sample the pin once and count a falling edge."""
+        value = self._pin.value
+        if self._last and not value:
+            self._count += 1
+        self._last = value
+
+    def take(self):
+        """Pulses since the last call."""
+        self.poll()
+        count = self._count
+        self._count = 0
+        return count
+
+    def deinit(self):
+        """Release the pin."""
+        self._pin.deinit()
+
+
+def _pull_up():
+    import digitalio  # pylint: disable=import-outside-toplevel
+
+    return digitalio.Pull.UP
+
+
+def make_pulse_counter(pin):
+    """Return the best available pulse counter for ``pin``."""
+    if countio is not None:
+        try:
+            return CountioPulseCounter(pin)
+        except (RuntimeError, ValueError):
+            # The pin may not support edge counting on this board.
+            pass
+    return EdgePulseCounter(pin)
@@ -0,0 +1,228 @@
+"""
+`instrumentation`
+====================================================
+
+Loop timing, heap low-water marks and time per subsystem, for finding out
+why the device stalls or reboots during a fetch.
+
+The counters live in arrays sized at construction, so collecting keeps
+nothing new on the heap. A `Scheduler` reports to its ``monitor``. While
+instrumentation is disabled that attribute is None, which costs one
+attribute test per tick. When enabled, each tick's duration goes into a
+histogram of power-of-two millisecond buckets. Each task run, or generator
+step, adds its time and longest run to its task's slot. Code outside the
+scheduler can be timed with `Instrumentation.begin` and
+`Instrumentation.end`.
+
+Times come from ``supervisor.ticks_ms`` on CircuitPython, a small int that
+reading allocates nothing for, so runs shorter than a millisecond count as
+0. On the host ``time.monotonic`` is used.
+
+The slot's low-water mark is the lowest ``gc.mem_free()`` seen after a run.
+Reading it walks the heap's allocation table, which would be most of the
+cost of collecting, so it is only read after a run of at least ``slow_ms``
+and after every ``heap_every``-th run otherwise. The NOAA fetch tasks take
+one step per chunk, so their low-water mark is the heap left in the middle
+of a fetch. Free memory is only known on CircuitPython; on the host the
+heap columns stay empty.
+"""
+
+import gc
+import time
+from array import array
+
+# Tick histogram buckets: under 1 ms, under 2 ms, ... under 1024 ms, longer
+BUCKETS = 12
+
+_NO_LOW_WATER = 0xFFFFFFFF
+
+try:
+    from supervisor import ticks_ms as _now
+
+    # ticks_ms wraps around at 2**29
+    _TICKS_MASK = (1 << 29) - 1
+
+    def _elapsed_us(start):
+        return ((_now() - start) & _TICKS_MASK) * 1000
+
+except ImportError:
+    _now = time.monotonic
+
+    def _elapsed_us(start):
+        return int((_now() - start) * 1000000)
+
+
+def _mem_free():
+    # gc.mem_free() only exists on CircuitPython/MicroPython.
+    mem_free = getattr(gc, "mem_free", None)
+    return mem_free() if mem_free else None
+
+
+class Instrumentation:
+    """Counters for up to ``slots`` named subsystems and the scheduler tick.
+
+    :param int slots: Most subsystems tracked. Names past this share the
+        last slot, ``"other"``.
+    :param bool enabled: Start collecting at once.
+    :param int slow_ms: Runs at least this long always read the free heap.
+    :param int heap_every: Read the free heap after every this many shorter
+        runs.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, slots=16, *, enabled=False, slow_ms=10, heap_every=64):
+        self.names = []
+        self.histogram = array("L", [0] * BUCKETS)
+        self.seconds = array("f", [0.0] * slots)
+        self.runs = array("L", [0] * slots)
+        self.longest_us = array("L", [0] * slots)
+        self.low_water = array("L", [_NO_LOW_WATER] * slots)
+        self.ticks = 0
+        self.longest_tick_us = 0
+        self.heap_low_water = _NO_LOW_WATER
+        self.slow_us = slow_ms * 1000
+        self.heap_every = heap_every
+        self._until_heap = heap_every
+        self._slots = {}
+        self._scheduler = None
+        self._enabled = enabled
+
+    @property
+    def enabled(self):
+        """Whether anything is collected. Setting it attaches or detaches the
+        scheduler monitor."""
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = bool(value)
+        if self._scheduler is not None:
+            self._scheduler.monitor = self if self._enabled else None
+
+    def attach(self, scheduler):
+        """Collect from ``scheduler`` while enabled."""
+        self._scheduler = scheduler
+        self.enabled = self._enabled
+
+    def slot(self, name):
+        """The slot index for ``name``, assigned on first use."""
+        index = self._slots.get(name)
+        if index is None:
+            size = len(self.runs)
+            if len(self.names) < size - 1:
+                index = len(self.names)
+                self.names.append(name)
+            else:
+                if len(self.names) < size:
+                    self.names.append("other")
+                index = size - 1
+            self._slots[name] = index
+        return index
+
+    @staticmethod
+    def now():
+        """A timestamp for `begin`, `task_ran` and `tick_ran`."""
+        return _now()
+
+    def begin(self):
+        """Start timing a section. Returns the start for `end`, or None
+        while disabled."""
+        return _now() if self._enabled else None
+
+    def end(self, name, start):
+        """Count the section ``name`` started by `begin`."""
+        if start is not None:
+            self._count(self.slot(name), start)
+
+    def task_ran(self, task, start):
+        """Count one run (or step) of a scheduler ``task``."""
+        self._count(self.slot(task.name), start)
+
+    def tick_ran(self, start):
+        """Count one scheduler tick."""
+        elapsed = _elapsed_us(start)
+        self.ticks += 1
+        if elapsed > self.longest_tick_us:
+            self.longest_tick_us = elapsed
+        bucket = 0
+        ms = elapsed // 1000
+        while ms and bucket < BUCKETS - 1:
+            ms >>= 1
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def _count(self, index, start):
+        elapsed = _elapsed_us(start)
+        self.seconds[index] += elapsed / 1e6
+        self.runs[index] += 1
+        if elapsed > self.longest_us[index]:
+            self.longest_us[index] = elapsed
+        if elapsed < self.slow_us:
+            self._until_heap -= 1
+            if self._until_heap > 0:
+                return
+        self._until_heap = self.heap_every
+        free = _mem_free()
+        if free is not None:
+            if free < self.low_water[index]:
+                self.low_water[index] = free
+            if free < self.heap_low_water:
+                self.heap_low_water = free
+
+    def reset(self):
+        """Zero every counter, keeping the slot names."""
+        for counters in (self.histogram, self.seconds, self.runs, self.longest_us):
+            for i in range(len(counters)):
+                counters[i] = 0
+        for i in range(len(self.low_water)):
+            self.low_water[i] = _NO_LOW_WATER
+        self.ticks = 0
+        self.longest_tick_us = 0
+        self.heap_low_water = _NO_LOW_WATER
+
+    def lines(self):
+        """The counters as short text lines, for a diagnostics view."""
+        heap = "-" if self.heap_low_water == _NO_LOW_WATER else self.heap_low_water
+        lines = ["ticks {} max {}ms heap low {}".format(
+            self.ticks, self.longest_tick_us // 1000, heap)]
+        histogram = []
+        for bucket in range(BUCKETS):
+            if self.histogram[bucket]:
+                histogram.append("<{}:{}".format(1 << bucket, self.histogram[bucket])
+                                 if bucket < BUCKETS - 1 else
+                                 ">{}:{}".format(1 << (bucket - 1), self.histogram[bucket]))
+        lines.append("ms " + " ".join(histogram))
+        for index, name in enumerate(self.names):
+            if not self.runs[index]:
+                continue
+            low = self.low_water[index]
+            lines.append("{:8} {:6.1f}s {:5} max {:4}ms low {}".format(
+                name[:8], self.seconds[index], self.runs[index],
+                self.longest_us[index] // 1000, "-" if low == _NO_LOW_WATER else low))
+        return lines
+
+    def report(self):
+        """The counters as a dict, for tools."""
+        return {
+            "ticks": self.ticks,
+            "longest_tick_us": self.longest_tick_us,
+            "tick_histogram_ms": list(self.histogram),
+            "heap_low_water": (None if self.heap_low_water == _NO_LOW_WATER
+                               else self.heap_low_water),
+            "slots": {
+                name: {
+                    "seconds": self.seconds[i],
+                    "runs": self.runs[i],
+                    "longest_us": self.longest_us[i],
+                    "low_water": None if self.low_water[i] == _NO_LOW_WATER else self.low_water[i],
+                }
+                for i, name in enumerate(self.names)
+            },
+        }
+
+    def dump(self):
+        """Print the counters to the serial console."""
+        print("--- diagnostics ---")
+        for line in self.lines():
+            print(line)
@@ -0,0 +1,118 @@
+"""
+`kp_index`
+====================================================
+
+Planetary K-index history kept in a fixed-size ``array('f')`` ring.
+
+The NOAA feed is streamed through `noaa_stream.NOAAStreamParser` with
+``keep=0``, so each row goes straight into a second ring of the same size
+and no list of rows is ever built. The two rings are swapped only when the
+whole feed has been read, so a refresh that fails part way keeps the
+history it had. The free heap is sampled as rows arrive and the refresh is
+aborted if it uses more than ``heap_budget`` bytes.
+"""
+
+import gc
+from array import array
+
+from noaa_stream import NOAAStreamParser, stream_rows
+
+_KP_COLUMN = 1
+
+
+def _mem_free():
+    # gc.mem_free() only exists on CircuitPython/MicroPython.
+    mem_free = getattr(gc, "mem_free", None)
+    return mem_free() if mem_free else 0
+
+
+class KpHistory:
+    """Ring of the most recent Kp values, oldest first.
+
+    :param int size: Number of values kept (the feed is one value per 3 hours).
+    :param int heap_budget: Most heap, in bytes, a refresh may use.
+    """
+
+    def __init__(self, size=8, *, heap_budget=8192):
+        self.size = size
+        self.heap_budget = heap_budget
+        self.peak_heap = 0
+        self._values = array("f", [0.0] * size)
+        self._head = 0
+        self._count = 0
+        self._start_free = 0
+        # The ring a refresh reads into, swapped with _values when it ends
+        self._scratch = array("f", [0.0] * size)
+        self._scratch_head = 0
+        self._scratch_count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, value):
+        """Add a value, dropping the oldest once the ring is full."""
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    def clear(self):
+        """Forget every value."""
+        self._head = 0
+        self._count = 0
+
+    @property
+    def latest(self):
+        """The newest Kp value, or None when empty."""
+        if not self._count:
+            return None
+        return self._values[(self._head - 1) % self.size]
+
+    def values(self):
+        """Iterate the values from oldest to newest."""
+        start = (self._head - self._count) % self.size
+        for i in range(self._count):
+            yield self._values[(start + i) % self.size]
+
+    def refresh(self, session, url, *, chunk_size=256):
+        """Replace the history with the tail of the NOAA feed."""
+        for _ in self.refresh_steps(session, url, chunk_size=chunk_size):
+            pass
+        return self.latest
+
+    def refresh_steps(self, session, url, *, chunk_size=256):
+        """Generator version of `refresh` that yields after every chunk.
+
+        ``session`` may also be a `noaa_client.NOAAClient`, in which case an
+        unchanged feed keeps the current history. So does a refresh that
+        raises or is closed before the feed ends.
+        """
+        gc.collect()
+        self._start_free = _mem_free()
+        self.peak_heap = 0
+        self._scratch_head = 0
+        self._scratch_count = 0
+        parser = NOAAStreamParser(0, columns=(_KP_COLUMN,), on_row=self._on_row)
+        stream = getattr(session, "stream", None)
+        if stream:
+            yield from stream(url, parser)
+        else:
+            yield from stream_rows(session, url, parser, chunk_size=chunk_size)
+        # No values means a 304 or an empty feed, which leave the history alone.
+        if self._scratch_count:
+            self._values, self._scratch = self._scratch, self._values
+            self._head = self._scratch_head
+            self._count = self._scratch_count
+
+    def _on_row(self, row):
+        if self._start_free:
+            used = self._start_free - _mem_free()
+            if used > self.peak_heap:
+                self.peak_heap = used
+            if used > self.heap_budget:
+                raise MemoryError("Kp refresh over heap budget")
+        if row and row[0] is not None:
+            self._scratch[self._scratch_head] = float(row[0])
+            self._scratch_head = (self._scratch_head + 1) % self.size
+            if self._scratch_count < self.size:
+                self._scratch_count += 1
@@ -0,0 +1,78 @@
+"""
+`noaa_client`
+====================================================
+
+Conditional polling of the NOAA SWPC feeds over one pooled session.
+
+The feeds change about once a minute but are polled more often. The client
+remembers the ``ETag`` and ``Last-Modified`` of each URL and sends them back
+as ``If-None-Match`` and ``If-Modified-Since``, so an unchanged feed costs a
+304 with no body and is not parsed. Every request goes through the one
+``adafruit_requests.Session``, which keeps the socket to the host open
+between requests, so the plasma, mag and Kp feeds share a TLS connection
+instead of each paying for a handshake.
+"""
+
+
+class NOAAClient:
+    """Conditional GETs streamed into `noaa_stream.NOAAStreamParser`.
+
+    :param session: The ``adafruit_requests.Session`` to send requests with.
+    :param int chunk_size: Bytes read from the body per step.
+    :param float timeout: Socket timeout in seconds.
+    """
+
+    def __init__(self, session, *, chunk_size=256, timeout=10):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+        self._validators = {}
+
+    def forget(self, url=None):
+        """Drop the validators for ``url`` (or every URL), so the next
+        request downloads the full feed."""
+        if url is None:
+            self._validators.clear()
+        else:
+            self._validators.pop(url, None)
+
+    def stream(self, url, parser):
+        """GET ``url`` and stream a changed body through ``parser``.
+
+        This is a generator that yields after every chunk. Its return value
+        (``changed = yield from client.stream(...)``) is True when a new body
+        was parsed and False when the server answered 304. Other statuses
+        raise ``OSError``. Validators are only kept once the body parsed, so a
+        failed download is fetched in full next time.
+        """
+        headers = {}
+        etag, modified = self._validators.get(url, (None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        self.requests += 1
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        try:
+            status = response.status_code
+            if status == 304:
+                self.not_modified += 1
+                return False
+            if status != 200:
+                raise OSError("HTTP {}".format(status))
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                self.bytes_received += len(chunk)
+                parser.feed(chunk)
+                yield
+            response_headers = response.headers
+        finally:
+            response.close()
+        parser.finish()
+        etag = response_headers.get("etag")
+        modified = response_headers.get("last-modified")
+        if etag or modified:
+            self._validators[url] = (etag, modified)
+        return True
@@ -0,0 +1,172 @@
+"""
+`noaa_stream`
+====================================================
+
+Incremental parser for the NOAA SWPC "products" JSON feeds.
+
+The solar wind and K-index products are a JSON array of arrays, with the
+column names in the first row::
+
+    [["time_tag","density","speed","temperature"],
+     ["2025-05-05 12:00:00.000","1.20","400.1","12345"], ...]
+
+Loading one of those with ``json.loads`` keeps every row (and every string
+in it) alive at once, which is what runs the PyPortal out of RAM. This parser
+is fed the HTTP body a chunk at a time and only keeps the last ``keep`` rows,
+so peak allocation is bounded by the chunk size, ``max_field`` and ``keep``
+no matter how long the payload is.
+"""
+
+_WHITESPACE = b" \t\r\n"
+# Bytes that end a bare token (number, null, true or false)
+_TOKEN_END = b",] \t\r\n"
+
+
+class NOAAStreamParser:
+    """Chunk-fed parser for NOAA array-of-arrays JSON.
+
+    :param int keep: How many of the most recent data rows to retain in `rows`.
+    :param tuple columns: (optional) Column indexes to decode. Other columns are
+        skipped without allocating. Rows hold the selected columns in order.
+    :param on_row: (optional) Called with each data row as it completes.
+    :param int max_field: Longest field kept, longer values are truncated.
+    """
+
+    def __init__(self, keep=1, *, columns=None, on_row=None, max_field=32):
+        self.keep = keep
+        self.columns = columns
+        self.on_row = on_row
+        self.header = None
+        self.rows = []
+        self.row_count = 0
+        self.done = False
+        self._field = bytearray(max_field)
+        self._flen = 0
+        self._row = None
+        self._col = 0
+        self._depth = 0
+        self._in_str = False
+        self._quoted = False
+        self._have_value = False
+
+    def feed(self, chunk):
+        """Parse the next piece of the body (``bytes`` or ``bytearray``)."""
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._in_str:
+                # NOAA strings never contain escaped quotes, so the next quote
+                # always closes the string.
+                j = chunk.find(b'"', i)
+                end = n if j < 0 else j
+                self._append(chunk, i, end)
+                if j < 0:
+                    return
+                self._in_str = False
+                i = j + 1
+                continue
+            c = chunk[i]
+            i += 1
+            if c == 0x22:  # "
+                self._in_str = True
+                self._quoted = True
+                self._have_value = True
+            elif c == 0x2C:  # ,
+                if self._depth == 2:
+                    self._end_field()
+            elif c == 0x5B:  # [
+                self._depth += 1
+                if self._depth == 2:
+                    self._row = []
+                    self._col = 0
+                elif self._depth > 2:
+                    raise ValueError("Unexpected nesting in NOAA data")
+            elif c == 0x5D:  # ]
+                if self._depth == 2:
+                    if self._have_value:
+                        self._end_field()
+                    self._end_row()
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+            elif c in _WHITESPACE:
+                pass
+            elif self._depth == 2:
+                # Bare token: copy it in one slice, up to the end of the chunk
+                # if it carries on into the next one
+                self._have_value = True
+                start = i - 1
+                while i < n and chunk[i] not in _TOKEN_END:
+                    i += 1
+                self._append(chunk, start, i)
+
+    def finish(self):
+        """Check the whole payload was seen. Returns the parser."""
+        if not self.done:
+            raise ValueError("Truncated NOAA data")
+        return self
+
+    def _append(self, chunk, start, end):
+        if self._columns_skip():
+            return
+        room = len(self._field) - self._flen
+        count = min(end - start, room)
+        if count > 0:
+            self._field[self._flen:self._flen + count] = chunk[start:start + count]
+            self._flen += count
+
+    def _columns_skip(self):
+        return self.columns is not None and self._col not in self.columns
+
+    def _end_field(self):
+        if not self._columns_skip():
+            value = str(self._field[:self._flen], "utf-8")
+            if not self._quoted and value == "null":
+                value = None
+            self._row.append(value)
+        self._col += 1
+        self._flen = 0
+        self._quoted = False
+        self._have_value = False
+
+    def _end_row(self):
+        row = self._row
+        self._row = None
+        if self.header is None:
+            self.header = row
+            return
+        self.row_count += 1
+        if self.on_row:
+            self.on_row(row)
+        if self.keep:
+            self.rows.append(row)
+            if len(self.rows) > self.keep:
+                self.rows.pop(0)
+
+
+def stream_rows(session, url, parser, *, chunk_size=256, headers=None, timeout=10):
+    """GET ``url`` with ``session`` and stream the body through ``parser``.
+
+    This is a generator that yields after every chunk, so a cooperative
+    scheduler can run other tasks while the body downloads.
+
+    :param session: An ``adafruit_requests.Session`` (or compatible).
+    :param NOAAStreamParser parser: Receives the body in ``chunk_size`` pieces.
+    """
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    try:
+        if response.status_code != 200:
+            raise OSError("HTTP {}".format(response.status_code))
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            parser.feed(chunk)
+            yield
+    finally:
+        response.close()
+    parser.finish()
+
+
+def fetch_rows(session, url, parser, **kwargs):
+    """Blocking version of `stream_rows`. Returns ``parser`` when done."""
+    for _ in stream_rows(session, url, parser, **kwargs):
+        pass
+    return parser
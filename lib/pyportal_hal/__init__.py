@@ -0,0 +1,25 @@
+"""
+`pyportal_hal`
+====================================================
+
+Hardware abstraction for the PyPortal Pynt sketch.
+
+code.py builds every piece of hardware through the ``open_*`` functions here
+instead of touching ``board`` and friends directly. On the device they return
+the real drivers. On CPython, call `pyportal_hal.sim.install` first and the
+same functions return simulators, so the sketch runs headless on Linux.
+"""
+
+from .hardware import (
+    esp32,
+    log_directory,
+    open_audio,
+    open_display,
+    open_geiger,
+    open_i2c,
+    open_nvm,
+    open_portal,
+    open_touchscreen,
+    requests_session,
+    wifi,
+)
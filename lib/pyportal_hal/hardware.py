@@ -0,0 +1,100 @@
+"""
+`pyportal_hal.hardware`
+====================================================
+
+Adapters that build the PyPortal hardware. Everything imports lazily so a
+simulator installed with `pyportal_hal.sim.install` can stand in for the
+CircuitPython modules.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+TOUCH_CALIBRATION = ((5200, 59000), (5800, 57000))
+
+# Where PyPortal mounts the SD card
+SD_MOUNT = "/sd"
+
+
+def open_portal(**kwargs):
+    """The `adafruit_pyportal.PyPortal`, which owns the network and audio."""
+    from adafruit_pyportal import PyPortal
+
+    return PyPortal(**kwargs)
+
+
+def open_audio(portal):
+    """The ``audio`` AudioOut and ``speaker_disable`` flag owned by ``portal``."""
+    return portal.peripherals
+
+
+def open_display():
+    """The built in display."""
+    import board
+
+    return board.DISPLAY
+
+
+def open_touchscreen(display):
+    """The resistive touchscreen, sized to ``display``."""
+    import board
+    import adafruit_touchscreen
+
+    return adafruit_touchscreen.Touchscreen(
+        board.TOUCH_XL, board.TOUCH_XR, board.TOUCH_YD, board.TOUCH_YU,
+        calibration=TOUCH_CALIBRATION,
+        size=(display.width, display.height)
+    )
+
+
+def open_i2c():
+    """The STEMMA I2C bus."""
+    import board
+    import busio
+
+    return busio.I2C(board.SCL, board.SDA)
+
+
+def open_geiger(pin):
+    """A pulse counter on the PocketGeiger signal ``pin``."""
+    from geiger_pulse import make_pulse_counter
+
+    return make_pulse_counter(pin)
+
+
+def open_nvm():
+    """``microcontroller.nvm``, the board's nonvolatile memory, or None if it
+    has none."""
+    import microcontroller
+
+    return getattr(microcontroller, "nvm", None)
+
+
+def log_directory(portal):
+    """Directory for data logs: the SD card when ``portal`` mounted one
+    (through ``adafruit_sdcard``), otherwise the internal flash, which is
+    only writable when boot.py remounted it for the sketch."""
+    try:
+        if portal.peripherals.sd_check():
+            return SD_MOUNT
+    except (AttributeError, OSError):
+        pass
+    return "/"
+
+
+def wifi(portal):
+    """The ESP32 co-processor wrapper of ``portal``.
+
+    PyPortal does not expose this publicly, so this is the one place that
+    reaches into ``network._wifi``.
+    """
+    return portal.network._wifi  # pylint: disable=protected-access
+
+
+def esp32(portal):
+    """The ``adafruit_esp32spi.ESP_SPIcontrol`` of ``portal``'s co-processor."""
+    return wifi(portal).esp
+
+
+def requests_session(portal):
+    """The ``adafruit_requests`` session used by ``portal``."""
+    return wifi(portal).requests
@@ -0,0 +1,1398 @@
+"""
+`pyportal_hal.sim`
+====================================================
+
+CPython simulators for the PyPortal hardware used by code.py.
+
+`install` registers stand-in modules for ``board``, ``digitalio``,
+``busio``, ``countio``, ``displayio``, the display/text/button libraries, the
+touchscreen, ``adafruit_ltr390``, ``adafruit_requests`` and
+``adafruit_pyportal`` in ``sys.modules``, so code.py can be imported
+unchanged on Linux. The stand-ins are:
+
+* a scripted Geiger pin producing a Poisson pulse train at a given CPM,
+  with a ``countio`` edge counter that sees every pulse, as the hardware
+  counter does,
+* a fake I2C bus with an LTR390 register map that counts transactions,
+  read through a stand-in driver or, given its source, the real
+  ``adafruit_ltr390``,
+* a touchscreen replaying a recorded trace of presses,
+* a NOAA stand-in HTTP server serving recorded feeds from a directory,
+* an ESP32 co-processor with configurable connect latency and drop rate,
+* a display whose widgets count every write and the area they dirty,
+* an SD card backed by a host directory,
+* ``microcontroller.nvm`` as a ``bytearray`` that can outlive a reload.
+
+This module is for host-side benchmarking only and is never imported on the
+device.
+"""
+
+# pylint: disable=too-few-public-methods,invalid-name,protected-access
+
+import http.client
+import http.server
+import importlib
+import math
+import os
+import random
+import sys
+import threading
+import time
+import types
+import wave
+from urllib.parse import urlsplit
+
+from . import hardware
+
+
+class Simulation:
+    """Everything `install` set up, for the harness to configure and read."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.display = None
+        self.geiger = None
+        self.i2c_bus = None
+        self.ltr390 = None
+        self.touch = None
+        self.noaa = None
+        self.wifi = None
+        self.esp = None
+        self.audio = None
+        self.sd_dir = None
+        self.nvm = None
+
+
+_sim = None
+
+
+def simulation():
+    """The active `Simulation`, or None before `install`."""
+    return _sim
+
+
+class SteppedClock:
+    """A ``time.monotonic`` stand-in that only moves when advanced, so a
+    harness can simulate hours in moments and repeat a run exactly."""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+# --- Pins and digitalio ---
+
+
+class Pin:
+    """A named board pin. A ``source`` drives its input level."""
+
+    def __init__(self, name):
+        self.name = name
+        self.source = None
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+class GeigerSource:
+    """Poisson pulse train on the PocketGeiger signal line.
+
+    The line idles high and goes low for ``pulse_width`` seconds per pulse.
+
+    :param float cpm: Mean pulses per minute.
+    :param float pulse_width: Seconds the line stays low per pulse.
+    :param int seed: Seed for a repeatable pulse train.
+    """
+
+    def __init__(self, clock, cpm=30, pulse_width=0.0002, seed=1):
+        self.clock = clock
+        self.cpm = cpm
+        self.pulse_width = pulse_width
+        self.pulses = 0
+        self._random = random.Random(seed)
+        self._start = None
+        self._last_pulse = -1.0
+        self._next_pulse = 0.0
+
+    def _advance(self, now):
+        if self._start is None:
+            self._start = now
+            self._next_pulse = now + self._interval()
+        while self._next_pulse <= now:
+            self._last_pulse = self._next_pulse
+            self.pulses += 1
+            self._next_pulse += self._interval()
+
+    def _interval(self):
+        if self.cpm <= 0:
+            return math.inf
+        return self._random.expovariate(self.cpm / 60)
+
+    def value(self):
+        """Current line level, False while a pulse is low."""
+        now = self.clock()
+        self._advance(now)
+        return now - self._last_pulse >= self.pulse_width
+
+
+class _Direction:
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class _Pull:
+    UP = "up"
+    DOWN = "down"
+
+
+class DigitalInOut:
+    """``digitalio.DigitalInOut`` reading the pin's ``source``."""
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = _Direction.INPUT
+        self.pull = None
+        self._value = True
+
+    @property
+    def value(self):
+        if self.pin.source is not None:
+            return self.pin.source.value()
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = _Direction.INPUT
+        self.pull = pull
+
+    def switch_to_output(self, value=False):
+        self.direction = _Direction.OUTPUT
+        self._value = value
+
+    def deinit(self):
+        pass
+
+
+class _Edge:
+    RISE = "rise"
+    FALL = "fall"
+    RISE_AND_FALL = "rise_and_fall"
+
+
+class Counter:
+    """``countio.Counter`` counting the pulses of the pin's ``source``.
+
+    Every pulse has one falling and one rising edge, and the hardware counter
+    misses none of them however rarely ``count`` is read.
+    """
+
+    def __init__(self, pin, *, edge=_Edge.FALL, pull=None):
+        if pin.source is None:
+            raise ValueError("{} has no pulse source".format(pin))
+        self._source = pin.source
+        self._edges = 2 if edge == _Edge.RISE_AND_FALL else 1
+        self.pull = pull
+        self._base = self._pulses()
+
+    def _pulses(self):
+        self._source.value()  # catches the source up with the clock
+        return self._source.pulses
+
+    @property
+    def count(self):
+        return (self._pulses() - self._base) * self._edges
+
+    @count.setter
+    def count(self, value):
+        self._base = self._pulses() - value // self._edges
+
+    def reset(self):
+        self.count = 0
+
+    def deinit(self):
+        pass
+
+
+# --- I2C ---
+
+
+class FakeI2CBus:
+    """``busio.I2C`` routing transfers to register devices by address."""
+
+    def __init__(self, *_pins, **_kwargs):
+        self.devices = {}
+        self.transactions = 0
+        self._locked = False
+
+    def add(self, device):
+        self.devices[device.address] = device
+        return device
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def try_lock(self):
+        if self._locked:
+            return False
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def _device(self, address):
+        if address not in self.devices:
+            raise OSError(19, "No I2C device at 0x{:02x}".format(address))
+        return self.devices[address]
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self.transactions += 1
+        self._device(address).write(bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        self.transactions += 1
+        end = len(buffer) if end is None else end
+        buffer[start:end] = self._device(address).read(end - start)
+
+    def writeto_then_readfrom(self, address, out_buffer, in_buffer, *,
+                              out_start=0, out_end=None, in_start=0, in_end=None):
+        self.transactions += 1
+        device = self._device(address)
+        device.write(bytes(out_buffer[out_start:out_end]))
+        in_end = len(in_buffer) if in_end is None else in_end
+        in_buffer[in_start:in_end] = device.read(in_end - in_start)
+
+    def deinit(self):
+        pass
+
+
+class RegisterDevice:
+    """An I2C target with a register pointer that auto-increments.
+
+    :param int address: 7-bit I2C address.
+    :param int address_size: Bytes in a register address (1 or 2).
+    """
+
+    def __init__(self, address, size=256, address_size=1):
+        self.address = address
+        self.address_size = address_size
+        self.registers = bytearray(size)
+        self.pointer = 0
+
+    def write(self, data):
+        if len(data) < self.address_size:
+            return
+        self.pointer = int.from_bytes(data[:self.address_size], "big")
+        for value in data[self.address_size:]:
+            self.write_register(self.pointer, value)
+            self.pointer += 1
+
+    def read(self, count):
+        data = bytes(self.read_register(self.pointer + i) for i in range(count))
+        self.pointer += count
+        return data
+
+    def write_register(self, register, value):
+        self.registers[register] = value
+
+    def read_register(self, register):
+        return self.registers[register]
+
+
+class I2CDevice:
+    """``adafruit_bus_device.i2c_device.I2CDevice`` for the fake bus."""
+
+    def __init__(self, i2c, device_address, probe=True):
+        self.i2c = i2c
+        self.device_address = device_address
+        if probe:
+            i2c._device(device_address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def write(self, buf, *, start=0, end=None):
+        self.i2c.writeto(self.device_address, buf, start=start, end=end)
+
+    def readinto(self, buf, *, start=0, end=None):
+        self.i2c.readfrom_into(self.device_address, buf, start=start, end=end)
+
+    def write_then_readinto(self, out_buffer, in_buffer, *,
+                            out_start=0, out_end=None, in_start=0, in_end=None):
+        self.i2c.writeto_then_readfrom(self.device_address, out_buffer, in_buffer,
+                                       out_start=out_start, out_end=out_end,
+                                       in_start=in_start, in_end=in_end)
+
+
+# --- LTR390 ---
+
+_LTR_MAIN_CTRL = 0x00
+_LTR_MEAS_RATE = 0x04
+_LTR_GAIN = 0x05
+_LTR_PART_ID = 0x06
+_LTR_MAIN_STATUS = 0x07
+_LTR_ALS_DATA = 0x0D
+_LTR_UVS_DATA = 0x10
+_LTR_GAIN_FACTOR = (1, 3, 6, 9, 18)
+_LTR_RES_BITS = (20, 19, 18, 17, 16, 13)
+_LTR_INTEGRATION = (4, 2, 1, 0.5, 0.25, 0.03125)
+
+
+class FakeLTR390(RegisterDevice):
+    """LTR390 register map. A conversion completes ``integration`` after the
+    mode is set, and the data registers follow ``uv_index`` and ``lux``."""
+
+    def __init__(self, clock, uv_index=2.0, lux=500.0):
+        super().__init__(0x53)
+        self.clock = clock
+        self.uv_index = uv_index
+        self.lux = lux
+        self.registers[_LTR_PART_ID] = 0xB2
+        self.registers[_LTR_MEAS_RATE] = 0x22
+        self.registers[_LTR_GAIN] = 0x01
+        self._conversion_start = clock()
+
+    def _integration(self):
+        return _LTR_INTEGRATION[(self.registers[_LTR_MEAS_RATE] >> 4) & 0x07] / 10
+
+    def write_register(self, register, value):
+        if register == _LTR_MAIN_CTRL and (value ^ self.registers[register]) & 0x08:
+            self._conversion_start = self.clock()
+        super().write_register(register, value)
+
+    def _ready(self):
+        return self.clock() - self._conversion_start >= self._integration()
+
+    def read_register(self, register):
+        if register == _LTR_MAIN_STATUS:
+            return 0x08 if self._ready() else 0x00
+        if _LTR_ALS_DATA <= register < _LTR_UVS_DATA + 3:
+            gain = _LTR_GAIN_FACTOR[self.registers[_LTR_GAIN] & 0x07]
+            resolution = (self.registers[_LTR_MEAS_RATE] >> 4) & 0x07
+            if register >= _LTR_UVS_DATA:
+                scale = (gain / 18) * (2 ** _LTR_RES_BITS[resolution]) / (2 ** 20) * 2300
+                raw = int(self.uv_index * scale)
+                shift = register - _LTR_UVS_DATA
+            else:
+                raw = int(self.lux * gain * _LTR_INTEGRATION[resolution] / 0.6)
+                shift = register - _LTR_ALS_DATA
+            if register in (_LTR_UVS_DATA, _LTR_ALS_DATA):
+                # Reading the low byte consumes the conversion.
+                self._conversion_start = self.clock()
+            return (min(raw, 0xFFFFF) >> (8 * shift)) & 0xFF
+        return super().read_register(register)
+
+
+class FakeLidarLite(RegisterDevice):
+    """Garmin LIDAR-Lite v4 LED register map. An acquisition command makes the
+    status busy for a time that grows with the acquisition count register,
+    then the distance registers hold ``distance`` cm."""
+
+    def __init__(self, clock=time.monotonic, distance=123, address=0x62):
+        super().__init__(address)
+        self.clock = clock
+        self.distance = distance
+        self.acquisitions = 0
+        self.registers[0x05] = 0xFF
+        self.registers[0x72] = 0x21
+        self.registers[0xE1] = 0x02
+        self._busy_until = 0
+
+    def measure_time(self):
+        """Seconds one acquisition takes at the current acquisition count."""
+        return 0.0005 + self.registers[0x05] * 0.00002
+
+    def write_register(self, register, value):
+        super().write_register(register, value)
+        if register == 0x00 and value in (3, 4):
+            self.acquisitions += 1
+            self._busy_until = self.clock() + self.measure_time() * (2 if value == 4 else 1)
+            self.registers[0x10] = self.distance & 0xFF
+            self.registers[0x11] = self.distance >> 8
+
+    def read_register(self, register):
+        if register == 0x01:
+            return 0x01 if self.clock() < self._busy_until else 0x00
+        if register in (0x10, 0x11) and self.clock() < self._busy_until:
+            return 0
+        return super().read_register(register)
+
+
+
+class FakeVL53L4CX(RegisterDevice):
+    """ST VL53L4CX register map with 16-bit addresses. Once ranging is
+    started, a measurement completes every timing budget (decoded from
+    RANGE_CONFIG_A the way the sensor does) or, in autonomous mode, every
+    inter-measurement period, and the data-ready bit follows the interrupt polarity until the
+    interrupt is cleared."""
+
+    OSC_FREQUENCY = 0x0C00
+    CLOCK_PLL = 1000
+
+    def __init__(self, clock=time.monotonic, distance=850, address=0x29):
+        super().__init__(address, size=0x10000, address_size=2)
+        self.clock = clock
+        self.distance = distance
+        self.measurements = 0
+        self.results_read = 0
+        self.registers[0x0006] = self.OSC_FREQUENCY >> 8
+        self.registers[0x0007] = self.OSC_FREQUENCY & 0xFF
+        self.registers[0x00DE] = self.CLOCK_PLL >> 8
+        self.registers[0x00DF] = self.CLOCK_PLL & 0xFF
+        self.registers[0x00E5] = 0x03
+        self.registers[0x010F] = 0xEB
+        self.registers[0x0110] = 0xAA
+        self._started = None
+        self._consumed = 0
+
+    def _reg16(self, register):
+        return self.registers[register] << 8 | self.registers[register + 1]
+
+    def period(self):
+        """Seconds between measurements at the current settings."""
+        macro_period_us = int(2304 * (0x40000000 / self.OSC_FREQUENCY)) >> 6
+        config = self._reg16(0x005E)
+        timeout = ((config & 0xFF) + 1) << (config >> 8)
+        budget_us = (timeout * ((macro_period_us * 16) >> 6)) >> 12
+        inter = int.from_bytes(self.registers[0x006C:0x0070], "big")
+        if self.registers[0x0087] == 0x40 and inter:
+            return inter / (1.055 * self.CLOCK_PLL) / 1000
+        return (budget_us + 2500) / 1e6
+
+    def _completed(self):
+        if self._started is None:
+            return 0
+        return int((self.clock() - self._started) / self.period())
+
+    def write_register(self, register, value):
+        super().write_register(register, value)
+        if register == 0x0087:
+            if value in (0x21, 0x40):
+                self._started = self.clock()
+                self._consumed = 0
+            elif value == 0x80:
+                self.measurements += self._completed()
+                self._started = None
+        elif register == 0x0086 and value & 0x01 and self._started is not None:
+            self._consumed = self._completed()
+
+    def read_register(self, register):
+        if register == 0x0031:
+            ready = self._completed() > self._consumed
+            active_low = self.registers[0x0030] & 0x10
+            return int(ready != bool(active_low))
+        if register == 0x0089:
+            self.results_read += 1
+            return 0x09
+        if register in (0x0096, 0x0097):
+            return (self.distance >> (8 if register == 0x0096 else 0)) & 0xFF
+        if register in (0x0092, 0x0093):
+            return (20 >> (8 if register == 0x0092 else 0)) & 0xFF
+        if register in (0x008E, 0x008F):
+            return (0x0400 >> (8 if register == 0x008E else 0)) & 0xFF
+        return super().read_register(register)
+
+
+class LTR390:
+    """Stand-in for ``adafruit_ltr390.LTR390`` talking to `FakeLTR390`.
+
+    Each property performs the same register traffic as the real driver, so
+    the bus transaction count is representative.
+    """
+
+    def __init__(self, i2c, address=0x53):
+        self.i2c_device = I2CDevice(i2c, address)
+        self._buf = bytearray(4)
+        self._write(_LTR_MAIN_CTRL, 0x02)
+
+    def _read(self, register, count=1):
+        self._buf[0] = register
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(self._buf, self._buf, out_end=1, in_end=count)
+        return self._buf[:count]
+
+    def _write(self, register, value):
+        self._buf[0] = register
+        self._buf[1] = value
+        with self.i2c_device as i2c:
+            i2c.write(self._buf, end=2)
+
+    def _set_mode(self, uvs):
+        ctrl = self._read(_LTR_MAIN_CTRL)[0]
+        self._write(_LTR_MAIN_CTRL, (ctrl | 0x08) if uvs else (ctrl & ~0x08))
+
+    @property
+    def gain(self):
+        return self._read(_LTR_GAIN)[0] & 0x07
+
+    @gain.setter
+    def gain(self, value):
+        self._write(_LTR_GAIN, value & 0x07)
+
+    @property
+    def resolution(self):
+        return (self._read(_LTR_MEAS_RATE)[0] >> 4) & 0x07
+
+    @property
+    def data_ready(self):
+        return bool(self._read(_LTR_MAIN_STATUS)[0] & 0x08)
+
+    def _data(self, register, uvs):
+        self._set_mode(uvs)
+        while not self.data_ready:
+            time.sleep(0.010)
+        return self._raw(register)
+
+    @property
+    def _mode(self):
+        return bool(self._read(_LTR_MAIN_CTRL)[0] & 0x08)
+
+    @_mode.setter
+    def _mode(self, value):
+        self._set_mode(value)
+
+    def _raw(self, register):
+        data = self._read(register, 3)
+        return data[0] | data[1] << 8 | data[2] << 16
+
+    @property
+    def _uvs_data_reg(self):
+        return self._raw(_LTR_UVS_DATA)
+
+    @property
+    def _als_data_reg(self):
+        return self._raw(_LTR_ALS_DATA)
+
+    @property
+    def uvs(self):
+        return self._data(_LTR_UVS_DATA, True)
+
+    @property
+    def light(self):
+        return self._data(_LTR_ALS_DATA, False)
+
+    @property
+    def uvi(self):
+        gain = _LTR_GAIN_FACTOR[self.gain]
+        resolution = _LTR_RES_BITS[self.resolution]
+        return self.uvs / ((gain / 18) * (2 ** resolution) / (2 ** 20) * 2300)
+
+    @property
+    def lux(self):
+        gain = _LTR_GAIN_FACTOR[self.gain]
+        return 0.6 * self.light / (gain * _LTR_INTEGRATION[self.resolution])
+
+
+# --- Touch ---
+
+
+class TouchTrace:
+    """Recorded presses as ``(start, duration, x, y)`` tuples, in seconds from
+    the first read of the touchscreen."""
+
+    def __init__(self, clock, presses=()):
+        self.clock = clock
+        self.presses = sorted(presses)
+        self.reads = 0
+        self._start = None
+
+    def point(self):
+        now = self.clock()
+        if self._start is None:
+            self._start = now
+        self.reads += 1
+        elapsed = now - self._start
+        for start, duration, x, y in self.presses:
+            if start > elapsed:
+                break
+            if elapsed < start + duration:
+                return (x, y, 30000)
+        return None
+
+
+class Touchscreen:
+    """``adafruit_touchscreen.Touchscreen`` replaying the simulation trace."""
+
+    def __init__(self, *_pins, calibration=None, size=None, **_kwargs):
+        self.calibration = calibration
+        self.size = size
+
+    @property
+    def touch_point(self):
+        return _sim.touch.point() if _sim.touch else None
+
+
+# --- Display ---
+
+
+class CountingDisplay:
+    """``board.DISPLAY`` that counts widget writes and the area they dirty."""
+
+    def __init__(self, width=320, height=240):
+        self.width = width
+        self.height = height
+        self.rotation = 0
+        self.auto_refresh = True
+        self.root_group = None
+        self.writes = 0
+        self.dirty_area = 0
+        self.refreshes = 0
+
+    def mark(self, area):
+        self.writes += 1
+        self.dirty_area += area
+
+    def refresh(self, **_kwargs):
+        self.refreshes += 1
+        return True
+
+
+def _mark(area):
+    if _sim is not None and _sim.display is not None:
+        _sim.display.mark(area)
+
+
+class Group(list):
+    """``displayio.Group``."""
+
+    def __init__(self, *, scale=1, x=0, y=0):
+        super().__init__()
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def __contains__(self, item):
+        return any(item is member for member in self)
+
+    def append(self, layer):
+        super().append(layer)
+        _mark(_area(layer))
+
+    def insert(self, index, layer):
+        super().insert(index, layer)
+        _mark(_area(layer))
+
+    def remove(self, layer):
+        for i, member in enumerate(self):
+            if member is layer:
+                del self[i]
+                _mark(_area(layer))
+                return
+        raise ValueError("object not in group")
+
+    def pop(self, i=-1):
+        layer = super().pop(i)
+        _mark(_area(layer))
+        return layer
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        return self is other
+
+
+def _area(layer):
+    width = getattr(layer, "width", 0)
+    height = getattr(layer, "height", 0)
+    if isinstance(layer, Group) and not (width and height):
+        return sum(_area(member) for member in layer)
+    return width * height
+
+
+class Bitmap:
+    """``displayio.Bitmap`` backed by a ``bytearray``."""
+
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._pixels = bytearray(width * height)
+
+    def __getitem__(self, index):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        return self._pixels[y * self.width + x]
+
+    def __setitem__(self, index, value):
+        x, y = index if isinstance(index, tuple) else (index % self.width, index // self.width)
+        self._pixels[y * self.width + x] = value
+        _mark(1)
+
+    def fill(self, value):
+        self._pixels[:] = bytes([value]) * len(self._pixels)
+        _mark(self.width * self.height)
+
+
+class Palette(list):
+    """``displayio.Palette``."""
+
+    def __init__(self, color_count):
+        super().__init__([0] * color_count)
+
+    def make_transparent(self, index):
+        pass
+
+
+class TileGrid:
+    """``displayio.TileGrid``."""
+
+    def __init__(self, bitmap, *, pixel_shader=None, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.tile_width = tile_width or bitmap.width
+        self.tile_height = tile_height or bitmap.height
+        self.width = width * self.tile_width
+        self.height = height * self.tile_height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._grid_width = width
+        self._tiles = [default_tile] * (width * height)
+
+    def __getitem__(self, index):
+        x, y = index if isinstance(index, tuple) else (index % self._grid_width, index // self._grid_width)
+        return self._tiles[y * self._grid_width + x]
+
+    def __setitem__(self, index, value):
+        x, y = index if isinstance(index, tuple) else (index % self._grid_width, index // self._grid_width)
+        self._tiles[y * self._grid_width + x] = value
+        _mark(self.tile_width * self.tile_height)
+
+
+class OnDiskBitmap:
+    """``displayio.OnDiskBitmap`` reading the size from the BMP header."""
+
+    def __init__(self, path):
+        with open(_host_path(path), "rb") as file:
+            header = file.read(26)
+        self.width = int.from_bytes(header[18:22], "little", signed=True)
+        self.height = abs(int.from_bytes(header[22:26], "little", signed=True))
+        self.pixel_shader = Palette(256)
+
+
+class Glyph:
+    """``fontio.Glyph``."""
+
+    def __init__(self, bitmap, tile_index, width, height, dx, dy, shift_x, shift_y):
+        self.bitmap = bitmap
+        self.tile_index = tile_index
+        self.width = width
+        self.height = height
+        self.dx = dx
+        self.dy = dy
+        self.shift_x = shift_x
+        self.shift_y = shift_y
+
+
+class SimFont:
+    """Fixed-pitch font for the text stand-ins."""
+
+    def __init__(self, width=6, height=12):
+        self.width = width
+        self.height = height
+        self.glyphs_loaded = 0
+
+    def get_bounding_box(self):
+        return (self.width, self.height, 0, 0)
+
+    def get_glyph(self, codepoint):
+        self.glyphs_loaded += 1
+        return Glyph(None, 0, self.width, self.height, 0, 0, self.width, 0)
+
+    def load_glyphs(self, code_points):
+        pass
+
+
+def load_font(path):
+    """``adafruit_bitmap_font.bitmap_font.load_font``."""
+    if not os.path.exists(_host_path(path)):
+        raise OSError(2, "No such file", path)
+    return SimFont(10, 16)
+
+
+class Label:
+    """``adafruit_display_text.label.Label``. Every text or color assignment
+    counts as a write, as on the device."""
+
+    def __init__(self, font=None, *, text="", color=0xFFFFFF, scale=1, **kwargs):
+        self.font = font or SimFont()
+        self.scale = scale
+        self.x = kwargs.get("x", 0)
+        self.y = kwargs.get("y", 0)
+        self.anchor_point = kwargs.get("anchor_point")
+        self.anchored_position = kwargs.get("anchored_position")
+        self.hidden = False
+        self._text = text
+        self._color = color
+
+    def _cell(self):
+        width, height = self.font.get_bounding_box()[:2]
+        return width * self.scale, height * self.scale
+
+    @property
+    def width(self):
+        return len(self._text) * self._cell()[0]
+
+    @property
+    def height(self):
+        return self._cell()[1]
+
+    @property
+    def bounding_box(self):
+        return (0, 0, self.width, self.height)
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        area = max(len(self._text), len(value)) * self._cell()[0] * self.height
+        self._text = value
+        _mark(area)
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = value
+        _mark(self.width * self.height)
+
+
+class Rect(Group):
+    """``adafruit_display_shapes.rect.Rect``."""
+
+    def __init__(self, x, y, width, height, *, fill=None, outline=None, stroke=1):
+        super().__init__(x=x, y=y)
+        self.width = width
+        self.height = height
+        self.outline = outline
+        self.stroke = stroke
+        self._fill = fill
+
+    @property
+    def fill(self):
+        return self._fill
+
+    @fill.setter
+    def fill(self, value):
+        self._fill = value
+        _mark(self.width * self.height)
+
+
+class Button(Group):
+    """``adafruit_button.Button``."""
+
+    RECT = 0
+    ROUNDRECT = 1
+    SHADOWRECT = 2
+    SHADOWROUNDRECT = 3
+
+    def __init__(self, *, x, y, width, height, label=None, label_font=None,
+                 label_color=0x0, fill_color=0xFFFFFF, style=RECT, **_kwargs):
+        super().__init__(x=x, y=y)
+        self.width = width
+        self.height = height
+        self.style = style
+        self.label_font = label_font
+        self.label_color = label_color
+        self.selected = False
+        self._label = label
+        self._fill_color = fill_color
+
+    def contains(self, point):
+        return (self.x <= point[0] <= self.x + self.width) and (
+            self.y <= point[1] <= self.y + self.height)
+
+    @property
+    def label(self):
+        return self._label
+
+    @label.setter
+    def label(self, value):
+        self._label = value
+        _mark(self.width * self.height)
+
+    @property
+    def fill_color(self):
+        return self._fill_color
+
+    @fill_color.setter
+    def fill_color(self, value):
+        self._fill_color = value
+        _mark(self.width * self.height)
+
+
+# --- Network ---
+
+
+class NOAAStandIn:
+    """Local HTTP server serving recorded NOAA feeds.
+
+    A request for ``.../<name>.json`` on any host is answered with
+    ``<directory>/<name>.json``. ``Last-Modified`` is sent and
+    ``If-Modified-Since`` honoured, like the real service.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.requests = 0
+        self.bytes_sent = 0
+        self.connections = 0
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                stand_in.connections += 1
+                super().setup()
+
+            def do_GET(self):  # noqa: N802 (http.server API)
+                stand_in.requests += 1
+                path = os.path.join(stand_in.directory, os.path.basename(urlsplit(self.path).path))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                modified = self.date_time_string(int(os.path.getmtime(path)))
+                etag = '"{:x}"'.format(int(os.path.getmtime(path)))
+                if (self.headers.get("If-Modified-Since") == modified
+                        or self.headers.get("If-None-Match") == etag):
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with open(path, "rb") as file:
+                    body = file.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Last-Modified", modified)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                stand_in.bytes_sent += len(body)
+
+            def log_message(self, *_args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class Response:
+    """``adafruit_requests.Response`` over ``http.client``."""
+
+    def __init__(self, connection, response, session):
+        self._connection = connection
+        self._response = response
+        self._session = session
+        self.status_code = response.status
+        self.reason = response.reason
+        self.headers = {key.lower(): value for key, value in response.getheaders()}
+        self.socket = connection
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        while True:
+            chunk = self._response.read(chunk_size)
+            if not chunk:
+                return
+            self._session.bytes_received += len(chunk)
+            yield chunk
+
+    @property
+    def content(self):
+        return b"".join(self.iter_content(4096))
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        import json  # pylint: disable=import-outside-toplevel
+
+        return json.loads(self.content)
+
+    def close(self):
+        self._response.read()
+        self._session._release(self._connection)
+
+
+class Session:
+    """``adafruit_requests.Session`` sending every request to the stand-in.
+
+    Connections are kept open and reused per host, as ``adafruit_requests``
+    does, and the number opened is counted in ``connections``.
+    """
+
+    def __init__(self, port=None):
+        self.port = port
+        self.connections = 0
+        self.bytes_received = 0
+        self._idle = None
+
+    def _release(self, connection):
+        self._idle = connection
+
+    def request(self, method, url, headers=None, timeout=10, stream=False, **_kwargs):
+        if self.port is None:
+            raise OSError("No network")
+        if _sim is not None and _sim.wifi is not None and not _sim.wifi.is_connected:
+            raise OSError("Not connected")
+        connection, self._idle = self._idle, None
+        if connection is None:
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=timeout)
+            self.connections += 1
+        parts = urlsplit(url)
+        connection.request(method, parts.path + ("?" + parts.query if parts.query else ""),
+                           headers=headers or {})
+        return Response(connection, connection.getresponse(), self)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+class FakeESP32:
+    """``adafruit_esp32spi.ESP_SPIcontrol`` joining a simulated access point.
+
+    An attempt started with `wifi_set_passphrase` succeeds ``connect_latency``
+    seconds later, or fails with probability ``fail_rate``. Once connected
+    the link drops at random, ``drop_rate`` times an hour on average.
+    """
+
+    WL_IDLE_STATUS = 0
+    WL_NO_SSID_AVAIL = 1
+    WL_CONNECTED = 3
+    WL_CONNECT_FAILED = 4
+    WL_CONNECTION_LOST = 5
+    WL_DISCONNECTED = 6
+
+    def __init__(self, clock, *, connect_latency=2.0, fail_rate=0.0, drop_rate=0.0,
+                 rssi=-55, seed=2):
+        self.clock = clock
+        self.connect_latency = connect_latency
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.attempts = 0
+        self.drops = 0
+        self.status_reads = 0
+        self._rssi = rssi
+        self._random = random.Random(seed)
+        self._status = self.WL_IDLE_STATUS
+        self._connect_at = None
+        self._checked = clock()
+
+    def wifi_set_passphrase(self, ssid, passphrase):
+        self.attempts += 1
+        self._status = self.WL_IDLE_STATUS
+        self._connect_at = self.clock() + self.connect_latency
+
+    def disconnect(self):
+        self._status = self.WL_DISCONNECTED
+        self._connect_at = None
+
+    def _update(self):
+        now = self.clock()
+        if self._connect_at is not None and now >= self._connect_at:
+            self._connect_at = None
+            failed = self._random.random() < self.fail_rate
+            self._status = self.WL_CONNECT_FAILED if failed else self.WL_CONNECTED
+            self._checked = now
+        if self._status == self.WL_CONNECTED and self.drop_rate:
+            elapsed = now - self._checked
+            if self._random.random() < 1 - math.exp(-self.drop_rate * elapsed / 3600):
+                self._status = self.WL_CONNECTION_LOST
+                self.drops += 1
+        self._checked = now
+
+    @property
+    def status(self):
+        self.status_reads += 1
+        self._update()
+        return self._status
+
+    @property
+    def is_connected(self):
+        return self.status == self.WL_CONNECTED
+
+    @property
+    def rssi(self):
+        return self._rssi + self._random.randint(-3, 3)
+
+    def connect_AP(self, ssid, password, timeout_s=10):  # noqa: N802 (esp32spi API)
+        """Blocking connect, as ``PyPortal.network.connect`` uses."""
+        self.wifi_set_passphrase(ssid, password)
+        start = self.clock()
+        while self.status != self.WL_CONNECTED:
+            if self._status == self.WL_CONNECT_FAILED or self.clock() - start > timeout_s:
+                raise ConnectionError("Failed to connect to ssid", ssid)
+            time.sleep(0.05)
+        return self._status
+
+
+class FakeWiFi:
+    """The PyPortal ``network._wifi`` wrapper."""
+
+    def __init__(self, session, esp):
+        self.requests = session
+        self.esp = esp
+
+    @property
+    def is_connected(self):
+        return self.esp.is_connected
+
+    @property
+    def rssi(self):
+        return self.esp.rssi
+
+
+class _Network:
+    def __init__(self, wifi):
+        self._wifi = wifi
+
+    def connect(self, max_attempts=10):
+        self._wifi.esp.connect_AP(b"sim", b"sim")
+
+    def check_connectivity(self):
+        return self._wifi.is_connected
+
+    @property
+    def is_connected(self):
+        return self._wifi.is_connected
+
+
+class WaveFile:
+    """``audiocore.WaveFile``, keeping only the clip length."""
+
+    def __init__(self, file, buffer=None):
+        with wave.open(file, "rb") as clip:
+            self.duration = clip.getnframes() / clip.getframerate()
+            self.sample_rate = clip.getframerate()
+        self.buffer = buffer
+
+    def deinit(self):
+        pass
+
+
+class FakeAudioOut:
+    """``audioio.AudioOut`` that is busy for the length of each clip."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.plays = 0
+        self._until = 0
+
+    @property
+    def playing(self):
+        return self.clock() < self._until
+
+    def play(self, sample, *, loop=False):
+        self.plays += 1
+        self._until = self.clock() + sample.duration
+
+    def stop(self):
+        self._until = 0
+
+
+class _Peripherals:
+    def __init__(self, audio):
+        self.audio = audio
+        self.speaker_disable = True
+
+    def sd_check(self):
+        return _sim.sd_dir is not None
+
+
+class PyPortal:
+    """``adafruit_pyportal.PyPortal`` with simulated network and audio.
+
+    ``play_file`` blocks for the length of the clip when asked to wait, like
+    the real one. Construction does what the real one does to the display
+    and speaker: it makes its own group the display's root, and if
+    ``/pyportal_startup.bmp`` and ``pyportal_startup.wav`` are on CIRCUITPY it
+    shows the bitmap for `STARTUP_SECONDS` and plays the clip to the end.
+    """
+
+    # Backlight fade down and up around the startup bitmap, then its 2 s hold
+    STARTUP_SECONDS = 3.0
+
+    def __init__(self, **_kwargs):
+        session = Session(_sim.noaa.port if _sim.noaa else None)
+        _sim.wifi = FakeWiFi(session, _sim.esp)
+        self.network = _Network(_sim.wifi)
+        _sim.audio = FakeAudioOut(_sim.clock)
+        self.peripherals = _Peripherals(_sim.audio)
+        self.played = []
+        self.splash = Group()
+        _sim.display.root_group = self.splash
+        if os.path.exists(_host_path("/pyportal_startup.bmp")):
+            time.sleep(self.STARTUP_SECONDS)
+        if os.path.exists(_host_path("pyportal_startup.wav")):
+            self.play_file("pyportal_startup.wav")
+
+    def play_file(self, file_name, wait_to_finish=True):
+        path = _host_path(file_name)
+        with wave.open(path, "rb") as clip:
+            duration = clip.getnframes() / clip.getframerate()
+        self.played.append(file_name)
+        if wait_to_finish:
+            time.sleep(duration)
+
+    def fetch(self, url, **kwargs):
+        response = self.network._wifi.requests.get(url, **kwargs)
+        try:
+            return response.text
+        finally:
+            response.close()
+
+
+# --- Installation ---
+
+# Bytes of microcontroller.nvm on the PyPortal's SAMD51
+NVM_SIZE = 8192
+
+_root = None
+
+
+def _host_path(path):
+    """Map a CIRCUITPY path to the checkout."""
+    if os.path.isabs(path):
+        return os.path.join(_root, path.lstrip("/"))
+    return os.path.join(_root, path)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def load_driver(name, directory):
+    """Import the driver ``name`` from its source in ``directory``.
+
+    lib/ only ships the drivers as .mpy, which CPython cannot load, so the
+    ``.py`` files (from the driver's and ``adafruit_register``'s PyPI wheels,
+    say) are put first on the path. A stand-in already registered for the
+    driver's package is dropped. ``adafruit_bus_device``, ``micropython``,
+    ``displayio``, ``fontio`` and ``circuitpython_typing`` must already be
+    the stand-ins, as `install` leaves them.
+    """
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    packages = (name.partition(".")[0], "adafruit_register")
+    for module in list(sys.modules):
+        if module.partition(".")[0] in packages:
+            del sys.modules[module]
+    return importlib.import_module(name)
+
+
+def install(root, *, clock=time.monotonic, geiger_cpm=30, touches=(), uv_index=2.0,
+            lux=500.0, noaa_dir=None, sd_dir=None, wifi_latency=2.0, wifi_fail_rate=0.0,
+            wifi_drop_rate=0.0, secrets=None, nvm=None, countio=True, ltr390_driver=None):
+    """Register the simulated modules and return the `Simulation`.
+
+    :param str root: Checkout directory standing in for CIRCUITPY.
+    :param clock: Time source for the simulated devices.
+    :param float geiger_cpm: Mean rate of the Geiger pulse train.
+    :param touches: Touch trace, see `TouchTrace`.
+    :param str noaa_dir: Directory of recorded NOAA feeds to serve, or None
+        for no network.
+    :param str sd_dir: Host directory standing in for the SD card, or None
+        for no card.
+    :param float wifi_latency: Seconds the access point takes to accept.
+    :param float wifi_fail_rate: Chance a connection attempt fails.
+    :param float wifi_drop_rate: Mean link drops per hour.
+    :param bytearray nvm: Contents of ``microcontroller.nvm``, kept and
+        written in place, so passing the `Simulation.nvm` of an earlier
+        install carries them over a simulated reboot. Erased (all 0xFF)
+        memory of `NVM_SIZE` bytes if None.
+    :param bool countio: Offer the ``countio`` module, so the Geiger pin is
+        counted in "hardware". Without it code.py falls back to polling.
+    :param str ltr390_driver: Directory holding the ``adafruit_ltr390`` and
+        ``adafruit_register`` sources, see `load_driver`. The real driver then
+        reads the simulated LTR390 in place of the stand-in `LTR390`.
+    """
+    # pylint: disable=global-statement,too-many-locals
+    global _sim, _root
+    _root = root
+    sim = Simulation(clock)
+    _sim = sim
+    pins = {}
+    for name in ("D3", "D4", "SCL", "SDA", "SCK", "MOSI", "MISO", "SD_CS",
+                 "TOUCH_XL", "TOUCH_XR", "TOUCH_YD", "TOUCH_YU", "AUDIO_OUT",
+                 "SPEAKER_ENABLE", "NEOPIXEL", "LIGHT"):
+        pins[name] = Pin(name)
+    sim.geiger = GeigerSource(clock, geiger_cpm)
+    pins["D3"].source = sim.geiger
+    sim.display = CountingDisplay()
+    sim.i2c_bus = FakeI2CBus()
+    sim.ltr390 = sim.i2c_bus.add(FakeLTR390(clock, uv_index, lux))
+    sim.touch = TouchTrace(clock, touches)
+    sim.esp = FakeESP32(clock, connect_latency=wifi_latency, fail_rate=wifi_fail_rate,
+                        drop_rate=wifi_drop_rate)
+    if noaa_dir:
+        sim.noaa = NOAAStandIn(noaa_dir)
+    if sd_dir:
+        sim.sd_dir = sd_dir
+        hardware.SD_MOUNT = sd_dir
+
+    _module("board", DISPLAY=sim.display, I2C=lambda: sim.i2c_bus, **pins)
+    _module("digitalio", DigitalInOut=DigitalInOut, Direction=_Direction, Pull=_Pull)
+    _module("busio", I2C=lambda *args, **kwargs: sim.i2c_bus)
+    if countio:
+        _module("countio", Counter=Counter, Edge=_Edge)
+    else:
+        sys.modules.pop("countio", None)
+    # Imported again on next use, so it picks the backend this install offers
+    sys.modules.pop("geiger_pulse", None)
+    _module("displayio", Group=Group, Bitmap=Bitmap, Palette=Palette, TileGrid=TileGrid,
+            OnDiskBitmap=OnDiskBitmap, release_displays=lambda: None)
+    _module("terminalio", FONT=SimFont(6, 12))
+    _module("fontio", Glyph=Glyph)
+    _module("audiocore", WaveFile=WaveFile)
+    _module("micropython", const=lambda value: value)
+    sim.nvm = nvm if nvm is not None else bytearray(b"\xff" * NVM_SIZE)
+    _module("microcontroller", nvm=sim.nvm)
+    _module("adafruit_bus_device")
+    _module("adafruit_bus_device.i2c_device", I2CDevice=I2CDevice)
+    # Only named in the annotations of the adafruit_register sources
+    _module("circuitpython_typing")
+    _module("circuitpython_typing.device_drivers", I2CDeviceDriver=I2CDevice)
+    font_package = _module("adafruit_bitmap_font")
+    font_package.bitmap_font = _module("adafruit_bitmap_font.bitmap_font", load_font=load_font)
+    text_package = _module("adafruit_display_text")
+    text_package.label = _module("adafruit_display_text.label", Label=Label)
+    shapes_package = _module("adafruit_display_shapes")
+    shapes_package.rect = _module("adafruit_display_shapes.rect", Rect=Rect)
+    _module("adafruit_button", Button=Button)
+    _module("adafruit_touchscreen", Touchscreen=Touchscreen)
+    if ltr390_driver:
+        load_driver("adafruit_ltr390", ltr390_driver)
+    else:
+        _module("adafruit_ltr390", LTR390=LTR390)
+    _module("adafruit_requests", Session=Session)
+    _module("adafruit_pyportal", PyPortal=PyPortal)
+    _module("secrets", secrets=secrets or {"ssid": "sim", "password": "sim"})
+    return sim
@@ -0,0 +1,239 @@
+"""
+`radiation_log`
+====================================================
+
+Append-only log of Geiger counts, UV readings and solar-wind samples.
+
+Every record is a fixed size ``struct``, so the log can be read from the end
+without parsing it from the start. Records are packed into a RAM buffer and
+appended in one write when the buffer fills or ``flush_interval`` has passed,
+so the card sees one small write every few minutes instead of one per sample.
+When the file would grow past ``max_bytes`` it is renamed to ``<path>.1``,
+replacing the previous one, and a new file is started.
+
+Record layout, little endian::
+
+    "<IBBHfff"  time (seconds, ``time.time()``), kind, 0,
+                span (tenths of a second), three values
+
+======  =====================  ============
+kind    values                 span
+======  =====================  ============
+COUNTS  count, uSv/h, 0        history unit
+UV      UV index, lux, 0       0
+SOLAR   speed, density, Bt     0
+======  =====================  ============
+
+Values that were not available are stored as NaN.
+"""
+
+import os
+import struct
+import time
+
+RECORD = "<IBBHfff"
+RECORD_SIZE = struct.calcsize(RECORD)
+
+COUNTS = 1
+UV = 2
+SOLAR = 3
+
+KIND_NAMES = {COUNTS: "counts", UV: "uv", SOLAR: "solar"}
+
+# Flash and SD cards rewrite whole blocks of this size.
+BLOCK_SIZE = 512
+
+_NAN = float("nan")
+
+
+def read_records(path, *, newest_first=False, chunk=16):
+    """Yield ``(time, kind, span, a, b, c)`` for each record in the log at
+    ``path``, with ``span`` in seconds. A truncated last record is skipped.
+
+    With ``newest_first`` the file is read backwards ``chunk`` records at a
+    time, so reading the tail of a large log stays cheap.
+    """
+    buffer = bytearray(chunk * RECORD_SIZE)
+    try:
+        file = open(path, "rb")  # pylint: disable=consider-using-with
+    except OSError:
+        return
+    with file:
+        file.seek(0, 2)
+        count = file.tell() // RECORD_SIZE
+        if newest_first:
+            end = count
+            while end > 0:
+                start = max(0, end - chunk)
+                file.seek(start * RECORD_SIZE)
+                file.readinto(buffer)
+                for i in range(end - start - 1, -1, -1):
+                    yield _unpack(buffer, i)
+                end = start
+        else:
+            file.seek(0)
+            done = 0
+            while done < count:
+                read = min(chunk, count - done)
+                file.readinto(buffer)
+                for i in range(read):
+                    yield _unpack(buffer, i)
+                done += read
+
+
+def _unpack(buffer, index):
+    stamp, kind, _, span, a, b, c = struct.unpack_from(RECORD, buffer, index * RECORD_SIZE)
+    return stamp, kind, span / 10, a, b, c
+
+
+class RadiationLog:
+    """Batched writer for the log at ``path``.
+
+    :param str path: Log file. The rotated file is ``path + ".1"``.
+    :param int batch: Records buffered in RAM before they are written.
+    :param float flush_interval: Seconds after which `poll` writes a
+        partly filled buffer.
+    :param int max_bytes: Size at which the log is rotated.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    :param wall_clock: Returns the time stamped on records, defaults to
+        ``time.time``.
+
+    A write that fails with ``OSError``, for example because CIRCUITPY is
+    read-only while USB is connected, leaves the records in the buffer for
+    the next flush to try again. ``error`` holds the exception until a write
+    succeeds. Records logged while the buffer is full of unwritten ones are
+    counted in ``dropped`` and lost.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, path, *, batch=32, flush_interval=300, max_bytes=1 << 20,
+                 clock=time.monotonic, wall_clock=time.time):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.enabled = True
+        self.error = None
+        self.records = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.bytes_written = 0
+        self.blocks_written = 0
+        self._buffer = bytearray(batch * RECORD_SIZE)
+        self._used = 0
+        self._last_flush = clock()
+        try:
+            self._size = os.stat(path)[6]
+        except OSError:
+            self._size = 0
+
+    def log(self, kind, a=_NAN, b=_NAN, c=_NAN, span=0):
+        """Buffer one record, writing the batch if the buffer is full."""
+        if not self.enabled:
+            return
+        if self._used == len(self._buffer):
+            self.dropped += 1
+            return
+        struct.pack_into(RECORD, self._buffer, self._used, int(self.wall_clock()),
+                         kind, 0, int(span * 10 + 0.5), a, b, c)
+        self._used += RECORD_SIZE
+        self.records += 1
+        if self._used == len(self._buffer):
+            self.flush()
+
+    def log_counts(self, count, usvh, span):
+        """Record the pulse ``count`` of one history unit of ``span`` seconds."""
+        self.log(COUNTS, count, usvh, span=span)
+
+    def log_uv(self, uvi, lux):
+        """Record a UV index and lux reading."""
+        self.log(UV, _NAN if uvi is None else uvi, _NAN if lux is None else lux)
+
+    def log_solar(self, speed, density, bt=None):
+        """Record a solar-wind sample. Missing values may be None."""
+        self.log(SOLAR, _NAN if speed is None else speed,
+                 _NAN if density is None else density, _NAN if bt is None else bt)
+
+    def poll(self):
+        """Write a partly filled buffer once ``flush_interval`` has passed."""
+        if self._used and self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered records to the file now."""
+        self._last_flush = self.clock()
+        used = self._used
+        if not used or not self.enabled:
+            return
+        try:
+            if self._size and self._size + used > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as file:
+                file.write(memoryview(self._buffer)[:used])
+        except OSError as error:
+            self.error = error
+            return
+        self._used = 0
+        self.error = None
+        self.blocks_written += (self._size + used - 1) // BLOCK_SIZE - self._size // BLOCK_SIZE + 1
+        self._size += used
+        self.bytes_written += used
+        self.flushes += 1
+
+    def _rotate(self):
+        old = self.path + ".1"
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+        os.rename(self.path, old)
+        self._size = 0
+
+    def replay(self, dose, seconds=3600):
+        """Add the logged counts of the last ``seconds`` to ``dose``, oldest
+        first, then an empty unit for every whole unit between the newest
+        record and now, when nothing was counted. Returns the number of
+        units added, empty ones included.
+
+        Replay stops at the first count record whose span is not the current
+        ``dose.unit``. It needs the wall clock to have kept running since
+        the log was written: a soft reload keeps the RTC, but a hard reset
+        or power cycle sets it back to 2000-01-01 and nothing here sets it
+        again. The clock is then earlier than the newest record and nothing
+        is replayed, as it is when the newest record is ``seconds`` old.
+        """
+        counts = []
+        covered = 0
+        empty = 0
+        newest = None
+        now = self.wall_clock()
+        done = False
+        for path in (self.path, self.path + ".1"):
+            records = read_records(path, newest_first=True)
+            for stamp, kind, span, count, _, _ in records:
+                if kind != COUNTS:
+                    continue
+                if newest is None:
+                    newest = stamp
+                    done = not 0 <= now - stamp < seconds
+                    if not done:
+                        empty = min(dose.length, int((now - stamp) / dose.unit))
+                        covered = empty * dose.unit
+                done = done or (abs(span - dose.unit) > 0.05 or now - stamp >= seconds
+                                or covered >= seconds or len(counts) + empty >= dose.length)
+                if done:
+                    break
+                counts.append(int(count))
+                covered += span
+            records.close()
+            if done:
+                break
+        if not counts:
+            return 0
+        for i in range(len(counts) - 1, -1, -1):
+            dose.add(counts[i])
+        for _ in range(empty):
+            dose.add(0)
+        return len(counts) + empty
@@ -0,0 +1,138 @@
+"""
+`refresh_planner`
+====================================================
+
+Chooses when to poll the NOAA solar-wind feeds next.
+
+The feeds gain one row per minute, stamped in the ``time_tag`` column. Rather
+than polling on a fixed period, the planner learns the row cadence from the
+last two time tags and times each poll to land just after a new row is due.
+How many rows may be skipped depends on the activity level: on a quiet day
+a poll every five minutes is plenty, during a storm every row is fetched.
+Failed polls back off exponentially, and `RefreshPlanner.overdue` tells
+when a gap means rows were missed.
+"""
+
+import math
+import time
+
+NOMINAL = 0
+ELEVATED = 1
+STORM = 2
+
+LEVEL_NAMES = ("NOMINAL", "ELEVATED", "STORM")
+
+# Solar wind speeds (km/s) above which activity is ELEVATED and STORM
+ELEVATED_SPEED = 500
+STORM_SPEED = 800
+
+
+def level_for_speed(speed):
+    """The activity level for a solar wind ``speed`` in km/s."""
+    if speed > STORM_SPEED:
+        return STORM
+    if speed > ELEVATED_SPEED:
+        return ELEVATED
+    return NOMINAL
+
+
+def _days_from_civil(year, month, day):
+    # Days since 1970-01-01 in the proleptic Gregorian calendar.
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_time_tag(tag):
+    """Seconds since 1970 (UTC) for a NOAA ``time_tag`` such as
+    ``"2025-05-05 12:34:00.000"``. Returns None if ``tag`` is not one."""
+    try:
+        return (_days_from_civil(int(tag[0:4]), int(tag[5:7]), int(tag[8:10])) * 86400
+                + int(tag[11:13]) * 3600 + int(tag[14:16]) * 60 + int(tag[17:19]))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RefreshPlanner:
+    """Next-poll delays from the feed cadence, activity level and failures.
+
+    :param tuple intervals: Shortest seconds between polls at NOMINAL,
+        ELEVATED and STORM levels.
+    :param float lag: Seconds NOAA takes to publish a row after its time tag.
+    :param float min_interval: Shortest delay ever returned.
+    :param float backoff: Delay after the first failure, doubled for each
+        further failure up to ``max_backoff``.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    :param wall_clock: Returns UTC seconds since 1970, defaults to
+        ``time.time``. It is only trusted when it is later than the newest
+        time tag, since the board's clock is not set unless synced.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, *, intervals=(300, 120, 60), lag=45, min_interval=30, backoff=60,
+                 max_backoff=1800, clock=time.monotonic, wall_clock=time.time):
+        self.intervals = intervals
+        self.lag = lag
+        self.min_interval = min_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.level = NOMINAL
+        self.cadence = 60
+        self.failures = 0
+        self.last_tag = None
+        self._next_row = None
+
+    def observe(self, tag, previous_tag=None):
+        """Record a successful poll whose newest row is stamped ``tag`` and
+        the row before it ``previous_tag`` (seconds, see `parse_time_tag`)."""
+        self.failures = 0
+        if tag is None:
+            return
+        if previous_tag is not None and tag > previous_tag:
+            self.cadence = tag - previous_tag
+        if tag == self.last_tag:
+            return
+        self.last_tag = tag
+        age = self.wall_clock() - tag
+        if age < 0 or age > self.cadence + self.lag:
+            # Clock not synced, or the feed is behind: treat the row as new.
+            age = self.lag
+        self._next_row = self.clock() - age + self.cadence
+
+    def unchanged(self):
+        """Record a poll that found no new data (a 304)."""
+        self.failures = 0
+
+    def failed(self):
+        """Record a failed poll."""
+        self.failures += 1
+
+    def overdue(self, answered):
+        """True if rows may have been missed since the last poll that got an
+        answer, at ``answered`` (clock seconds, None if none has): after a
+        failed poll, or when it is further back than a planned poll leaves
+        it, the level's interval plus one cadence and the lag."""
+        if answered is None or self.failures:
+            return True
+        gap = self.intervals[self.level] + self.cadence + self.lag
+        return self.clock() - answered > gap
+
+    def next_delay(self):
+        """Seconds until the next poll should run."""
+        if self.failures:
+            return min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+        interval = self.intervals[self.level]
+        if self._next_row is None:
+            return interval
+        wait = self._next_row + self.lag - self.clock()
+        if wait < interval:
+            # Land just after the first row due at least ``interval`` away.
+            wait += math.ceil((interval - wait) / self.cadence) * self.cadence
+        return max(self.min_interval, wait)
@@ -0,0 +1,190 @@
+"""
+`scheduler`
+====================================================
+
+A small tick-based cooperative scheduler.
+
+Every subsystem is a `Task` with its own period and deadline. A task
+function may return a number, which is used as the delay until its next run,
+or it may be a generator. Generator tasks run one step per tick, so long jobs
+such as a network fetch give the other tasks a turn between chunks. A value
+yielded by a generator is the delay before its next step.
+
+An exception raised by a task is counted in its `Task.errors` and kept in
+`Task.last_error`. A generator task is closed, the task is rescheduled one
+period later, and the other tasks keep running.
+
+While a ``monitor`` such as `instrumentation.Instrumentation` is set, every
+task run and tick is reported to it.
+
+`Scheduler.run` drives the ticks from ``asyncio`` when it is available, so
+other coroutines can share the loop, and from a plain sleep loop otherwise.
+"""
+
+import time
+
+
+class Task:
+    """A periodic job owned by a `Scheduler`.
+
+    :param str name: Name used in diagnostics.
+    :param func: Called with no arguments each time the task runs.
+    :param period: Seconds between runs, or None for a task that only runs
+        when woken with `Scheduler.wake`.
+    :param deadline: Seconds after the due time by which the task should have
+        run. Runs later than this are counted in `late`.
+    """
+
+    def __init__(self, name, func, period, deadline=None):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.deadline = deadline if deadline is not None else (period or 0)
+        self.next_run = 0
+        self.enabled = period is not None
+        self.runs = 0
+        self.late = 0
+        self.errors = 0
+        self.last_error = None
+        self._steps = None
+        self._tick = 0
+
+    @property
+    def busy(self):
+        """True while a generator task is part way through."""
+        return self._steps is not None
+
+
+class Scheduler:
+    """Runs due tasks in earliest-deadline-first order.
+
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    :param sleep: Sleeps for a number of seconds, defaults to ``time.sleep``.
+    :param float max_sleep: Longest the run loop sleeps between ticks.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, max_sleep=0.05):
+        self.clock = clock
+        self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.tasks = []
+        self.running = False
+        self.monitor = None
+        self._ticks = 0
+
+    def add(self, name, func, period=0, *, deadline=None, delay=0):
+        """Create a task and schedule its first run ``delay`` seconds from now."""
+        task = Task(name, func, period, deadline)
+        task.next_run = self.clock() + delay
+        self.tasks.append(task)
+        return task
+
+    def wake(self, task, delay=0):
+        """Enable ``task`` and make it due in ``delay`` seconds."""
+        task.enabled = True
+        task.next_run = self.clock() + delay
+
+    def tick(self):
+        """Run every due task once. Returns the seconds until the next is due."""
+        now = self.clock()
+        self._ticks += 1
+        monitor = self.monitor
+        start = monitor.now() if monitor is not None else 0
+        while True:
+            task = self._next_due(now)
+            if task is None:
+                break
+            task._tick = self._ticks
+            if monitor is None:
+                self._run(task, self.clock())
+            else:
+                task_start = monitor.now()
+                self._run(task, self.clock())
+                monitor.task_ran(task, task_start)
+        if monitor is not None:
+            monitor.tick_ran(start)
+        return self._idle_time()
+
+    def _next_due(self, now):
+        # The due task with the earliest deadline that has not run this tick.
+        # A scan of the few tasks there are, which allocates nothing.
+        best = None
+        best_deadline = 0
+        for task in self.tasks:
+            if task.enabled and task.next_run <= now and task._tick != self._ticks:
+                deadline = task.next_run + task.deadline
+                if best is None or deadline < best_deadline:
+                    best = task
+                    best_deadline = deadline
+        return best
+
+    def _run(self, task, now):
+        if now - task.next_run > task.deadline:
+            task.late += 1
+        task.runs += 1
+        try:
+            if task._steps is None:
+                result = task.func()
+                if hasattr(result, "send"):
+                    task._steps = result
+                else:
+                    self._finish(task, now, result)
+                    return
+            delay = next(task._steps)
+        except StopIteration as stop:
+            task._steps = None
+            self._finish(task, self.clock(), stop.args[0] if stop.args else None)
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            self._failed(task, error)
+            return
+        task.next_run = self.clock() + (delay or 0)
+
+    def _failed(self, task, error):
+        task.errors += 1
+        task.last_error = error
+        if task._steps is not None:
+            steps = task._steps
+            task._steps = None
+            try:
+                steps.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        self._finish(task, self.clock(), None)
+
+    def _finish(self, task, now, delay):
+        if delay is None:
+            delay = task.period
+        if delay is None:
+            task.enabled = False
+        else:
+            task.next_run = now + delay
+
+    def _idle_time(self):
+        now = self.clock()
+        wait = self.max_sleep
+        for task in self.tasks:
+            if task.enabled:
+                wait = min(wait, task.next_run - now)
+        return max(0, wait)
+
+    def stop(self):
+        """Make `run` return after the current tick."""
+        self.running = False
+
+    def run(self):
+        """Tick until `stop` is called."""
+        try:
+            import asyncio  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            asyncio = None
+        self.running = True
+        if asyncio is not None:
+            asyncio.run(self._run_async(asyncio))
+            return
+        while self.running:
+            self.sleep(self.tick())
+
+    async def _run_async(self, asyncio):
+        while self.running:
+            await asyncio.sleep(self.tick())
@@ -0,0 +1,94 @@
+"""
+`timeseries`
+====================================================
+
+Fixed-size history of a few metrics, decimated to one bucket per pixel.
+
+The NOAA feeds carry hours of one-minute rows, far more than a sparkline has
+columns. `TimeSeries` cuts the last ``span`` seconds into ``width`` buckets
+and keeps only the lowest and highest value of each metric per bucket, in
+``array('f')`` columns allocated once. Rows are added as the parser reads
+them (see `noaa_stream.NOAAStreamParser` ``on_row``), so memory does not
+depend on how long the payload is, and a sparkline drawn from it still shows
+every spike. The buckets are a ring indexed by time: a newer row moves the
+window forward and clears the buckets it skips, and rows that are already
+stored, as when a short feed is polled again, fall into the same buckets and
+change nothing.
+"""
+
+from array import array
+
+_EMPTY = float("nan")
+
+
+class TimeSeries:
+    """Min/max per time bucket of ``metrics`` values.
+
+    :param int width: Buckets, one per column of the sparkline.
+    :param float span: Seconds covered by all the buckets together.
+    :param int metrics: Values per sample.
+    """
+
+    def __init__(self, width, span, metrics=1):
+        self.width = width
+        self.span = span
+        self.bucket_seconds = span / width
+        self.low = [array("f", [_EMPTY] * width) for _ in range(metrics)]
+        self.high = [array("f", [_EMPTY] * width) for _ in range(metrics)]
+        self.newest = None
+        self.samples = 0
+
+    def clear(self):
+        """Drop every sample."""
+        for column in self.low + self.high:
+            for i in range(self.width):
+                column[i] = _EMPTY
+        self.newest = None
+        self.samples = 0
+
+    def add(self, seconds, values):
+        """Add the ``values`` (one per metric, None for missing) measured at
+        ``seconds``. Returns False if that is older than the window."""
+        bucket = int(seconds // self.bucket_seconds)
+        newest = self.newest
+        if newest is None:
+            self.newest = bucket
+        elif bucket > newest:
+            for skipped in range(max(newest + 1, bucket - self.width + 1), bucket + 1):
+                slot = skipped % self.width
+                for metric in range(len(self.low)):
+                    self.low[metric][slot] = _EMPTY
+                    self.high[metric][slot] = _EMPTY
+            self.newest = bucket
+        elif bucket <= newest - self.width:
+            return False
+        slot = bucket % self.width
+        for metric, value in enumerate(values):
+            if value is None:
+                continue
+            low = self.low[metric]
+            high = self.high[metric]
+            # An empty bucket holds NaN, which compares False with anything.
+            if not low[slot] <= value:
+                low[slot] = value
+            if not high[slot] >= value:
+                high[slot] = value
+        self.samples += 1
+        return True
+
+    def slot(self, column):
+        """The bucket index of sparkline ``column``, 0 being the oldest."""
+        newest = 0 if self.newest is None else self.newest
+        return (newest - self.width + 1 + column) % self.width
+
+    def limits(self, metric):
+        """The lowest and highest value of ``metric`` stored, or None."""
+        lowest = highest = None
+        for low, high in zip(self.low[metric], self.high[metric]):
+            if low != low:  # NaN: empty bucket
+                continue
+            if lowest is None or low < lowest:
+                lowest = low
+            if highest is None or high > highest:
+                highest = high
+        return None if lowest is None else (lowest, highest)
@@ -0,0 +1,166 @@
+"""
+`touch_router`
+====================================================
+
+Reads the touchscreen once per poll, turns the samples into debounced
+presses and dispatches each press to the hit region under it.
+
+Regions belong to named layers, one per view plus shared ones such as the
+tab bar, and only the layers in `TouchRouter.active` receive presses. Each
+layer keeps a grid index built as regions are added: the screen is cut into
+``cell`` pixel squares and every square lists the regions that overlap it,
+so a press tests only the few regions in its square instead of every
+button.
+
+A press is dispatched on its first sample. It ends after no touch has been
+seen for ``release_time``, so the short dropouts a resistive panel gives
+during one press do not become extra taps. Two deliberate taps can follow
+each other as fast as the panel reports them, with no fixed lockout. A
+region with a ``hold`` handler gets it called after ``hold_time`` and then
+every ``repeat`` seconds while the press lasts, and `accelerated` lets it
+take bigger steps the longer the press lasts.
+"""
+
+import time
+
+
+def accelerated(step, held, doubling=1.0, limit=16):
+    """``step`` for a ``hold`` handler called ``held`` seconds into a press:
+    doubled for every ``doubling`` seconds held, up to ``limit`` times."""
+    return step * min(limit, 1 << min(16, int(held / doubling)))
+
+
+class Layer:
+    """Hit regions with a grid index. Create these with `TouchRouter.layer`."""
+
+    def __init__(self, width, height, cell):
+        self.cell = cell
+        self.columns = (width + cell - 1) // cell
+        self.rows = (height + cell - 1) // cell
+        self.regions = []
+        self.grid = [() for _ in range(self.columns * self.rows)]
+
+    def add(self, x, y, width, height, handler, hold=None):
+        """Send presses inside the rectangle to ``handler()``, and long
+        presses to ``hold(seconds_held)`` as well. Edges are inclusive, as in
+        ``Button.contains``. Regions added first win where they overlap."""
+        region = (x, y, x + width, y + height, handler, hold)
+        self.regions.append(region)
+        last_column = self.columns - 1
+        last_row = self.rows - 1
+        for row in range(max(0, y // self.cell), min(last_row, (y + height) // self.cell) + 1):
+            for column in range(max(0, x // self.cell),
+                                min(last_column, (x + width) // self.cell) + 1):
+                index = row * self.columns + column
+                self.grid[index] = self.grid[index] + (region,)
+        return region
+
+    def add_button(self, button, handler, hold=None):
+        """`add` the bounds of a widget with ``x``, ``y``, ``width`` and
+        ``height``, such as an ``adafruit_button.Button``."""
+        return self.add(button.x, button.y, button.width, button.height, handler, hold)
+
+    def clear(self):
+        """Remove every region."""
+        self.regions = []
+        for i in range(len(self.grid)):
+            self.grid[i] = ()
+
+    def find(self, x, y):
+        """The region containing the point, or None."""
+        column = x // self.cell
+        row = y // self.cell
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return None
+        for region in self.grid[row * self.columns + column]:
+            if region[0] <= x <= region[2] and region[1] <= y <= region[3]:
+                return region
+        return None
+
+
+class TouchRouter:
+    """Dispatches debounced presses from ``read`` to the active layers.
+
+    :param read: Returns the touch point as ``(x, y, ...)`` or None, such as
+        the ``touch_point`` of an ``adafruit_touchscreen.Touchscreen``.
+    :param int width: Screen width in pixels.
+    :param int height: Screen height in pixels.
+    :param int cell: Grid cell size in pixels.
+    :param float release_time: Seconds without a touch that end a press.
+    :param float hold_time: Seconds a press lasts before ``hold`` is called.
+    :param float repeat: Seconds between further ``hold`` calls.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, read, *, width=320, height=240, cell=40, release_time=0.1,
+                 hold_time=0.6, repeat=0.2, clock=time.monotonic):
+        self.read = read
+        self.width = width
+        self.height = height
+        self.cell = cell
+        self.release_time = release_time
+        self.hold_time = hold_time
+        self.repeat = repeat
+        self.clock = clock
+        self.layers = {}
+        self.active = ()
+        self.presses = 0
+        self.dispatched = 0
+        self.pressed = False
+        self._region = None
+        self._pressed_at = 0
+        self._last_seen = 0
+        self._next_hold = 0
+
+    def layer(self, name):
+        """The layer called ``name``, created empty on first use."""
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = Layer(self.width, self.height, self.cell)
+            self.layers[name] = layer
+        return layer
+
+    def find(self, x, y):
+        """The region of the active layers containing the point, or None.
+        Active names with no layer, such as a view without buttons, are
+        skipped."""
+        for name in self.active:
+            layer = self.layers.get(name)
+            if layer is None:
+                continue
+            region = layer.find(x, y)
+            if region is not None:
+                return region
+        return None
+
+    def poll(self):
+        """Read the touchscreen once and dispatch. Returns True if a handler
+        was called."""
+        point = self.read()
+        now = self.clock()
+        if point is None:
+            if self.pressed and now - self._last_seen > self.release_time:
+                self.pressed = False
+                self._region = None
+            return False
+        self._last_seen = now
+        if self.pressed:
+            region = self._region
+            if region is not None and region[5] is not None and now >= self._next_hold:
+                self._next_hold = now + self.repeat
+                region[5](now - self._pressed_at)
+                return True
+            return False
+        self.pressed = True
+        self.presses += 1
+        self._pressed_at = now
+        self._next_hold = now + self.hold_time
+        region = self.find(point[0], point[1])
+        self._region = region
+        if region is None:
+            return False
+        self.dispatched += 1
+        region[4]()
+        return True
@@ -0,0 +1,191 @@
+"""
+`uv_sampler`
+====================================================
+
+Background sampling for the LTR390 UV sensor.
+
+Reading ``LTR390.uvi`` or ``LTR390.lux`` costs several I2C transactions
+(the gain and resolution registers are read back on every call) and, when the
+sensor is in the other mode, a blocking wait for a fresh conversion. The
+sampler reads the gain and resolution once, only touches the bus when a
+conversion can be ready, and keeps a moving average and min/max of the last
+``size`` samples in fixed ``array`` buffers. The UI reads the cached values.
+
+When the driver exposes its mode bit and raw data registers, as
+``adafruit_ltr390`` does, the sampler switches channel itself right after a
+read and picks up the result on a later poll, so no call waits for a
+conversion. The driver still sleeps 30 ms after each mode change, which
+happens once every ``lux_every`` samples.
+
+Those are private attributes of the driver, checked against the
+``adafruit_ltr390`` 1.1.19 shipped in lib/ and against 1.1.25:
+
+* ``_mode``: property over the MAIN_CTRL UVS mode bit that skips the write
+  when the cached mode already matches, and sleeps 30 ms after a change,
+* ``_uvs_data_reg`` and ``_als_data_reg``: 24-bit reads of the raw UVS and
+  ALS data registers.
+
+A driver without all three is read through ``uvs`` and ``light`` instead.
+Check them again when updating the driver.
+"""
+
+import time
+from array import array
+
+# Indexed by the LTR390 gain and resolution register values.
+_GAIN_FACTOR = (1, 3, 6, 9, 18)
+_RESOLUTION_BITS = (20, 19, 18, 17, 16, 13)
+_INTEGRATION = (4, 2, 1, 0.5, 0.25, 0.03125)  # x 100 ms
+
+# MAIN_CTRL mode bit values
+_ALS = 0
+_UV = 1
+
+# Counts per UV index at 18x gain and 20-bit resolution
+_UV_SENSITIVITY = 2300
+
+
+class _Channel:
+    """Fixed ring of samples with a running sum, minimum and maximum."""
+
+    def __init__(self, size):
+        self._values = array("f", [0.0] * size)
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+        self.minimum = 0.0
+        self.maximum = 0.0
+
+    def push(self, value):
+        values = self._values
+        index = self._index
+        evicted = None
+        if self._count == len(values):
+            evicted = values[index]
+            self._sum -= evicted
+        else:
+            self._count += 1
+        values[index] = value
+        value = values[index]  # as stored, rounded to single precision
+        self._sum += value
+        self._index = (index + 1) % len(values)
+        if self._count == 1:
+            self.minimum = self.maximum = value
+            return
+        # Only an evicted extreme needs a scan to find the new one.
+        if value <= self.minimum:
+            self.minimum = value
+        elif evicted == self.minimum:
+            self.minimum = self._scan(min)
+        if value >= self.maximum:
+            self.maximum = value
+        elif evicted == self.maximum:
+            self.maximum = self._scan(max)
+
+    def _scan(self, pick):
+        values = self._values
+        best = values[0]
+        for i in range(1, self._count):
+            best = pick(best, values[i])
+        return best
+
+    @property
+    def average(self):
+        return self._sum / self._count if self._count else None
+
+
+class UVSampler:
+    """Rate-limited reader for an ``adafruit_ltr390.LTR390``.
+
+    :param sensor: The LTR390 driver instance.
+    :param int size: Samples kept for the moving average and min/max.
+    :param int lux_every: Read the ambient light channel once every this many
+        samples. Switching channel restarts the conversion, so the UV channel
+        is read the rest of the time.
+    :param float period: Seconds between samples. Never shorter than the
+        conversion time, which it defaults to.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    def __init__(self, sensor, *, size=8, lux_every=8, period=0, clock=time.monotonic):
+        self.sensor = sensor
+        self.lux_every = lux_every
+        self.clock = clock
+        self.samples = 0
+        self.bus_reads = 0
+        gain = _GAIN_FACTOR[sensor.gain]
+        resolution = sensor.resolution
+        self.bus_reads += 2
+        self.interval = _INTEGRATION[resolution] / 10
+        self.period = max(period, self.interval)
+        self._uv_scale = (gain / 18) * (2 ** _RESOLUTION_BITS[resolution]) / (2 ** 20) * _UV_SENSITIVITY
+        self._lux_scale = 0.6 / (gain * _INTEGRATION[resolution])
+        self._uvi = _Channel(size)
+        self._lux = _Channel(size)
+        self._next_poll = 0
+        # dir(), since getattr on the class would run the register
+        # descriptors without an instance
+        names = dir(type(sensor))
+        self._direct = all(name in names
+                           for name in ("_mode", "_uvs_data_reg", "_als_data_reg"))
+        self._reading_lux = True
+        if self._direct:
+            sensor._mode = _ALS  # pylint: disable=protected-access
+            self.bus_reads += 1
+
+    def _wants_lux(self):
+        return self._lux.average is None or self.samples % self.lux_every == 0
+
+    def _read_direct(self):
+        # pylint: disable=protected-access
+        sensor = self.sensor
+        if self._reading_lux:
+            self._lux.push(sensor._als_data_reg * self._lux_scale)
+        else:
+            self._uvi.push(sensor._uvs_data_reg / self._uv_scale)
+        # The conversion after a mode change is the one for the new channel.
+        wants_lux = self._wants_lux()
+        if wants_lux != self._reading_lux:
+            sensor._mode = _ALS if wants_lux else _UV
+            self._reading_lux = wants_lux
+            self.bus_reads += 1
+
+    def poll(self):
+        """Take a sample if a conversion can be ready. Call this often."""
+        now = self.clock()
+        if now < self._next_poll:
+            return False
+        self.bus_reads += 1
+        if not self.sensor.data_ready:
+            self._next_poll = now + self.interval / 4
+            return False
+        self.samples += 1
+        self.bus_reads += 1
+        if self._direct:
+            self._read_direct()
+        elif self._wants_lux():
+            self._lux.push(self.sensor.light * self._lux_scale)
+        else:
+            self._uvi.push(self.sensor.uvs / self._uv_scale)
+        self._next_poll = self.clock() + self.period
+        return True
+
+    @property
+    def uvi(self):
+        """Moving average UV index, or None before the first sample."""
+        return self._uvi.average
+
+    @property
+    def lux(self):
+        """Moving average ambient light in lux, or None before the first sample."""
+        return self._lux.average
+
+    @property
+    def uvi_range(self):
+        """``(min, max)`` UV index over the buffered samples."""
+        return (self._uvi.minimum, self._uvi.maximum)
+
+    @property
+    def lux_range(self):
+        """``(min, max)`` lux over the buffered samples."""
+        return (self._lux.minimum, self._lux.maximum)
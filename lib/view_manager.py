@@ -0,0 +1,145 @@
+"""
+`view_manager`
+====================================================
+
+Builds tab groups when they are first shown and tears hidden ones down when
+the heap runs low.
+
+Each view is registered with a build function that returns its
+``displayio.Group`` and attaches its `view_model.Binding` objects to the new
+widgets. A released view drops its group and detaches the bindings, which
+keep their latest values, and its ``release`` hook drops any other
+reference the build left behind. When the view is shown again it is rebuilt and the
+values are pushed back, so the tab comes back as it was.
+
+With ``cache`` on, built views stay resident until free memory falls below
+``low_memory``. Then every hidden view is released, on the next switch or
+`ViewManager.poll`. With ``cache`` off, a view is released as soon as it is
+hidden. ``resident`` records the heap each view took to build (CircuitPython
+only) and ``switch_ms`` the time of the last switch.
+"""
+
+import gc
+import time
+
+
+def _mem_free():
+    # gc.mem_free() only exists on CircuitPython/MicroPython.
+    mem_free = getattr(gc, "mem_free", None)
+    return mem_free() if mem_free else None
+
+
+class View:
+    """A registered view. Create these with `ViewManager.add`."""
+
+    def __init__(self, name, build, bindings, release=None):
+        self.name = name
+        self.build = build
+        self.bindings = bindings
+        self.on_release = release
+        self.group = None
+        self.builds = 0
+
+
+class ViewManager:
+    """Shows one view at a time in ``container``.
+
+    :param container: The ``displayio.Group`` the shown view is appended to.
+    :param bool cache: Keep hidden views built while memory allows.
+    :param int low_memory: Free heap, in bytes, below which hidden views are
+        released.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    def __init__(self, container, *, cache=True, low_memory=16384, clock=time.monotonic):
+        self.container = container
+        self.cache = cache
+        self.low_memory = low_memory
+        self.clock = clock
+        self.views = {}
+        self.current = None
+        self.resident = {}
+        self.switch_ms = 0.0
+        self.builds = 0
+        self.releases = 0
+
+    def add(self, name, build, bindings=(), release=None):
+        """Register a view. ``build()`` returns its group and attaches
+        ``bindings``, which are detached when the view is released, when
+        ``release()`` is called too if given."""
+        view = View(name, build, bindings, release)
+        self.views[name] = view
+        return view
+
+    def group(self, name):
+        """The built group of ``name``, or None."""
+        return self.views[name].group
+
+    def show(self, name):
+        """Build ``name`` if needed and make it the shown view. Returns its
+        group."""
+        start = self.clock()
+        view = self.views[name]
+        previous = self.current
+        if previous is not None and previous != name:
+            group = self.views[previous].group
+            if group is not None and group in self.container:
+                self.container.remove(group)
+        self.current = name
+        if previous is not None and previous != name and not self.cache:
+            self.release(previous)
+        elif self.memory_low():
+            self.release_hidden()
+        group = self._build(view)
+        if group not in self.container:
+            self.container.append(group)
+        self.switch_ms = (self.clock() - start) * 1000
+        return group
+
+    def prepare(self, name):
+        """Build ``name`` without showing it, so its first show is only a
+        switch. Does nothing when the cache is off or memory is low."""
+        if not self.cache or self.memory_low():
+            return None
+        return self._build(self.views[name])
+
+    def _build(self, view):
+        if view.group is None:
+            before = _mem_free()
+            view.group = view.build()
+            view.builds += 1
+            self.builds += 1
+            if before is not None:
+                gc.collect()
+                self.resident[view.name] = before - _mem_free()
+        return view.group
+
+    def release(self, name):
+        """Drop the group of ``name`` unless it is shown. Returns True if it
+        was released."""
+        view = self.views[name]
+        if name == self.current or view.group is None:
+            return False
+        for binding in view.bindings:
+            binding.detach()
+        if view.on_release is not None:
+            view.on_release()
+        view.group = None
+        self.releases += 1
+        gc.collect()
+        return True
+
+    def release_hidden(self):
+        """Release every built view but the shown one."""
+        for name in self.views:
+            self.release(name)
+
+    def memory_low(self):
+        """True if free memory is known and below ``low_memory``."""
+        free = _mem_free()
+        return free is not None and free < self.low_memory
+
+    def poll(self):
+        """Release hidden views if memory is low. For a scheduler task."""
+        if self.memory_low():
+            self.release_hidden()
@@ -0,0 +1,117 @@
+"""
+`view_model`
+====================================================
+
+Dirty-tracking layer between the app state and displayio widgets.
+
+Assigning ``Label.text`` relays out every glyph and marks the label dirty even
+when the string has not changed. A `Binding` remembers the last value it
+pushed to its widget attribute and only assigns when the value differs, and
+can hold back pushes that come faster than ``min_interval``. The `ViewModel`
+owns the bindings, pushes held back values in `ViewModel.flush`, and counts
+pushes so the refresh rate can be measured.
+
+A binding can outlive its widget. Bound to None, or after `Binding.detach`,
+it keeps the latest value, and `Binding.attach` pushes that value to a new
+widget. This is how a tab torn down by `view_manager.ViewManager` gets its
+state back when it is rebuilt.
+"""
+
+import time
+
+
+class Binding:
+    """One widget attribute, such as a label's ``text`` or ``color``.
+
+    Create these with `ViewModel.bind`.
+    """
+
+    def __init__(self, model, widget, attr, min_interval):
+        self.widget = widget
+        self.attr = attr
+        self.min_interval = min_interval
+        self._model = model
+        self._value = None if widget is None else getattr(widget, attr)
+        self._pending = None
+        self._dirty = False
+        self._last_push = -min_interval
+
+    @property
+    def value(self):
+        """The latest value, whether or not it has been pushed yet."""
+        return self._pending if self._dirty else self._value
+
+    def set(self, value):
+        """Push ``value`` to the widget if it changed and the rate limit allows."""
+        if value == self._value:
+            self._dirty = False
+            return
+        self._pending = value
+        self._dirty = True
+        self.flush()
+
+    def attach(self, widget):
+        """Bind to ``widget`` and push the latest value to it, if any."""
+        self.widget = widget
+        if self._dirty:
+            self.flush(force=True)
+        elif self._value is not None:
+            setattr(widget, self.attr, self._value)
+        else:
+            self._value = getattr(widget, self.attr)
+
+    def detach(self):
+        """Let go of the widget, keeping the value for the next `attach`."""
+        self.widget = None
+
+    def flush(self, force=False):
+        """Push a held back value once ``min_interval`` has passed."""
+        if not self._dirty or self.widget is None:
+            return
+        now = self._model.clock()
+        if not force and now - self._last_push < self.min_interval:
+            return
+        setattr(self.widget, self.attr, self._pending)
+        self._value = self._pending
+        self._pending = None
+        self._dirty = False
+        self._last_push = now
+        self._model.count_push(now)
+
+
+class ViewModel:
+    """Collection of `Binding` objects with a push counter.
+
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.bindings = []
+        self.pushes = 0
+        self.pushes_per_second = 0.0
+        self._window_start = clock()
+        self._window_pushes = 0
+
+    def bind(self, widget, attr="text", min_interval=0):
+        """Track ``widget.attr``, or just ``attr`` until a widget is attached
+        if ``widget`` is None. Returns the new `Binding`."""
+        binding = Binding(self, widget, attr, min_interval)
+        self.bindings.append(binding)
+        return binding
+
+    def flush(self):
+        """Push every held back value whose rate limit has passed."""
+        for binding in self.bindings:
+            binding.flush()
+        self.count_push(self.clock(), 0)
+
+    def count_push(self, now, count=1):
+        """Record pushes and roll the per second rate over once a second."""
+        self.pushes += count
+        self._window_pushes += count
+        elapsed = now - self._window_start
+        if elapsed >= 1:
+            self.pushes_per_second = self._window_pushes / elapsed
+            self._window_start = now
+            self._window_pushes = 0
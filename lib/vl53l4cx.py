@@ -1,80 +1,300 @@
+"""
+`vl53l4cx`
+====================================================
+
+Driver for the ST VL53L4CX time-of-flight ranging sensor.
+
+The register map, the default configuration block and the timing budget
+arithmetic follow ST's ultra lite driver for the VL53L4 family (the same
+sequence used by the VL53L4CD ULD), with 16-bit register addresses. The
+sensor ranges continuously, or autonomously at an inter-measurement period,
+and the host polls the data-ready flag instead of sleeping for a fixed time.
+Each result is read in one block transfer into a buffer allocated once, so a
+reading costs three bus transactions (data ready, result, interrupt clear)
+and no allocation.
+
+Only the single-target ranging of the ULD is supported. The multi-target
+histogram mode of the full VL53LX API is not.
+"""
+
+import struct
 import time
-import board
-import busio
+
 from adafruit_bus_device.i2c_device import I2CDevice
+from micropython import const
+
+_OSC_FREQUENCY = const(0x0006)
+_VHV_CONFIG_TIMEOUT_MACROP_LOOP_BOUND = const(0x0008)
+_XTALK_PLANE_OFFSET_KCPS = const(0x000B)
+_GPIO_HV_MUX_CTRL = const(0x0030)
+_GPIO_TIO_HV_STATUS = const(0x0031)
+_RANGE_CONFIG_A = const(0x005E)
+_RANGE_CONFIG_B = const(0x0061)
+_INTERMEASUREMENT_MS = const(0x006C)
+_SYSTEM_INTERRUPT_CLEAR = const(0x0086)
+_SYSTEM_START = const(0x0087)
+_RESULT_RANGE_STATUS = const(0x0089)
+_RESULT_OSC_CALIBRATE_VAL = const(0x00DE)
+_FIRMWARE_SYSTEM_STATUS = const(0x00E5)
+_IDENTIFICATION_MODEL_ID = const(0x010F)
+
+_MODEL_ID = const(0xEBAA)
+
+_START_CONTINUOUS = const(0x21)
+_START_AUTONOMOUS = const(0x40)
+_STOP = const(0x80)
+
+# RESULT__RANGE_STATUS to RESULT__DISTANCE, read in one transfer
+_RESULT_SIZE = const(15)
+
+# Device range status to the ULD range status (0 is a valid reading).
+_RANGE_STATUS = (255, 255, 255, 5, 2, 4, 1, 7, 3, 0, 255, 255, 9, 13, 255,
+                 255, 255, 255, 10, 6, 255, 255, 11, 12)
+
+# Written from 0x2D on at init, from ST's VL53L4CD_DEFAULT_CONFIGURATION.
+_DEFAULT_CONFIGURATION = bytes((
+    0x12, 0x00, 0x00, 0x11, 0x02, 0x00, 0x02, 0x08, 0x00, 0x08, 0x10, 0x01,
+    0x01, 0x00, 0x00, 0x00, 0x00, 0xFF, 0x00, 0x0F, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x20, 0x0B, 0x00, 0x00, 0x02, 0x14, 0x21, 0x00, 0x00, 0x05, 0x00,
+    0x00, 0x00, 0x00, 0xC8, 0x00, 0x00, 0x38, 0xFF, 0x01, 0x00, 0x08, 0x00,
+    0x00, 0x01, 0xCC, 0x07, 0x01, 0xF1, 0x05, 0x00, 0xA0, 0x00, 0x80, 0x08,
+    0x38, 0x00, 0x00, 0x00, 0x00, 0x0F, 0x89, 0x00, 0x00, 0x00, 0x00, 0x00,
+    0x00, 0x00, 0x01, 0x07, 0x05, 0x06, 0x06, 0x00, 0x00, 0x02, 0xC7, 0xFF,
+    0x9B, 0x00, 0x00, 0x00, 0x01, 0x00, 0x00,
+))
+_DEFAULT_CONFIGURATION_START = const(0x2D)
 
-# This is a very minimal example and not a full-featured driver.
-# You must consult the VL53L4CX datasheet for the proper initialization sequence
-# and register settings for your application.
 
 class VL53L4CX:
-    def __init__(self, i2c, address=0x29):
+    """Continuous ranging with a VL53L4CX.
+
+    :param i2c: The ``busio.I2C`` bus the sensor is on.
+    :param int address: The I2C address, 0x29 by default.
+    :param int timing_budget: Milliseconds each measurement integrates,
+        10 to 200.
+    :param int inter_measurement: Milliseconds between measurements, or 0 to
+        range back to back. Must be 0 or more than ``timing_budget``.
+    :param float poll_interval: Seconds slept between data-ready polls in
+        `read_distance`.
+
+    After a reading, ``range_status`` is 0 for a valid distance, ``sigma``
+    is the estimated standard deviation in mm and ``signal_rate`` the return
+    signal in kcps.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, i2c, address=0x29, *, timing_budget=50, inter_measurement=0,
+                 poll_interval=0.002):
         self.i2c_device = I2CDevice(i2c, address)
-        self.address = address
-        self._initialize_sensor()
-
-    def _write_register(self, register, data):
-        # Accepts data as a byte or sequence of bytes.
-        # Example: _write_register(0x00, bytes([0x01]))
-        if type(data) is int:
-            data = bytes([data])
+        self.poll_interval = poll_interval
+        self._out = bytearray(6)
+        self._result = bytearray(_RESULT_SIZE)
+        self._ranging = False
+        self.distance = None
+        self.range_status = 255
+        self.sigma = 0
+        self.signal_rate = 0
+        self.measurements = 0
+        self._wait_for_boot()
+        if self.model_id != _MODEL_ID:
+            raise RuntimeError("VL53L4CX not found, model id 0x{:04x}".format(self.model_id))
+        self._init_sensor()
+        self._inter_measurement = 0
+        self.inter_measurement = inter_measurement
+        self.timing_budget = timing_budget
+
+    # Register access, all through the preallocated buffers.
+
+    def _address(self, register):
+        self._out[0] = register >> 8
+        self._out[1] = register & 0xFF
+
+    def _read_into(self, register, buffer, end=None):
+        self._address(register)
+        with self.i2c_device as i2c:
+            i2c.write_then_readinto(self._out, buffer, out_end=2, in_end=end)
+
+    def _read_u8(self, register):
+        self._read_into(register, self._result, 1)
+        return self._result[0]
+
+    def _read_u16(self, register):
+        self._read_into(register, self._result, 2)
+        return self._result[0] << 8 | self._result[1]
+
+    def _write_u8(self, register, value):
+        self._address(register)
+        self._out[2] = value
         with self.i2c_device as i2c:
-            i2c.write(bytes([register]) + data)
+            i2c.write(self._out, end=3)
 
-    def _read_register(self, register, length=1):
-        result = bytearray(length)
+    def _write_u16(self, register, value):
+        self._address(register)
+        self._out[2] = value >> 8
+        self._out[3] = value & 0xFF
         with self.i2c_device as i2c:
-            i2c.write_then_readinto(bytes([register]), result)
-        return result
-
-    def _initialize_sensor(self):
-        # This function should contain all the register settings recommended by ST.
-        # The following are placeholder commands.
-        print("Initializing VL53L4CX...")
-        # (1) Software reset, for example:
-        self._write_register(0x00, 0x01)  # This is an example; refer to the datasheet!
-        time.sleep(0.1)
-
-        # (2) Set the sensor to the proper operating mode.
-        # You may need to write several registers here as described in the VL53L4CX API.
-        self._write_register(0x01, 0x02)  # Placeholder command
-
-        # (3) Calibration and configuration.
-        # More registers need to be configured for accurate ranging.
-        # Continue initializing registers as per the datasheet...
-        time.sleep(0.1)
-        print("Initialization done.")
-
-    def start_measurement(self):
-        # This method would trigger a range measurement.
-        # Again, the actual register and data to start a measurement are sensor-specific.
-        self._write_register(0x00, 0x01)  # Trigger measurement (example)
-        time.sleep(0.05)  # Allow time for the measurement to occur
-
-    def read_distance(self):
-        # Start a measurement and then read back the result.
-        self.start_measurement()
-        # In a full driver, you would check status registers to ensure the measurement is complete.
-        # Assume that the result is available in two registers (high byte and low byte)
-        high = self._read_register(0x14)[0]  # Example register address
-        low = self._read_register(0x15)[0]   # Example register address
-        # Combine high and low to form a distance in millimeters.
-        distance = (high << 8) | low
-        return distance
-
-# Example usage:
-i2c = busio.I2C(board.SCL, board.SDA)
-# Wait until the I2C bus is ready.
-while not i2c.try_lock():
-    pass
-
-sensor = VL53L4CX(i2c)
-
-try:
-    while True:
-        dist_mm = sensor.read_distance()
-        print("Distance: {} mm".format(dist_mm))
-        time.sleep(1)
-finally:
-    i2c.unlock()
-# Write your code here :-)
+            i2c.write(self._out, end=4)
+
+    def _write_u32(self, register, value):
+        self._address(register)
+        struct.pack_into(">I", self._out, 2, value)
+        with self.i2c_device as i2c:
+            i2c.write(self._out, end=6)
+
+    # Setup
+
+    def _wait_for_boot(self, timeout=1.0):
+        start = time.monotonic()
+        while True:
+            try:
+                if self._read_u8(_FIRMWARE_SYSTEM_STATUS) == 0x03:
+                    return
+            except OSError:
+                # The sensor NAKs while it boots.
+                pass
+            if time.monotonic() - start > timeout:
+                raise RuntimeError("VL53L4CX did not boot")
+            time.sleep(0.001)
+
+    def _init_sensor(self):
+        with self.i2c_device as i2c:
+            i2c.write(bytes((0x00, _DEFAULT_CONFIGURATION_START)) + _DEFAULT_CONFIGURATION)
+        # Data ready is the interrupt line level, active low by default.
+        self._ready_level = 0 if self._read_u8(_GPIO_HV_MUX_CTRL) & 0x10 else 1
+        # One measurement runs the VHV calibration.
+        self._write_u8(_SYSTEM_START, _START_AUTONOMOUS)
+        self._wait_for_data_ready(1.0)
+        self.clear_interrupt()
+        self._write_u8(_SYSTEM_START, _STOP)
+        self._write_u8(_VHV_CONFIG_TIMEOUT_MACROP_LOOP_BOUND, 0x09)
+        self._write_u8(_XTALK_PLANE_OFFSET_KCPS, 0x00)
+        self._write_u16(0x0024, 0x0500)
+
+    @property
+    def model_id(self):
+        """The model and module type, 0xEBAA for the VL53L4 family."""
+        return self._read_u16(_IDENTIFICATION_MODEL_ID)
+
+    @property
+    def inter_measurement(self):
+        """Milliseconds between measurements, 0 when ranging back to back."""
+        return self._inter_measurement
+
+    @inter_measurement.setter
+    def inter_measurement(self, value):
+        if value and value <= getattr(self, "_timing_budget", 0):
+            raise ValueError("Inter-measurement period must be more than the timing budget")
+        if value:
+            clock_pll = self._read_u16(_RESULT_OSC_CALIBRATE_VAL) & 0x3FF
+            self._write_u32(_INTERMEASUREMENT_MS, int(1.055 * value * clock_pll))
+        else:
+            self._write_u32(_INTERMEASUREMENT_MS, 0)
+        self._inter_measurement = value
+        if hasattr(self, "_timing_budget"):
+            # The budget encoding depends on the mode.
+            self.timing_budget = self._timing_budget
+
+    @property
+    def timing_budget(self):
+        """Milliseconds each measurement integrates, 10 to 200. Longer is
+        more accurate and reaches further. Set it while stopped; it takes
+        effect at the next `start_ranging`."""
+        return self._timing_budget
+
+    @timing_budget.setter
+    def timing_budget(self, value):
+        if not 10 <= value <= 200:
+            raise ValueError("Timing budget must be 10 to 200 ms")
+        if self._inter_measurement and value >= self._inter_measurement:
+            raise ValueError("Timing budget must be less than the inter-measurement period")
+        osc_frequency = self._read_u16(_OSC_FREQUENCY)
+        if osc_frequency == 0:
+            raise RuntimeError("VL53L4CX oscillator frequency is 0")
+        macro_period_us = int(2304 * (0x40000000 / osc_frequency)) >> 6
+        budget_us = value * 1000
+        if self._inter_measurement:
+            budget_us = (budget_us - 4300) // 2
+        else:
+            budget_us -= 2500
+        budget_us <<= 12
+        self._write_u16(_RANGE_CONFIG_A, self._encode_timeout(budget_us, macro_period_us * 16))
+        self._write_u16(_RANGE_CONFIG_B, self._encode_timeout(budget_us, macro_period_us * 12))
+        self._timing_budget = value
+
+    @staticmethod
+    def _encode_timeout(budget_us, period):
+        period >>= 6
+        ls_byte = int((budget_us + (period >> 1)) / period) - 1
+        ms_byte = 0
+        while ls_byte & 0xFFFFFF00:
+            ls_byte >>= 1
+            ms_byte += 1
+        return (ms_byte << 8) | (ls_byte & 0xFF)
+
+    # Ranging
+
+    def start_ranging(self):
+        """Start continuous (or autonomous, with an inter-measurement period)
+        ranging."""
+        self._write_u8(_SYSTEM_START,
+                       _START_AUTONOMOUS if self._inter_measurement else _START_CONTINUOUS)
+        self._ranging = True
+
+    def stop_ranging(self):
+        """Stop ranging."""
+        self._write_u8(_SYSTEM_START, _STOP)
+        self._ranging = False
+
+    @property
+    def data_ready(self):
+        """True when a new measurement can be read."""
+        return self._read_u8(_GPIO_TIO_HV_STATUS) & 0x01 == self._ready_level
+
+    def clear_interrupt(self):
+        """Release the result registers for the next measurement."""
+        self._write_u8(_SYSTEM_INTERRUPT_CLEAR, 0x01)
+
+    def _wait_for_data_ready(self, timeout):
+        start = time.monotonic()
+        while not self.data_ready:
+            if time.monotonic() - start > timeout:
+                raise RuntimeError("VL53L4CX measurement timed out")
+            time.sleep(0.001)
+
+    def read_result(self):
+        """Read the measurement that is ready, in one transfer, and clear the
+        interrupt. Returns the distance in mm, also kept in ``distance``."""
+        result = self._result
+        self._read_into(_RESULT_RANGE_STATUS, result)
+        status = result[0] & 0x1F
+        self.range_status = _RANGE_STATUS[status] if status < len(_RANGE_STATUS) else 255
+        # Offsets from 0x0089: signal rate 0x8E, sigma 0x92, distance 0x96.
+        self.signal_rate = (result[5] << 8 | result[6]) * 8
+        self.sigma = (result[9] << 8 | result[10]) // 4
+        self.distance = result[13] << 8 | result[14]
+        self.clear_interrupt()
+        self.measurements += 1
+        return self.distance
+
+    def poll(self):
+        """Read the next measurement if it is ready. Returns True if one was
+        read. Starts ranging on the first call."""
+        if not self._ranging:
+            self.start_ranging()
+            return False
+        if not self.data_ready:
+            return False
+        self.read_result()
+        return True
+
+    def read_distance(self, timeout=1.0):
+        """Wait for the next measurement and return its distance in mm."""
+        if not self._ranging:
+            self.start_ranging()
+        start = time.monotonic()
+        while not self.data_ready:
+            if time.monotonic() - start > timeout:
+                raise RuntimeError("VL53L4CX measurement timed out")
+            time.sleep(self.poll_interval)
+        return self.read_result()
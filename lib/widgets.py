@@ -0,0 +1,223 @@
+"""
+`widgets`
+====================================================
+
+Widget builders shared by the tabs of code.py.
+
+They take everything they draw as arguments and keep no state, so they can
+live in ``lib/`` and ship as ``.mpy`` (see ``tools/build_mpy.py``) instead
+of being compiled from source with code.py on every boot.
+"""
+
+import displayio
+import terminalio
+from adafruit_display_shapes.rect import Rect
+from adafruit_display_text.label import Label
+
+# Kp bar colors: background, quiet, active (Kp 4), storm (Kp 5 and up)
+KP_COLORS = (0x000022, 0x00FF00, 0xFFFF00, 0xFF0000)
+
+
+def add_label(group, binding, font, text, color, x, y, scale=1):
+    """Append a ``Label`` to ``group`` and attach ``binding`` to it, if any.
+    Returns the label."""
+    label = Label(font=font, text=text, color=color, scale=scale)
+    label.x = x
+    label.y = y
+    group.append(label)
+    if binding is not None:
+        binding.attach(label)
+    return label
+
+
+def add_centred_label(group, binding, font, text, color, x, y, width, height):
+    """`add_label` anchored at the centre of the given box, as a
+    ``Button`` places its label. Returns the label."""
+    label = Label(font=font, text=text, color=color, anchor_point=(0.5, 0.5),
+                  anchored_position=(x + width // 2, y + height // 2))
+    group.append(label)
+    if binding is not None:
+        binding.attach(label)
+    return label
+
+
+def calibration_button(x, y, width, height, text, fill_color=0xBF0F0F, text_color=0xFFFFFF,
+                       scale=1):
+    """A filled rectangle with a text label, as a dict with its ``group``,
+    bounds and ``label``."""
+    grp = displayio.Group()
+    rect = Rect(x, y, width, height, fill=fill_color)
+    grp.append(rect)
+    label = Label(font=terminalio.FONT, text=text, color=text_color, scale=scale)
+    label.x = x + 3
+    label.y = y + 3
+    grp.append(label)
+    return {"group": grp, "x": x, "y": y, "width": width, "height": height, "label": label}
+
+
+def _centre_label(button, dx, dy):
+    button["label"].x = button["x"] + dx
+    button["label"].y = button["y"] + dy
+
+
+def build_calibration_window(k_alpha, history_unit, profile_name):
+    """The calibration window group and a dict of its labels and buttons:
+    ``label_k``, ``button_k_minus``, ``button_k_plus``, ``label_t``,
+    ``button_t_minus``, ``button_t_plus``, ``label_profile``, ``label_status``,
+    ``button_profile``, ``button_auto``, ``button_save`` and ``button_done``."""
+    grp = displayio.Group()
+    title_label = Label(font=terminalio.FONT, text="Calibration", color=0x00FFFF, scale=2)
+    title_label.x = 50
+    title_label.y = 20
+    grp.append(title_label)
+
+    label_k = Label(font=terminalio.FONT, text="K: {:.3f}".format(k_alpha), color=0xFFFFFF,
+                    scale=2)
+    label_k.x = 60
+    label_k.y = 50
+    grp.append(label_k)
+
+    button_k_minus = calibration_button(70, 65, 30, 20, "-", fill_color=0xBF0F0F,
+                                        text_color=0xFFFFFF, scale=2)
+    button_k_plus = calibration_button(140, 65, 30, 20, "+", fill_color=0xB9C92F,
+                                       text_color=0x11709F, scale=2)
+    grp.append(button_k_minus["group"])
+    grp.append(button_k_plus["group"])
+    _centre_label(button_k_minus, 10, 9)
+    _centre_label(button_k_plus, 10, 9)
+
+    label_t = Label(font=terminalio.FONT, text="Time: {:g}s".format(history_unit),
+                    color=0xFFFFFF, scale=2)
+    label_t.x = 60
+    label_t.y = 105
+    grp.append(label_t)
+
+    button_t_minus = calibration_button(70, 120, 30, 20, "-", fill_color=0xBF0F0F,
+                                        text_color=0xFFFFFF, scale=2)
+    button_t_plus = calibration_button(140, 120, 30, 20, "+", fill_color=0xB9C92F,
+                                       text_color=0x11709F, scale=2)
+    grp.append(button_t_minus["group"])
+    grp.append(button_t_plus["group"])
+    _centre_label(button_t_minus, 10, 9)
+    _centre_label(button_t_plus, 10, 9)
+
+    label_profile = Label(font=terminalio.FONT, text="Profile: {}".format(profile_name),
+                          color=0xFFFFFF, scale=2)
+    label_profile.x = 60
+    label_profile.y = 158
+    grp.append(label_profile)
+
+    label_status = Label(font=terminalio.FONT, text="", color=0xFFFF00)
+    label_status.x = 60
+    label_status.y = 180
+    grp.append(label_status)
+
+    button_profile = calibration_button(10, 195, 90, 30, "PROFILE", fill_color=0x11709F,
+                                        scale=2)
+    button_auto = calibration_button(110, 195, 60, 30, "AUTO", fill_color=0x11709F, scale=2)
+    button_save = calibration_button(180, 195, 60, 30, "SAVE", fill_color=0x11709F, scale=2)
+    button_done = calibration_button(250, 195, 60, 30, "DONE", fill_color=0x11709F, scale=2)
+    # terminalio glyphs are 6 pixels wide, 12 at scale 2
+    for button in (button_profile, button_auto, button_save, button_done):
+        grp.append(button["group"])
+        _centre_label(button, (button["width"] - len(button["label"].text) * 12) // 2, 15)
+
+    elements = {
+        "label_k": label_k,
+        "button_k_minus": button_k_minus,
+        "button_k_plus": button_k_plus,
+        "label_t": label_t,
+        "button_t_minus": button_t_minus,
+        "button_t_plus": button_t_plus,
+        "label_profile": label_profile,
+        "label_status": label_status,
+        "button_profile": button_profile,
+        "button_auto": button_auto,
+        "button_save": button_save,
+        "button_done": button_done,
+    }
+    return grp, elements
+
+
+def palette_grid(width, height, colors, x, y):
+    """A palette-indexed bitmap in ``colors`` (index 0 is the background) and
+    the ``TileGrid`` showing it at ``(x, y)``. Returns ``(bitmap, tile_grid)``."""
+    bitmap = displayio.Bitmap(width, height, len(colors))
+    palette = displayio.Palette(len(colors))
+    for i, color in enumerate(colors):
+        palette[i] = color
+    return bitmap, displayio.TileGrid(bitmap, pixel_shader=palette, x=x, y=y)
+
+
+def solid_rect(x, y, width, height, color):
+    """A ``TileGrid`` filling the box with ``color`` by repeating one solid
+    tile, whose side divides both of the box's. A ``Rect`` keeps a bit per
+    pixel; this keeps one small tile and an index per tile. The tile is
+    the common divisor that needs the fewest bytes for both."""
+    best = None
+    for side in range(1, min(width, height) + 1):
+        if width % side or height % side:
+            continue
+        size = (side + 31) // 32 * 4 * side + (width // side) * (height // side)
+        if best is None or size < best[0]:
+            best = (size, side)
+    side = best[1]
+    palette = displayio.Palette(1)
+    palette[0] = color
+    return displayio.TileGrid(displayio.Bitmap(side, side, 1), pixel_shader=palette,
+                              width=width // side, height=height // side,
+                              tile_width=side, tile_height=side, x=x, y=y)
+
+
+def kp_bar_grid(count, bar_width, gap, height, x, y):
+    """`palette_grid` sized for ``count`` Kp bars."""
+    return palette_grid(count * (bar_width + gap), height, KP_COLORS, x, y)
+
+
+def draw_kp_bars(bitmap, values, bar_width, gap):
+    """Redraw ``bitmap`` with one bar per Kp value, scaled so Kp 9 fills
+    its height."""
+    height = bitmap.height
+    bitmap.fill(0)
+    for i, kp in enumerate(values):
+        if kp >= 5:
+            color = 3
+        elif kp >= 4:
+            color = 2
+        else:
+            color = 1
+        bar = min(height, max(1, int(kp * height / 9)))
+        left = i * (bar_width + gap)
+        for x in range(left, left + bar_width):
+            for y in range(height - bar, height):
+                bitmap[x, y] = color
+
+
+def draw_sparkline(bitmap, series, metric, color):
+    """Draw ``metric`` of a `timeseries.TimeSeries` into ``bitmap`` in
+    palette index ``color``, scaled to the metric's stored range. Each column
+    is a stroke from the bucket's minimum to its maximum, stretched to meet
+    the previous column. The bitmap is not cleared first."""
+    limits = series.limits(metric)
+    if limits is None:
+        return
+    lowest, highest = limits
+    bottom_row = bitmap.height - 1
+    scale = bottom_row / (highest - lowest) if highest > lowest else 0
+    low = series.low[metric]
+    high = series.high[metric]
+    previous = None
+    for x in range(min(bitmap.width, series.width)):
+        slot = series.slot(x)
+        if low[slot] != low[slot]:  # NaN: empty bucket
+            previous = None
+            continue
+        top = bottom_row - int((high[slot] - lowest) * scale)
+        bottom = bottom_row - int((low[slot] - lowest) * scale)
+        first, last = top, bottom
+        if previous is not None:
+            first = min(top, previous[1])
+            last = max(bottom, previous[0])
+        previous = (top, bottom)
+        for y in range(first, last + 1):
+            bitmap[x, y] = color
@@ -0,0 +1,170 @@
+"""
+`wifi_manager`
+====================================================
+
+Non-blocking Wi-Fi connection state machine for the ESP32 co-processor.
+
+``PyPortal.network.connect()`` calls ``ESP_SPIcontrol.connect_AP``, which
+sleeps in a loop until the access point answers or the attempts run out, so
+the whole UI stops while it connects. The manager instead sends the
+credentials with ``wifi_set_passphrase`` and then checks ``status`` once per
+`WiFiManager.poll`, which the scheduler calls every tick it is due::
+
+    IDLE --connect()--> CONNECTING --status ok--> CONNECTED
+                          |   ^                      |
+               timeout or |   | retry time      link |
+                   failed v   |                 gone v
+                         BACKOFF <-----failed----- LOST
+
+A lost link stays LOST for one ``check_interval``, so the UI can show it,
+then is retried, then with exponential backoff.
+"""
+
+import time
+
+IDLE = 0
+CONNECTING = 1
+CONNECTED = 2
+LOST = 3
+BACKOFF = 4
+
+STATE_NAMES = ("IDLE", "CONNECTING", "CONNECTED", "LOST", "BACKOFF")
+
+# ESP32 SPI firmware status codes
+_WL_NO_SSID_AVAIL = 1
+_WL_CONNECTED = 3
+_WL_CONNECT_FAILED = 4
+
+
+class WiFiManager:
+    """Connects ``esp`` to an access point and keeps it connected.
+
+    :param esp: The ``adafruit_esp32spi.ESP_SPIcontrol`` of the PyPortal.
+    :param str ssid: Access point name.
+    :param str password: Access point passphrase.
+    :param float timeout: Seconds an attempt may take.
+    :param float backoff: Seconds before the first retry, doubled for each
+        further failure up to ``max_backoff``.
+    :param float check_interval: Seconds between link checks while connected.
+    :param on_change: (optional) Called with the new state on every change.
+    :param clock: Returns the time in seconds, defaults to ``time.monotonic``.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, esp, ssid, password, *, timeout=10, backoff=5, max_backoff=300,
+                 check_interval=5, on_change=None, clock=time.monotonic):
+        self.esp = esp
+        self._ssid = bytes(ssid, "utf-8")
+        self._password = bytes(password, "utf-8")
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self.clock = clock
+        self.state = IDLE
+        self.rssi = None
+        self.failures = 0
+        self.attempts = 0
+        self.drops = 0
+        self._started = 0
+        self._retry_at = 0
+
+    @property
+    def connected(self):
+        """True while the link is up."""
+        return self.state == CONNECTED
+
+    @property
+    def state_name(self):
+        """The state as text, for display."""
+        return STATE_NAMES[self.state]
+
+    @property
+    def retry_in(self):
+        """Seconds until the next attempt while in BACKOFF, else 0."""
+        if self.state != BACKOFF:
+            return 0
+        return max(0, self._retry_at - self.clock())
+
+    def connect(self):
+        """Start connecting now, unless an attempt is under way."""
+        if self.state in (IDLE, LOST, BACKOFF):
+            self.failures = 0
+            self._start()
+
+    def disconnect(self):
+        """Drop the link and stop reconnecting."""
+        try:
+            self.esp.disconnect()
+        except (OSError, RuntimeError):
+            pass
+        self.rssi = None
+        self._set(IDLE)
+
+    def poll(self):
+        """Advance the state machine. Returns the seconds until the next
+        call is useful, so it can be used as a scheduler task."""
+        state = self.state
+        if state == CONNECTING:
+            return self._poll_connecting()
+        if state == CONNECTED:
+            try:
+                up = self.esp.status == _WL_CONNECTED
+                if up:
+                    self.rssi = self.esp.rssi
+            except (OSError, RuntimeError):
+                up = False
+            if not up:
+                self.drops += 1
+                self.rssi = None
+                self._retry_at = self.clock() + self.check_interval
+                self._set(LOST)
+                return self.check_interval
+            return self.check_interval
+        if state in (LOST, BACKOFF):
+            wait = self._retry_at - self.clock()
+            if wait <= 0:
+                self._start()
+                return 0.25
+            return wait
+        return None
+
+    def _poll_connecting(self):
+        try:
+            status = self.esp.status
+        except (OSError, RuntimeError):
+            status = None
+        if status == _WL_CONNECTED:
+            self.failures = 0
+            try:
+                self.rssi = self.esp.rssi
+            except (OSError, RuntimeError):
+                self.rssi = None
+            self._set(CONNECTED)
+            return self.check_interval
+        if (status in (_WL_NO_SSID_AVAIL, _WL_CONNECT_FAILED)
+                or self.clock() - self._started > self.timeout):
+            self.failures += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+            self._retry_at = self.clock() + delay
+            self._set(BACKOFF)
+            return delay
+        return 0.25
+
+    def _start(self):
+        self.attempts += 1
+        self._started = self.clock()
+        try:
+            self.esp.wifi_set_passphrase(self._ssid, self._password)
+        except (OSError, RuntimeError):
+            # Counted as a failed attempt by the timeout.
+            pass
+        self._set(CONNECTING)
+
+    def _set(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_change:
+                self.on_change(state)
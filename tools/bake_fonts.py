@@ -0,0 +1,148 @@
+"""Bake the BDF fonts down to the glyphs code.py can display.
+
+Usage::
+
+    python tools/bake_fonts.py [--check] [fonts/Name.bdf ...]
+
+Writes ``fonts/Name.pfnt`` next to each BDF (all of fonts/ by default) in
+the format read by ``lib/baked_font.py``. The glyph set is every character
+in a string literal of code.py plus the digits and number punctuation, so
+re-run this after changing any label text. ``--check`` writes nothing and
+exits with status 1 if a baked file is missing or differs from what would
+be written, as it does when code.py has new label text.
+"""
+
+import argparse
+import ast
+import glob
+import os
+import struct
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+import baked_font  # noqa: E402  pylint: disable=wrong-import-position
+
+ALWAYS = "0123456789.-+:% "
+
+
+def used_characters(path):
+    """Every character in a string literal of the Python file at ``path``."""
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    chars = set(ALWAYS)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            chars.update(node.value)
+    return chars
+
+
+def parse_bdf(path):
+    """Return ``(properties, glyphs)`` from a BDF file. Glyphs map codepoint to
+    a dict with the ``bbx``, ``shift`` and ``rows`` of the glyph, each row a
+    ``(value, bits)`` pair with the leftmost pixel in the top bit."""
+    properties = {}
+    glyphs = {}
+    glyph = None
+    rows = None
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+            key = parts[0]
+            if rows is not None:
+                if key == "ENDCHAR":
+                    glyph["rows"] = rows
+                    if glyph.get("encoding", -1) >= 0:
+                        glyphs[glyph["encoding"]] = glyph
+                    glyph = None
+                    rows = None
+                else:
+                    rows.append((int(key, 16), len(key) * 4))
+            elif key == "STARTCHAR":
+                glyph = {}
+            elif glyph is not None:
+                if key == "ENCODING":
+                    glyph["encoding"] = int(parts[1])
+                elif key == "DWIDTH":
+                    glyph["shift"] = (int(parts[1]), int(parts[2]))
+                elif key == "BBX":
+                    glyph["bbx"] = tuple(int(p) for p in parts[1:5])
+                elif key == "BITMAP":
+                    rows = []
+            elif key in ("FONTBOUNDINGBOX", "FONT_ASCENT", "FONT_DESCENT"):
+                properties[key] = [int(p) for p in parts[1:]]
+    return properties, glyphs
+
+
+def pack_glyph(glyph):
+    """The baked glyph record for a parsed BDF glyph."""
+    width, height, dx, dy = glyph["bbx"]
+    shift_x, shift_y = glyph.get("shift", (width, 0))
+    stride = (width + 7) // 8
+    data = bytearray(struct.pack(baked_font.GLYPH, width, height, dx, dy, shift_x, shift_y))
+    for value, bits in glyph["rows"][:height]:
+        # BDF rows are padded to whole bytes, keep the leftmost ``width`` bits.
+        value >>= max(0, bits - stride * 8)
+        data += value.to_bytes(stride, "big")
+    data += bytes(stride * max(0, height - len(glyph["rows"])))
+    return bytes(data)
+
+
+def bake(bdf_path, chars):
+    """Bake a font. Returns ``(baked file contents, glyphs baked, glyphs in
+    the BDF)``."""
+    properties, glyphs = parse_bdf(bdf_path)
+    codepoints = sorted(ord(c) for c in chars if ord(c) in glyphs and ord(c) <= 0xFFFF)
+    width, height, x, y = properties["FONTBOUNDINGBOX"]
+    ascent = properties.get("FONT_ASCENT", [height + y])[0]
+    descent = properties.get("FONT_DESCENT", [-y])[0]
+    header = struct.pack(baked_font.HEADER, baked_font.MAGIC, baked_font.VERSION, 0,
+                         len(codepoints), width, height, x, y, ascent, descent)
+    offset = len(header) + len(codepoints) * struct.calcsize(baked_font.INDEX_ENTRY)
+    index = b""
+    records = b""
+    for codepoint in codepoints:
+        record = pack_glyph(glyphs[codepoint])
+        index += struct.pack(baked_font.INDEX_ENTRY, codepoint, offset + len(records))
+        records += record
+    return header + index + records, len(codepoints), len(glyphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fonts", nargs="*",
+                        default=sorted(glob.glob(os.path.join(ROOT, "fonts", "*.bdf"))))
+    parser.add_argument("--source", default=os.path.join(ROOT, "code.py"),
+                        help="Python file whose string literals set the glyph set")
+    parser.add_argument("--check", action="store_true",
+                        help="only check the baked files are up to date")
+    args = parser.parse_args()
+    chars = used_characters(args.source)
+    stale = []
+    for path in args.fonts:
+        data, baked, total = bake(path, chars)
+        out_path = os.path.splitext(path)[0] + ".pfnt"
+        if args.check:
+            try:
+                with open(out_path, "rb") as file:
+                    current = file.read() == data
+            except OSError:
+                current = False
+            if not current:
+                stale.append(os.path.basename(out_path))
+            print("{}: {}".format(os.path.basename(out_path), "ok" if current else "stale"))
+            continue
+        with open(out_path, "wb") as file:
+            file.write(data)
+        print("{}: {} of {} glyphs, {} -> {} bytes".format(
+            os.path.basename(path), baked, total, os.path.getsize(path), len(data)))
+    if stale:
+        print("Re-run tools/bake_fonts.py to update " + ", ".join(stale))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
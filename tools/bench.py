@@ -0,0 +1,417 @@
+"""Benchmark the sketch's hot paths and the sensor drivers on the host.
+
+Usage::
+
+    python tools/bench.py [--only NAME ...] [--json report.json]
+                          [--compare baseline.json] [--threshold 20]
+                          [--bitmap-font DIR]
+
+code.py is imported as in `run_headless`, on the `pyportal_hal.sim`
+stand-ins with their fixed random seeds, and each benchmark calls one
+function a fixed number of times. For each one the report gives:
+
+* ``ops_per_second``: the median of ``--repeats`` timed runs of at least
+  0.2 s each, with tracing off,
+* ``relative_speed``: the median of the same runs' speeds over that of
+  `reference_work` timed right after each, which cancels the host speeding
+  up or slowing down between and within runs,
+* ``spread_percent``: half the interquartile range of those relative
+  speeds, as a percentage of their median,
+* ``allocations``: memory blocks still allocated per call afterwards,
+* ``allocated_bytes``: bytes still allocated per call afterwards,
+* ``peak_bytes``: the highest heap use above the starting point during a
+  single call.
+
+The last three come from ``tracemalloc`` over ``calls`` calls. The
+simulated hardware uses fixed random seeds, so runs differ only by timing
+noise. ``--compare`` prints the change in relative speed from an earlier
+``--json`` report and exits with status 1 if a benchmark is slower by more
+than ``--threshold`` percent and by more than three standard errors of the
+difference between the two medians (estimated from the spreads), or its
+peak memory grew by more than ``--threshold`` percent and at least 256
+bytes. On a quiet host, comparing a tree with itself moves medians by up to
+about 17%.
+
+The report's ``fonts`` section gives the boot cost of each font in fonts/:
+the best time of ``--repeats`` loads of the font and the glyphs code.py
+shows, the heap the loaded font holds and the peak heap while loading. It is measured for the file baked
+by tools/bake_fonts.py and, when ``--bitmap-font`` names a directory with
+the ``adafruit_bitmap_font`` sources (lib/ only has its .mpy build), for
+the BDF through that library, as code.py loaded it before.
+"""
+
+import argparse
+import asyncio  # noqa: F401  imported up front, as in run_headless
+import gc
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+from run_headless import load_app  # noqa: E402
+
+# A touch on the UV tab button and one outside every button
+TOUCH_HIT = (187, 215)
+TOUCH_MISS = (5, 100)
+
+# Peak growth in bytes ignored by --compare, for dict and list resizes
+PEAK_SLACK = 256
+# Standard error of a median, in half interquartile ranges over the square
+# root of the runs, for roughly normal timings
+MEDIAN_ERROR = 1.86
+# Standard errors of the difference a median may move by before --compare
+# counts it as slower
+ERROR_FACTOR = 3
+
+
+def run_generator(generator):
+    """Drive a scheduler generator task to the end and return its result."""
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+def sketch_benchmarks(app):
+    """``{name: (function, calls)}`` for the code.py functions."""
+    def update_display(view):
+        def call():
+            app.view_live = view
+            app.update_display()
+        return call
+
+    def solar(fresh):
+        def call():
+            if fresh:
+                app.noaa_client().forget()
+            run_generator(app.update_solar_wind())
+            assert app.status_text.value != "DATA UNAVAILABLE"
+        return call
+
+    views = ["Radiation", "UV", "Probes"]
+
+    def switch_view():
+        views.append(views.pop(0))
+        app.switch_view(views[0])
+
+    return {
+        "process_radiation": (app.process_radiation, 2000),
+        "calculate_cpm": (app.calculate_cpm, 5000),
+        "update_display_radiation": (update_display("Radiation"), 500),
+        "update_display_uv": (update_display("UV"), 500),
+        "update_display_probes": (update_display("Probes"), 500),
+        "update_solar_wind": (solar(True), 20),
+        "update_solar_wind_304": (solar(False), 50),
+        "redraw_sparkline": (app.redraw_sparkline, 100),
+        "switch_view": (switch_view, 200),
+        "touch_find_hit": (lambda: app.router.find(*TOUCH_HIT), 20000),
+        "touch_find_miss": (lambda: app.router.find(*TOUCH_MISS), 20000),
+    }
+
+
+class LegacyHistory:
+    """The count history code.py kept before `dose_accumulator`: a list of
+    per-unit counts summed again on every read."""
+
+    def __init__(self, length, unit=60, k_alpha=53.032):
+        self.counts = [0] * length
+        self.index = 0
+        self.filled = 0
+        self.unit = unit
+        self.k_alpha = k_alpha
+
+    def add(self, count):
+        self.counts[self.index] = count
+        self.index = (self.index + 1) % len(self.counts)
+        self.filled = min(self.filled + 1, len(self.counts))
+
+    def cpm(self):
+        return (sum(self.counts) * 60) / (self.filled * self.unit) if self.filled else 0
+
+    def read(self):
+        # What one Radiation display pass read: the offline check, the CPM
+        # and the dose, which worked the CPM out again.
+        if sum(self.counts) == 0:
+            return None
+        return self.cpm(), self.cpm() / self.k_alpha
+
+
+def dose_benchmarks():
+    """``{name: (function, calls)}`` for the count history, old and new,
+    at code.py's 60 slots and at 720. The new reads cover everything the
+    Radiation tab shows now: CPM, dose, its interval and two windows."""
+    from dose_accumulator import DoseAccumulator  # pylint: disable=import-outside-toplevel
+
+    benchmarks = {}
+    for length in (60, 720):
+        legacy = LegacyHistory(length)
+        dose = DoseAccumulator(length, 60)
+        for i in range(length):
+            legacy.add(i % 7)
+            dose.add(i % 7)
+
+        def read(dose=dose):
+            if dose.total:
+                return (dose.cpm(), dose.usvh(), dose.usvh_interval(),
+                        dose.window_cpm(1), dose.window_cpm(2), dose.peak_cpm)
+            return None
+
+        benchmarks.update({
+            f"dose_add_legacy_{length}": (lambda legacy=legacy: legacy.add(3), 5000),
+            f"dose_add_{length}": (lambda dose=dose: dose.add(3), 5000),
+            f"dose_read_legacy_{length}": (legacy.read, 5000),
+            f"dose_read_{length}": (read, 5000),
+        })
+    return benchmarks
+
+
+def driver_benchmarks():
+    """``{name: (function, calls)}`` for the LIDAR-Lite and VL53L4CX drivers.
+    The simulated sensors run on a clock that moves 5 ms each time they look
+    at it and the drivers poll without sleeping, so the figures are driver
+    and bus overhead, not sensor time."""
+    # pylint: disable=import-outside-toplevel
+    import adafruit_lidarlite
+    import vl53l4cx
+
+    now = [0.0]
+
+    def clock():
+        now[0] += 0.005
+        return now[0]
+
+    bus = sim.FakeI2CBus()
+    bus.add(sim.FakeLidarLite(clock))
+    bus.add(sim.FakeVL53L4CX(clock))
+    sleep = time.sleep
+    time.sleep = lambda _seconds: None  # skip the LIDAR's 0.5 s power-up wait
+    try:
+        lidar = adafruit_lidarlite.LIDARLiteV4LED(bus, poll_interval=0)
+        tof = vl53l4cx.VL53L4CX(bus, timing_budget=10, poll_interval=0)
+    finally:
+        time.sleep = sleep
+    tof.start_ranging()
+    return {
+        "lidarlite_distance": (lambda: lidar.distance, 2000),
+        "vl53l4cx_read_distance": (tof.read_distance, 2000),
+    }
+
+
+def reference_work():
+    """A fixed piece of interpreter work, timed next to every benchmark run
+    so a machine that speeds up or slows down mid-run moves both."""
+    total = 0
+    for i in range(64):
+        total += i * i % 7
+    return total
+
+
+def batch_size(function, calls, min_time):
+    """``calls`` grown until one batch of calls takes ``min_time`` seconds."""
+    batch = calls
+    while True:
+        start = time.perf_counter()
+        for _ in range(batch):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or batch >= 1000 * calls:
+            return batch
+        batch *= 2 if elapsed >= min_time / 4 else 4
+
+
+def timed(function, batch):
+    start = time.perf_counter()
+    for _ in range(batch):
+        function()
+    return batch / (time.perf_counter() - start)
+
+
+def measure(function, calls, repeats, min_time=0.2):
+    """Time ``repeats`` runs of a batch of ``calls`` calls, the batch grown
+    until one run takes at least ``min_time`` seconds, each followed by a run
+    of `reference_work`. Keep the medians and the spread of the speed
+    relative to the reference. Then trace one batch for memory."""
+    batch = batch_size(function, calls, min_time)
+    reference_batch = batch_size(reference_work, 1, min_time / 2)
+    rates = []
+    relative = []
+    gc.disable()  # as timeit does, so collections land in no one's figures
+    try:
+        for _ in range(repeats):
+            rate = timed(function, batch)
+            rates.append(rate)
+            relative.append(rate / timed(reference_work, reference_batch))
+    finally:
+        gc.enable()
+    rates.sort()
+    relative.sort()
+    median = relative[len(relative) // 2]
+    # Half the interquartile range, which one slow run does not move
+    spread = (relative[len(relative) * 3 // 4] - relative[len(relative) // 4]) / 2
+
+    tracemalloc.start()
+    function()  # let caches and lazy state settle before counting
+    base_blocks, base_bytes = traced()
+    peak = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        function()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    blocks, size = traced()
+    tracemalloc.stop()
+    return {
+        "ops_per_second": round(rates[len(rates) // 2], 1),
+        "relative_speed": median,
+        "spread_percent": round(100 * spread / median, 2),
+        "allocations": round((blocks - base_blocks) / calls, 3),
+        "allocated_bytes": round((size - base_bytes) / calls, 1),
+        "peak_bytes": peak,
+    }
+
+
+def font_load(load, chars, repeats):
+    """Best milliseconds for ``load()`` plus loading ``chars``, the heap the
+    loaded font holds and the peak heap while loading it."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load().load_glyphs(chars)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        font = load()
+        font.load_glyphs(chars)
+        gc.collect()
+        held = traced()[1]
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del font
+    return {"load_ms": best * 1000, "heap_bytes": held, "peak_bytes": peak}
+
+
+def font_report(bitmap_font_dir, repeats):
+    """``{font: {path: figures}}`` for each BDF in fonts/, see `font_load`."""
+    # pylint: disable=import-outside-toplevel
+    import baked_font
+    from bake_fonts import used_characters
+
+    bitmap_font = None
+    if bitmap_font_dir:
+        bitmap_font = sim.load_driver("adafruit_bitmap_font.bitmap_font", bitmap_font_dir)
+    chars = "".join(sorted(used_characters(os.path.join(ROOT, "code.py"))))
+    report = {}
+    for name in sorted(os.listdir(os.path.join(ROOT, "fonts"))):
+        if not name.endswith(".bdf"):
+            continue
+        path = os.path.join(ROOT, "fonts", name)
+        baked = path[:-len(".bdf")] + ".pfnt"
+        figures = {"baked": font_load(lambda baked=baked: baked_font.BakedFont(baked),
+                                      chars, repeats)}
+        if bitmap_font:
+            figures["bdf"] = font_load(lambda path=path: bitmap_font.load_font(path),
+                                       chars, repeats)
+        report[name] = figures
+    return report
+
+
+def traced():
+    """Blocks and bytes traced, leaving out tracemalloc's own."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)])
+    stats = snapshot.statistics("filename")
+    return sum(stat.count for stat in stats), sum(stat.size for stat in stats)
+
+
+def median_error(result, repeats):
+    """Standard error of a benchmark's median speed, in percent."""
+    return MEDIAN_ERROR * result.get("spread_percent", 0) / math.sqrt(repeats)
+
+
+def compare(report, baseline, threshold):
+    """Print the change from ``baseline`` and return the regressed names.
+
+    A benchmark regressed if its median is slower than the baseline's by
+    more than ``threshold`` percent and by more than `ERROR_FACTOR` standard
+    errors of the difference, or if its peak grew."""
+    regressed = []
+    for name, result in report["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None:
+            print(f"{name:28} new")
+            continue
+        key = "relative_speed" if "relative_speed" in old else "ops_per_second"
+        speed = 100 * (result[key] / old[key] - 1)
+        error = math.hypot(median_error(result, report["repeats"]),
+                           median_error(old, baseline.get("repeats", 1)))
+        limit = max(threshold, ERROR_FACTOR * error)
+        peak = result["peak_bytes"] - old["peak_bytes"]
+        flag = ""
+        if speed < -limit or peak > max(PEAK_SLACK, old["peak_bytes"] * threshold / 100):
+            flag = "  REGRESSED"
+            regressed.append(name)
+        print(f"{name:28} {speed:+7.1f}% ops/s (limit {limit:.1f}%)  {peak:+6d} B peak{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", help="run just these benchmarks")
+    parser.add_argument("--repeats", type=int, default=9)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="an earlier report to compare with")
+    parser.add_argument("--threshold", type=float, default=20,
+                        help="least percent slowdown counted as a regression")
+    parser.add_argument("--bitmap-font",
+                        help="directory with the adafruit_bitmap_font sources, "
+                        "to compare the fonts with their BDF")
+    args = parser.parse_args()
+
+    sim.install(ROOT, noaa_dir=os.path.join(ROOT, "tools", "noaa"),
+                sd_dir=tempfile.mkdtemp(prefix="pynt-sd-"), wifi_latency=0)
+    app = load_app()
+    app.wifi.connect()
+    app.wifi.poll()
+    benchmarks = sketch_benchmarks(app)
+    benchmarks.update(dose_benchmarks())
+    benchmarks.update(driver_benchmarks())
+    if args.only:
+        benchmarks = {name: benchmarks[name] for name in args.only}
+
+    report = {
+        "python": sys.version.split()[0],
+        "repeats": args.repeats,
+        "benchmarks": {
+            name: dict(measure(function, calls, args.repeats), calls=calls)
+            for name, (function, calls) in benchmarks.items()
+        },
+        # Last, since loading adafruit_bitmap_font replaces its stand-in
+        "fonts": font_report(args.bitmap_font, args.repeats),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
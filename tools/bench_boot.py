@@ -0,0 +1,113 @@
+"""Measure startup time and heap per boot stage on the simulated board.
+
+Usage::
+
+    python tools/bench_boot.py [--replay-minutes 60] [--fail-stage NAME] [--json report.json]
+
+code.py is loaded on the `pyportal_hal.sim` stand-ins under ``tracemalloc``,
+with the SD card holding ``--replay-minutes`` of logged counts so the log
+stage replays them as after a reboot. Loading runs the foreground stages up
+to the first frame; the stages code.py queues for its "boot" task are then
+run back to back. For each stage the report gives the milliseconds it took
+and the heap it kept, taken from `boot_sequence.BootSequence`, along with the
+time to the first frame and to the end of the last stage.
+
+``--fail-stage`` makes that queued stage raise instead of running, to check
+the failure is recorded and the stages after it still run; stages that need
+it, as network needs portal, fail too. The exit status is 1 if a queued
+stage is left, or if a stage fails without ``--fail-stage``.
+
+Times are host times and heap is CPython bytes, so compare runs with each
+other rather than with the device. Each run is a fresh process, so imports
+are counted cold.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+import boot_sequence  # noqa: E402
+from pyportal_hal import sim  # noqa: E402
+from radiation_log import RadiationLog  # noqa: E402
+from run_headless import load_app  # noqa: E402
+
+# Heap the traced figure is taken from, so "free" falls as memory is kept
+HEAP_SIZE = 1 << 30
+
+
+def traced_free():
+    """``gc.mem_free()`` stand-in counting down from `HEAP_SIZE`."""
+    return HEAP_SIZE - tracemalloc.get_traced_memory()[0]
+
+
+def fail_stage():
+    raise RuntimeError("stage failed on purpose")
+
+
+def seed_log(sd_dir, minutes, unit=60, cpm=30):
+    """Write ``minutes`` of one-minute count records ending now."""
+    now = time.time()
+    stamps = iter(range(int(now - minutes * unit), int(now), unit))
+    log = RadiationLog(os.path.join(sd_dir, "radiation.log"), wall_clock=lambda: next(stamps))
+    for _ in range(minutes):
+        log.log_counts(cpm * unit // 60, 0.0, unit)
+    log.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replay-minutes", type=int, default=60,
+                        help="minutes of counts on the SD card for the log stage to replay")
+    parser.add_argument("--fail-stage", help="queued stage to make raise")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    sd_dir = tempfile.mkdtemp(prefix="pynt-sd-")
+    seed_log(sd_dir, args.replay_minutes)
+    simulation = sim.install(ROOT, noaa_dir=os.path.join(ROOT, "tools", "noaa"), sd_dir=sd_dir)
+    boot_sequence._mem_free = traced_free  # pylint: disable=protected-access
+    tracemalloc.start()
+    started = time.perf_counter()
+    app = load_app(finish_boot=False)
+    foreground_ms = (time.perf_counter() - started) * 1000
+    if args.fail_stage:
+        queue = app.boot._queue  # pylint: disable=protected-access
+        queue[:] = [(name, fail_stage if name == args.fail_stage else func)
+                    for name, func in queue]
+    app.boot.finish()
+    total_ms = (time.perf_counter() - started) * 1000
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    report = app.boot.report()
+    report.update({
+        "foreground_ms": foreground_ms,
+        "total_ms": total_ms,
+        "heap_bytes": sum(stage["heap"] for stage in report["stages"]),
+        "heap_peak_bytes": heap_peak,
+        "replayed_counts": app.dose.total,
+        "root_group_restored": simulation.display.root_group is app.splash,
+        "failed_stages": app.boot.failed,
+    })
+    if simulation.noaa:
+        simulation.noaa.close()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not app.boot.done or (app.boot.failed and not args.fail_stage):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
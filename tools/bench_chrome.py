@@ -0,0 +1,206 @@
+"""Compare the tile-map chrome with the Rect and Button widgets it replaced.
+
+Usage::
+
+    python tools/bench_chrome.py [--switches 60] [--json report.json]
+
+The panels, tab bar and per-tab buttons are built both ways on the
+`pyportal_hal.sim` stand-ins: the way code.py builds them now, as
+`chrome.Chrome` plus a `widgets.solid_rect` in its tab's group for each box
+of one tab, and as the separate ``Rect`` and ``Button`` widgets code.py used
+before, copied below. For each the report gives:
+
+* ``objects``: the displayio objects on the device. The stand-ins are
+  lighter than the real widgets, so these are counted by the rules the
+  Adafruit libraries follow: a ``Rect`` is a ``TileGrid``, ``Bitmap`` and
+  ``Palette``, a ``Button`` adds a ``Group`` around its ``Rect`` and label,
+  and a text ``Label`` is two ``Group`` objects, a ``Palette`` and a
+  ``TileGrid`` per glyph. A solid rect is a ``TileGrid``, ``Bitmap`` and
+  ``Palette``.
+* ``buffer_bytes``: the bitmap and tile buffers those objects allocate on the
+  device, worked out from their sizes in the same way. The host heap is not
+  used, as the stand-in ``Rect`` keeps no pixels.
+* ``switch_dirty_area`` and ``switch_writes``: the pixels and writes the sim
+  display counts per tab switch, cycling through the tabs ``--switches``
+  times, for the chrome and tab boxes alone. A chrome write is one tile
+  index, a widget write a whole recolor or a widget joining or leaving the
+  screen.
+
+``app_switch_dirty_area`` is the same figure for a whole tab switch of the
+current code.py, tab contents included.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+from run_headless import load_app  # noqa: E402
+
+TABS = ("Radiation", "UV", "Probes")
+
+# Bytes per tile index in a TileGrid
+TILE_BYTES = 1
+
+
+def bitmap_bytes(width, height, value_count):
+    """Buffer of a ``displayio.Bitmap``: rows of 32 bit words."""
+    bits = 1
+    while (1 << bits) < value_count:
+        bits *= 2
+    return (width * bits + 31) // 32 * 4 * height
+
+
+def label_objects(text):
+    return 3 + len(text)
+
+
+def legacy_chrome(font_greek, font_trek, font_small):
+    """The widgets of code.py before `chrome.Chrome`, as ``(layers,
+    buttons, panels)``: everything drawn, the three tab buttons and the
+    widgets each tab added to its group."""
+    from adafruit_button import Button  # pylint: disable=import-outside-toplevel
+    from adafruit_display_shapes.rect import Rect  # pylint: disable=import-outside-toplevel
+
+    buttons = [
+        Button(x=55, y=200, width=70, height=30,
+               label="γ", label_font=font_greek, fill_color=0xB9C92F),
+        Button(x=152, y=200, width=70, height=30,
+               label="Δ", label_font=font_greek, fill_color=0xBF0F0F),
+        Button(x=242, y=200, width=70, height=30,
+               label="Probes", label_font=font_trek, fill_color=0xBF0F0F),
+    ]
+    panels = {
+        "Radiation": [Button(x=50, y=35, width=40, height=30,
+                             label="C", label_font=font_trek, fill_color=0xBF0F0F)],
+        "Probes": [Rect(52, 45, 225, 150, fill=0x000022),
+                   Button(x=165, y=160, width=90, height=30,
+                          label="CONNECT", label_font=font_small,
+                          label_color=0xFDCD06, fill_color=0x11709F)],
+    }
+    layers = [Rect(0, 0, 320, 240, fill=0x000000),
+              Rect(0, 0, 50, 240, fill=0x165FC5),
+              Rect(315, 1, 10, 240, fill=0xFDCD06),
+              Rect(0, 1, 320, 35, fill=0x165FC5)] + buttons
+    for widgets in panels.values():
+        layers.extend(widgets)
+    return layers, buttons, panels
+
+
+def legacy_cost(layers):
+    objects = 0
+    buffers = 0
+    for layer in layers:
+        # Every Rect, including the body of a Button, has a 1 bit bitmap
+        objects += 3
+        buffers += bitmap_bytes(layer.width, layer.height, 2)
+        label = getattr(layer, "label", None)
+        if label is not None:
+            objects += 1 + label_objects(label)
+    return objects, buffers
+
+
+def tab_boxes(app):
+    """The boxes code.py draws in each tab's group, built the same way."""
+    return {
+        "Radiation": [app.solid_rect(*app.CAL_RECT, app.RED)],
+        "Probes": [app.solid_rect(*app.SOLAR_FRAME_RECT, app.NAVY),
+                   app.solid_rect(*app.CONNECT_RECT, app.TEAL)],
+    }
+
+
+def chrome_cost(app, boxes):
+    chrome = app.chrome
+    objects = 3
+    buffers = (bitmap_bytes(chrome.cell, chrome.cell * len(chrome.colors), len(chrome.colors))
+               + chrome.columns * chrome.rows * TILE_BYTES)
+    for grids in boxes.values():
+        for grid in grids:
+            objects += 3
+            tiles = (grid.width // grid.tile_width) * (grid.height // grid.tile_height)
+            buffers += bitmap_bytes(grid.tile_width, grid.tile_height, 1) + tiles * TILE_BYTES
+    # The labels that replaced the button labels
+    for text in ("γ", "Δ", "Probes", "C", "CONNECT"):
+        objects += label_objects(text)
+    return objects, buffers
+
+
+def tab_switcher(content, panels, shown, recolor):
+    """A tab switch: the widgets of the shown tab's group leave the screen,
+    the new tab's join it, and ``recolor(view)`` updates the tab bar."""
+
+    def switch(view):
+        for widget in panels.get(shown[0], ()):
+            content.remove(widget)
+        for widget in panels.get(view, ()):
+            content.append(widget)
+        shown[0] = view
+        recolor(view)
+
+    return switch
+
+
+def measure_switches(display, switch, switches):
+    writes = display.writes
+    area = display.dirty_area
+    for i in range(switches):
+        switch(TABS[(i + 1) % len(TABS)])
+    return {
+        "switch_dirty_area": (display.dirty_area - area) / switches,
+        "switch_writes": (display.writes - writes) / switches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--switches", type=int, default=60)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    simulation = sim.install(ROOT)
+    app = load_app()
+    display = simulation.display
+    app.show_view(TABS[0])
+
+    report = {}
+    layers, buttons, panels = legacy_chrome(app.font_greek, app.font_trek,
+                                            app.terminalio.FONT)
+    objects, buffers = legacy_cost(layers)
+    content = app.displayio.Group()
+    content.extend(panels[TABS[0]])
+
+    def recolor_buttons(view):
+        for name, button in zip(TABS, buttons):
+            button.fill_color = 0xB9C92F if name == view else 0xBF0F0F
+
+    report["widgets"] = {"objects": objects, "buffer_bytes": buffers}
+    report["widgets"].update(measure_switches(
+        display, tab_switcher(content, panels, [TABS[0]], recolor_buttons), args.switches))
+
+    boxes = tab_boxes(app)
+    objects, buffers = chrome_cost(app, boxes)
+    content = app.displayio.Group()
+    content.extend(boxes[TABS[0]])
+    report["chrome"] = {"objects": objects, "buffer_bytes": buffers}
+    report["chrome"].update(measure_switches(
+        display, tab_switcher(content, boxes, [TABS[0]], app.chrome.show), args.switches))
+
+    app.show_view(TABS[0])
+    report["app_switch_dirty_area"] = measure_switches(
+        display, app.show_view, args.switches)["switch_dirty_area"]
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
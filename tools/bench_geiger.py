@@ -0,0 +1,162 @@
+"""Compare Geiger pulse capture of each counting backend with the old polling.
+
+Usage::
+
+    python tools/bench_geiger.py [--cpm 60 600 6000] [--poll-ms 0.05 0.5 5] [--seconds 120] [--json report.json]
+
+The `pyportal_hal.sim` Geiger source sends the same Poisson pulse train
+(0.2 ms low pulses) to each backend on a stepped clock, which is polled
+every ``--poll-ms`` as a main loop with that tick time would. The backends
+are:
+
+* ``countio``: `geiger_pulse.CountioPulseCounter` on the simulated hardware
+  counter,
+* ``edge``: `geiger_pulse.EdgePulseCounter`, the fallback without
+  ``countio``,
+* ``level``: the old loop's check, which added one for every poll that found
+  the pin low.
+
+For every CPM and poll time the report gives each backend's capture
+efficiency, counted over sent pulses, with 1.0 exact. The level check
+undercounts once a poll takes longer than a pulse and counts a pulse more
+than once when it is shorter; the edge counter never counts twice.
+
+``take_carry`` takes from the ``countio`` backend while pulses keep landing
+between reading the hardware count and writing it back, and checks every
+pulse is taken once. The exit status is 1 if it fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+
+sim.install(ROOT)
+
+import digitalio  # noqa: E402
+from geiger_pulse import CountioPulseCounter, EdgePulseCounter  # noqa: E402
+
+TAKE_EVERY = 60  # seconds, as HISTORY_UNIT
+
+
+class LevelPollCounter:
+    """The old ``process_radiation`` check: one count per poll that reads
+    the pin low."""
+
+    def __init__(self, pin):
+        self._pin = digitalio.DigitalInOut(pin)
+        self._pin.direction = digitalio.Direction.INPUT
+        self._pin.pull = digitalio.Pull.UP
+        self._count = 0
+
+    def poll(self):
+        if not self._pin.value:
+            self._count += 1
+
+    def take(self):
+        count = self._count
+        self._count = 0
+        return count
+
+
+BACKENDS = (("countio", CountioPulseCounter), ("edge", EdgePulseCounter),
+            ("level", LevelPollCounter))
+
+
+def capture(backend, cpm, poll, seconds, seed=1):
+    """Counted and sent pulses for ``backend`` polled every ``poll`` seconds."""
+    clock = sim.SteppedClock(0.0)
+    pin = sim.Pin("D3")
+    pin.source = sim.GeigerSource(clock, cpm, seed=seed)
+    counter = backend(pin)
+    counted = 0
+    next_take = TAKE_EVERY
+    for _ in range(int(seconds / poll)):
+        clock.advance(poll)
+        counter.poll()
+        if clock() >= next_take:
+            counted += counter.take()
+            next_take += TAKE_EVERY
+    counted += counter.take()
+    return counted, pin.source.pulses
+
+
+class LateCounter:
+    """``countio.Counter`` whose clock moves on after the first read of
+    ``count`` following a write, so pulses land between `take` reading the
+    count and writing it back."""
+
+    def __init__(self, counter, clock, lag):
+        self._counter = counter
+        self._clock = clock
+        self._lag = lag
+        self._armed = True
+
+    @property
+    def count(self):
+        count = self._counter.count
+        if self._armed:
+            self._armed = False
+            self._clock.advance(self._lag)
+        return count
+
+    @count.setter
+    def count(self, value):
+        self._counter.count = value
+        self._armed = True
+
+    def reset(self):
+        self.count = 0
+
+
+def check_take_carry(cpm=6000, lag=0.05, takes=2000):
+    clock = sim.SteppedClock(0.0)
+    pin = sim.Pin("D3")
+    pin.source = sim.GeigerSource(clock, cpm, seed=2)
+    counter = CountioPulseCounter(pin)
+    # pylint: disable=protected-access
+    counter._counter = LateCounter(counter._counter, clock, lag)
+    taken = 0
+    for _ in range(takes):
+        clock.advance(1.0)
+        taken += counter.take()
+    counter._counter = counter._counter._counter
+    taken += counter.take()
+    return {"pulses": pin.source.pulses, "taken": taken, "ok": taken == pin.source.pulses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cpm", type=float, nargs="+", default=[60, 600, 6000])
+    parser.add_argument("--poll-ms", type=float, nargs="+", default=[0.05, 0.5, 5])
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for cpm in args.cpm:
+        for poll_ms in args.poll_ms:
+            row = {}
+            for name, backend in BACKENDS:
+                counted, pulses = capture(backend, cpm, poll_ms / 1000, args.seconds)
+                row[name] = counted / pulses if pulses else 1.0
+            row["pulses"] = pulses
+            report["cpm_{:g}_poll_{:g}ms".format(cpm, poll_ms)] = row
+    report["take_carry"] = check_take_carry()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not report["take_carry"]["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
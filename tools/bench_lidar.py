@@ -0,0 +1,96 @@
+"""Benchmark LIDAR-Lite v4 readings against the simulated sensor.
+
+Usage::
+
+    python tools/bench_lidar.py [--readings 500] [--json report.json]
+
+Drives ``lib/adafruit_lidarlite.py`` on the `pyportal_hal.sim` fake I2C bus
+with a `FakeLidarLite` in the short/fast and default configurations. Each
+mode reports readings per second and I2C transactions per reading:
+
+* ``distance``: the ``distance`` property in a loop,
+* ``distance_spin``: the same with ``poll_interval=0``, so status is polled
+  back to back as ``wait_while_busy`` used to,
+* ``burst``: `read_burst` into a preallocated ``array('H')``,
+* ``burst_pipelined``: `read_burst` with the next acquisition started as
+  soon as each result is read, with 2 ms of other work between bursts of 10.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+from pyportal_hal import sim  # noqa: E402  pylint: disable=wrong-import-position
+
+CONFIGS = {"shortfast": 2, "default": 0}
+
+
+def lidar_on_bus(configuration, poll_interval=0.001):
+    """A driver talking to a fresh `FakeLidarLite`."""
+    sim.install(ROOT)
+    import adafruit_lidarlite  # pylint: disable=import-outside-toplevel
+
+    bus = sim.FakeI2CBus()
+    device = bus.add(sim.FakeLidarLite())
+    sleep = time.sleep
+    time.sleep = lambda _seconds: None  # skip the 0.5 s power-up wait
+    try:
+        lidar = adafruit_lidarlite.LIDARLiteV4LED(bus, configuration=configuration,
+                                                  poll_interval=poll_interval)
+    finally:
+        time.sleep = sleep
+    return lidar, bus, device
+
+
+def measure(configuration, mode, readings):
+    lidar, bus, device = lidar_on_bus(configuration, 0 if mode == "distance_spin" else 0.001)
+    buffer = array("H", [0] * 10)
+    bus.transactions = 0
+    start = time.perf_counter()
+    if mode in ("distance", "distance_spin"):
+        for _ in range(readings):
+            value = lidar.distance
+    else:
+        pipelined = mode == "burst_pipelined"
+        for _ in range(readings // len(buffer)):
+            lidar.read_burst(buffer, pipelined=pipelined)
+            if pipelined:
+                time.sleep(0.002)
+        value = buffer[-1]
+    elapsed = time.perf_counter() - start
+    if mode == "burst_pipelined":
+        elapsed -= 0.002 * (readings // len(buffer))
+    assert value == device.distance
+    return {
+        "readings_per_second": readings / elapsed,
+        "i2c_per_reading": bus.transactions / readings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for name, configuration in CONFIGS.items():
+        report[name] = {
+            mode: measure(configuration, mode, args.readings)
+            for mode in ("distance", "distance_spin", "burst", "burst_pipelined")
+        }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
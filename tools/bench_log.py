@@ -0,0 +1,172 @@
+"""Measure radiation log throughput and card wear for several batch sizes.
+
+Usage::
+
+    python tools/bench_log.py [--records 20000] [--json report.json]
+
+A temporary file stands in for the SD card, and every flush is counted in
+the 512 byte blocks a FAT driver rewrites for it. For each batch size the
+report gives records written per second, flushes and blocks written per
+thousand records, then the time to rotate and to replay the last hour into
+a `DoseAccumulator`. Two checks follow:
+
+* ``replay_clock_behind``: with the wall clock earlier than the newest
+  record, as after an RTC reset, replay must add nothing.
+* ``replay_gap``: an hour of counts whose newest record is 50 minutes old
+  must replay as its last 10 units followed by 50 empty ones.
+* ``write_retry``: flushes to a directory that does not exist yet must fail
+  and keep the records, and the first flush after it is created must write
+  them all.
+
+The exit status is 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from dose_accumulator import DoseAccumulator  # noqa: E402
+from radiation_log import RECORD_SIZE, RadiationLog, read_records  # noqa: E402
+
+BATCHES = (1, 8, 32, 128)
+
+
+class StepClock:
+    """Wall clock advancing ``step`` seconds per call, from ``start``."""
+
+    def __init__(self, start=1_700_000_000, step=1.0):
+        self.now = start
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def bench_batch(directory, batch, records):
+    """Write ``records`` count records with the given batch size."""
+    path = os.path.join(directory, "batch{}.log".format(batch))
+    log = RadiationLog(path, batch=batch, max_bytes=1 << 30, wall_clock=StepClock())
+    start = time.perf_counter()
+    for i in range(records):
+        log.log_counts(i % 7, 0.1, 60)
+    log.flush()
+    elapsed = time.perf_counter() - start
+    return {
+        "batch": batch,
+        "records_per_second": records / elapsed,
+        "flushes_per_1000": log.flushes * 1000 / records,
+        "blocks_per_1000": log.blocks_written * 1000 / records,
+        "bytes": os.path.getsize(path),
+    }
+
+
+def bench_rotate_replay(directory, records):
+    """Fill a small log past rotation, then replay an hour of 60 s units."""
+    path = os.path.join(directory, "rotate.log")
+    clock = StepClock(step=60)
+    log = RadiationLog(path, batch=32, max_bytes=64 * 1024, wall_clock=clock)
+    for i in range(records):
+        log.log_counts(i % 7, 0.1, 60)
+    log.flush()
+    dose = DoseAccumulator(60, 60)
+    reader = RadiationLog(path, wall_clock=lambda: clock.now)
+    start = time.perf_counter()
+    replayed = reader.replay(dose, 3600)
+    replay_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    total = sum(1 for _ in read_records(path)) + sum(1 for _ in read_records(path + ".1"))
+    read_ms = (time.perf_counter() - start) * 1000
+    return {
+        "log_bytes": os.path.getsize(path),
+        "rotated_bytes": os.path.getsize(path + ".1"),
+        "records_kept": total,
+        "replayed_units": replayed,
+        "replay_ms": replay_ms,
+        "full_read_ms": read_ms,
+    }
+
+
+def check_replay_clock_behind(directory):
+    path = os.path.join(directory, "behind.log")
+    clock = StepClock(step=60)
+    log = RadiationLog(path, wall_clock=clock)
+    for i in range(30):
+        log.log_counts(i % 7, 0.1, 60)
+    log.flush()
+    dose = DoseAccumulator(60, 60)
+    reader = RadiationLog(path, wall_clock=lambda: clock.now - 3600)
+    replayed = reader.replay(dose, 3600)
+    return {"replayed_units": replayed, "ok": replayed == 0 and dose.total == 0}
+
+
+def check_replay_gap(directory, gap_units=50):
+    path = os.path.join(directory, "gap.log")
+    clock = StepClock(step=60)
+    log = RadiationLog(path, wall_clock=clock)
+    for _ in range(60):
+        log.log_counts(5, 0.1, 60)
+    log.flush()
+    dose = DoseAccumulator(60, 60)
+    reader = RadiationLog(path, wall_clock=lambda: clock.now + gap_units * 60 + 30)
+    replayed = reader.replay(dose, 3600)
+    counts = list(dose.counts())
+    return {
+        "replayed_units": replayed,
+        "total": dose.total,
+        "ok": (replayed == 60 and counts == [5] * (60 - gap_units) + [0] * gap_units),
+    }
+
+
+def check_write_retry(directory, batch=8):
+    card = os.path.join(directory, "card")
+    log = RadiationLog(os.path.join(card, "retry.log"), batch=batch, wall_clock=StepClock())
+    for i in range(batch + 2):
+        log.log_counts(i, 0.1, 60)
+    failed = log.error is not None
+    log.flush()
+    os.mkdir(card)
+    log.flush()
+    written = sum(1 for _ in read_records(log.path))
+    return {
+        "failed_while_missing": failed,
+        "records_written": written,
+        "dropped": log.dropped,
+        "ok": failed and log.error is None and written == batch and log.dropped == 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = {
+            "record_bytes": RECORD_SIZE,
+            "batches": [bench_batch(directory, batch, args.records) for batch in BATCHES],
+            "rotate_replay": bench_rotate_replay(directory, args.records),
+            "replay_clock_behind": check_replay_clock_behind(directory),
+            "replay_gap": check_replay_gap(directory),
+            "write_retry": check_write_retry(directory),
+        }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not all(report[check]["ok"]
+               for check in ("replay_clock_behind", "replay_gap", "write_retry")):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
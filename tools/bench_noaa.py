@@ -0,0 +1,124 @@
+"""Compare an hour of NOAA polling with and without conditional requests.
+
+Usage::
+
+    python tools/bench_noaa.py [--interval 45] [--update 60] [--json report.json]
+
+The recorded feeds in tools/noaa are copied to a temporary directory and
+served by the `pyportal_hal.sim` stand-in. The clock is simulated: every
+``update`` seconds the feeds' modification time moves on, as NOAA's do, and
+every ``interval`` seconds the plasma and mag feeds are polled (the Kp feed
+every 900 s). Two strategies are measured:
+
+* ``fetch``: a new session and a full download per request, as
+  ``pyportal.fetch()`` did,
+* ``client``: `noaa_client.NOAAClient` on one pooled session.
+
+The report gives requests, 304 answers, connections opened (each one a TLS
+handshake on the device) and body bytes received per hour.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from noaa_client import NOAAClient  # noqa: E402
+from noaa_stream import NOAAStreamParser, fetch_rows  # noqa: E402
+from pyportal_hal import sim  # noqa: E402
+
+PLASMA = "https://services.swpc.noaa.gov/products/solar-wind/plasma-5-minute.json"
+MAG = "https://services.swpc.noaa.gov/products/solar-wind/mag-5-minute.json"
+KP = "https://services.swpc.noaa.gov/products/noaa-planetary-k-index.json"
+KP_INTERVAL = 900
+EPOCH = 1_700_000_000
+
+
+def polls(interval, seconds=3600):
+    """``(time, url)`` for each request in ``seconds`` of polling."""
+    requests = []
+    t = 0
+    while t < seconds:
+        requests.append((t, PLASMA))
+        requests.append((t, MAG))
+        if t % KP_INTERVAL < interval:
+            requests.append((t, KP))
+        t += interval
+    return requests
+
+
+def touch_feeds(directory, t, update):
+    """Set the feeds' modification time to the last update before ``t``."""
+    stamp = EPOCH + (t // update) * update
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (stamp, stamp))
+
+
+def run_fetch(stand_in, directory, schedule, update):
+    sessions = []
+    received = 0
+    for t, url in schedule:
+        touch_feeds(directory, t, update)
+        session = sim.Session(stand_in.port)
+        fetch_rows(session, url, NOAAStreamParser())
+        received += session.bytes_received
+        sessions.append(session)
+    return {
+        "requests": len(schedule),
+        "not_modified": 0,
+        "connections": sum(s.connections for s in sessions),
+        "bytes_received": received,
+    }
+
+
+def run_client(stand_in, directory, schedule, update):
+    session = sim.Session(stand_in.port)
+    client = NOAAClient(session)
+    for t, url in schedule:
+        touch_feeds(directory, t, update)
+        for _ in client.stream(url, NOAAStreamParser()):
+            pass
+    return {
+        "requests": client.requests,
+        "not_modified": client.not_modified,
+        "connections": session.connections,
+        "bytes_received": client.bytes_received,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interval", type=int, default=45, help="seconds between solar polls")
+    parser.add_argument("--update", type=int, default=60, help="seconds between feed updates")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    schedule = polls(args.interval)
+    with tempfile.TemporaryDirectory() as directory:
+        for name in os.listdir(os.path.join(ROOT, "tools", "noaa")):
+            shutil.copy(os.path.join(ROOT, "tools", "noaa", name), directory)
+        stand_in = sim.NOAAStandIn(directory)
+        try:
+            report = {
+                "interval": args.interval,
+                "update": args.update,
+                "fetch": run_fetch(stand_in, directory, schedule, args.update),
+                "client": run_client(stand_in, directory, schedule, args.update),
+            }
+        finally:
+            stand_in.close()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
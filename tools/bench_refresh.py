@@ -0,0 +1,158 @@
+"""Count solar-wind polls per day under different activity profiles.
+
+Usage::
+
+    python tools/bench_refresh.py [--days 1] [--seed 1] [--json report.json]
+
+Runs `refresh_planner.RefreshPlanner` against a simulated clock and feed.
+The feed gains a row every 60 s, published 10-40 s after its time tag. Each
+profile sets the solar wind speed over the day (and so the activity level)
+and how often a poll fails. For every profile the report gives polls per
+day, polls that found no new row, and the mean and worst age of the data on
+screen, next to the fixed 45 s polling code.py used before. It also counts
+the polls `RefreshPlanner.overdue` would send to the 6-hour feeds: a profile
+with no failures must only do that on its first poll, and the exit status is
+1 if one does it more.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+from refresh_planner import RefreshPlanner, level_for_speed  # noqa: E402  pylint: disable=wrong-import-position
+
+DAY = 86400
+CADENCE = 60
+EPOCH = 1_700_000_000
+
+
+def quiet(_t):
+    return 400
+
+
+def elevated(_t):
+    return 620
+
+
+def storm(_t):
+    return 900
+
+
+def storm_afternoon(t):
+    """Quiet, with a six hour storm from noon and elevated hours either side."""
+    hour = (t % DAY) / 3600
+    if 12 <= hour < 18:
+        return 900
+    if 10 <= hour < 20:
+        return 600
+    return 400
+
+
+PROFILES = {
+    "quiet": (quiet, 0.0),
+    "elevated": (elevated, 0.0),
+    "storm": (storm, 0.0),
+    "storm_afternoon": (storm_afternoon, 0.0),
+    "flaky_network": (quiet, 0.2),
+}
+
+
+class Feed:
+    """Rows every ``CADENCE`` seconds, each published after a random lag."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self._lags = {}
+
+    def newest(self, t):
+        """Time tags of the newest two rows published by time ``t``."""
+        tag = (t // CADENCE) * CADENCE
+        while t < tag + self._lag(tag):
+            tag -= CADENCE
+        return tag, tag - CADENCE
+
+    def _lag(self, tag):
+        if tag not in self._lags:
+            self._lags[tag] = self.rng.uniform(10, 40)
+        return self._lags[tag]
+
+
+def simulate(speed_at, failure_rate, seconds, seed, planner=True):
+    """Poll for ``seconds`` and return the counts and data ages."""
+    rng = random.Random(seed)
+    feed = Feed(rng)
+    now = [0.0]
+    refresh = RefreshPlanner(clock=lambda: now[0], wall_clock=lambda: EPOCH + now[0])
+    shown = None
+    polls = unchanged = failed = backfills = 0
+    answered = None
+    ages = []
+    next_sample = 0.0
+    while now[0] < seconds:
+        polls += 1
+        if refresh.overdue(answered):
+            backfills += 1
+        if rng.random() < failure_rate:
+            failed += 1
+            refresh.failed()
+        else:
+            answered = now[0]
+            tag, previous = feed.newest(now[0])
+            if tag == shown:
+                unchanged += 1
+                refresh.unchanged()
+            else:
+                shown = tag
+                refresh.observe(EPOCH + tag, EPOCH + previous)
+            refresh.level = level_for_speed(speed_at(now[0]))
+        delay = refresh.next_delay() if planner else 45
+        end = now[0] + delay
+        while next_sample < min(end, seconds):
+            if shown is not None:
+                ages.append(next_sample - shown)
+            next_sample += 10
+        now[0] = end
+    days = seconds / DAY
+    return {
+        "polls_per_day": polls / days,
+        "unchanged_per_day": unchanged / days,
+        "failed_per_day": failed / days,
+        "backfills": backfills,
+        "mean_age_s": sum(ages) / len(ages) if ages else None,
+        "max_age_s": max(ages) if ages else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    seconds = args.days * DAY
+    report = {}
+    ok = True
+    for name, (speed_at, failure_rate) in PROFILES.items():
+        report[name] = {
+            "planner": simulate(speed_at, failure_rate, seconds, args.seed),
+            "fixed_45s": simulate(speed_at, failure_rate, seconds, args.seed, planner=False),
+        }
+        if not failure_rate:
+            ok = ok and report[name]["planner"]["backfills"] == 1
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Measure the solar wind history store and sparkline against feed length.
+
+Usage::
+
+    python tools/bench_sparkline.py [--rows 120 360 1440 10080] [--json report.json]
+
+For each row count a synthetic plasma feed of one-minute rows is streamed in
+256 byte chunks through `noaa_stream.NOAAStreamParser` into a
+`timeseries.TimeSeries` as code.py does, and for comparison parsed whole
+with ``json.loads``, as the sketch did before it streamed. The report gives
+the peak heap of each (from ``tracemalloc``, the payload itself left out),
+the bytes the series keeps, and the time and allocations of one sparkline
+redraw on the `pyportal_hal.sim` bitmap. The streamed peak and the series
+size should not grow with the row count.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+
+sim.install(ROOT)
+
+import displayio  # noqa: E402
+from noaa_stream import NOAAStreamParser  # noqa: E402
+from refresh_planner import parse_time_tag  # noqa: E402
+from timeseries import TimeSeries  # noqa: E402
+from widgets import draw_sparkline  # noqa: E402
+
+# As in code.py
+SPARK_WIDTH = 150
+SPARK_HEIGHT = 12
+SOLAR_HISTORY_SECONDS = 6 * 3600
+CHUNK = 256
+
+# Feed columns and the range each synthetic value wanders in
+PLASMA = (("density", 0.5, 20.0, "{:.2f}"), ("speed", 250.0, 900.0, "{:.1f}"),
+          ("temperature", 10000, 500000, "{:.0f}"))
+MAG = (("bx_gsm", -20.0, 20.0, "{:.2f}"), ("by_gsm", -20.0, 20.0, "{:.2f}"),
+       ("bz_gsm", -20.0, 20.0, "{:.2f}"), ("lon_gsm", 0.0, 360.0, "{:.2f}"),
+       ("lat_gsm", -90.0, 90.0, "{:.2f}"), ("bt", 0.0, 30.0, "{:.2f}"))
+
+
+def time_tag(seconds):
+    return time.strftime("%Y-%m-%d %H:%M:%S.000", time.gmtime(seconds))
+
+
+def synthetic_feed(columns, rows, end, seed=1):
+    """A NOAA products feed of ``rows`` one-minute random walks ending at
+    ``end`` (seconds since 1970), as a list of rows."""
+    rng = random.Random(seed)
+    values = [(low + high) / 2 for _, low, high, _ in columns]
+    feed = [["time_tag"] + [name for name, _, _, _ in columns]]
+    for i in range(rows):
+        row = [time_tag(end - (rows - 1 - i) * 60)]
+        for j, (_, low, high, form) in enumerate(columns):
+            values[j] = min(high, max(low, values[j] + rng.gauss(0, (high - low) / 50)))
+            row.append(form.format(values[j]))
+        feed.append(row)
+    return feed
+
+
+def stream(payload, series):
+    """Stream ``payload`` into ``series`` as update_solar_wind does."""
+
+    def add(row):
+        seconds = parse_time_tag(row[0])
+        series.add(seconds, (float(row[2]), float(row[1]), None))
+
+    parser = NOAAStreamParser(2, columns=(0, 1, 2), on_row=add)
+    for start in range(0, len(payload), CHUNK):
+        parser.feed(payload[start:start + CHUNK])
+    return parser.finish()
+
+
+def peak_of(function):
+    """Peak traced bytes above the starting point while ``function`` runs."""
+    gc.collect()
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    result = function()
+    return tracemalloc.get_traced_memory()[1] - start, result
+
+
+def redraw(bitmap, series):
+    bitmap.fill(0)
+    for metric in range(2):
+        draw_sparkline(bitmap, series, metric, metric + 1)
+
+
+def measure(rows):
+    end = parse_time_tag("2025-05-05 12:35:00.000")
+    payload = json.dumps(synthetic_feed(PLASMA, rows, end)).encode()
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    series = TimeSeries(SPARK_WIDTH, SOLAR_HISTORY_SECONDS, 3)
+    gc.collect()
+    series_bytes = tracemalloc.get_traced_memory()[0] - before
+    streamed_peak, _ = peak_of(lambda: stream(payload, series))
+    loads_peak, _ = peak_of(lambda: json.loads(payload))
+
+    bitmap = displayio.Bitmap(SPARK_WIDTH, SPARK_HEIGHT, 4)
+    redraw(bitmap, series)
+    repeats = 50
+    start = time.perf_counter()
+    for _ in range(repeats):
+        redraw(bitmap, series)
+    render_ms = (time.perf_counter() - start) * 1000 / repeats
+    gc.collect()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    redraw(bitmap, series)
+    allocations = len(tracemalloc.take_snapshot().traces) - blocks
+    return {
+        "payload_bytes": len(payload),
+        "streamed_peak_bytes": streamed_peak,
+        "json_loads_peak_bytes": loads_peak,
+        "series_bytes": series_bytes,
+        "columns_filled": sum(1 for value in series.low[0] if value == value),
+        "render_ms": render_ms,
+        "render_allocations": allocations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="*", default=[120, 360, 1440, 10080])
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    report = {str(rows): measure(rows) for rows in args.rows}
+    tracemalloc.stop()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
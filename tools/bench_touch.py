@@ -0,0 +1,224 @@
+"""Replay touch traces through the touch router and the old dispatch loop.
+
+Usage::
+
+    python tools/bench_touch.py [--taps 200] [--json report.json]
+
+Both dispatchers get the sketch's hit regions (tab bar, hidden Diag corner,
+Calibrate button) and are polled every 50 ms, as the touch task is, on a
+simulated clock. The old loop tested every button in turn and then blocked
+all input for 0.3 s after a handled tap. `touch_router.TouchRouter` looks
+regions up in its grid and ends a press after 0.1 s without contact.
+
+For each trace the report gives taps missed, extra dispatches (one press
+counted twice), and the mean and longest latency from touch-down to
+dispatch. It also gives the host time per region lookup for both.
+
+``missing_layer`` taps a view that has no layer of its own, as the UV and
+Diag tabs have none: the tap must find nothing, and a tab tap in the same
+poll loop must still dispatch. The exit status is 1 if it fails.
+
+Traces, with fixed seeds:
+
+* ``taps``: 150 ms taps about a second apart,
+* ``double``: pairs of taps 250 ms apart, like pressing K+ twice,
+* ``bouncy``: 400 ms presses with 20 to 60 ms contact dropouts,
+* ``short``: 70 ms taps.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+from touch_router import TouchRouter  # noqa: E402  pylint: disable=wrong-import-position
+
+POLL = 0.05
+LOCKOUT = 0.3  # the old TOUCH_DEBOUNCE
+
+# x, y, width, height, as laid out by code.py
+REGIONS = (
+    (0, 0, 45, 30),      # Diag corner
+    (55, 200, 70, 30),   # Radiation tab
+    (152, 200, 70, 30),  # UV tab
+    (242, 200, 70, 30),  # Probes tab
+    (50, 35, 40, 30),    # Calibrate
+)
+
+
+def trace(kind, taps, seed=1):
+    """A list of taps, each ``(x, y, [(down, up), ...])`` in seconds."""
+    rng = random.Random(seed)
+    result = []
+    now = 0.5
+    for _ in range(taps):
+        x, y, width, height = rng.choice(REGIONS)
+        x += rng.randint(2, width - 2)
+        y += rng.randint(2, height - 2)
+        if kind == "bouncy":
+            segments = []
+            down = now
+            end = now + 0.4
+            while down < end:
+                up = min(end, down + rng.uniform(0.05, 0.15))
+                segments.append((down, up))
+                down = up + rng.uniform(0.02, 0.06)
+            result.append((x, y, segments))
+            now = end + rng.uniform(0.6, 1.2)
+        elif kind == "double":
+            result.append((x, y, [(now, now + 0.1)]))
+            result.append((x, y, [(now + 0.25, now + 0.35)]))
+            now += rng.uniform(1.0, 1.5)
+        else:
+            length = 0.07 if kind == "short" else 0.15
+            result.append((x, y, [(now, now + length)]))
+            now += rng.uniform(0.8, 1.2)
+        now += rng.random() * POLL  # taps land anywhere in the poll period
+    return result
+
+
+class Legacy:
+    """The old poll_touch: linear tests and a fixed lockout after a hit."""
+
+    def __init__(self, read, clock, dispatch):
+        self.read = read
+        self.clock = clock
+        self.dispatch = dispatch
+        self.ready = 0
+
+    @staticmethod
+    def find(x, y):
+        for index, (rx, ry, width, height) in enumerate(REGIONS):
+            if rx <= x <= rx + width and ry <= y <= ry + height:
+                return index
+        return None
+
+    def poll(self):
+        now = self.clock()
+        if now < self.ready:
+            return
+        point = self.read()
+        if not point:
+            return
+        index = self.find(point[0], point[1])
+        if index is not None:
+            self.dispatch(index)
+            self.ready = now + LOCKOUT
+
+
+def replay(kind, taps, legacy):
+    presses = trace(kind, taps)
+    now = [0.0]
+
+    def read():
+        for x, y, segments in presses:
+            for down, up in segments:
+                if down <= now[0] < up:
+                    return (x, y, 30000)
+        return None
+
+    hits = []
+
+    def dispatch(_index):
+        hits.append(now[0])
+
+    if legacy:
+        dispatcher = Legacy(read, lambda: now[0], dispatch)
+    else:
+        dispatcher = TouchRouter(read, clock=lambda: now[0])
+        layer = dispatcher.layer("main")
+        for index, region in enumerate(REGIONS):
+            layer.add(*region, lambda index=index: dispatch(index))
+        dispatcher.active = ("main",)
+    end = presses[-1][2][-1][1] + 1
+    while now[0] < end:
+        dispatcher.poll()
+        now[0] += POLL
+
+    missed = extra = 0
+    latencies = []
+    for x, y, segments in presses:
+        start, stop = segments[0][0], segments[-1][1]
+        got = [t for t in hits if start <= t < stop + POLL]
+        if not got:
+            missed += 1
+        else:
+            latencies.append(got[0] - start)
+            extra += len(got) - 1
+    return {
+        "taps": len(presses),
+        "missed": missed,
+        "extra": extra,
+        "latency_ms_mean": 1000 * sum(latencies) / len(latencies) if latencies else None,
+        "latency_ms_max": 1000 * max(latencies) if latencies else None,
+    }
+
+
+def lookup_us(legacy, points=20000):
+    rng = random.Random(3)
+    samples = [(rng.randrange(320), rng.randrange(240)) for _ in range(points)]
+    if legacy:
+        find = Legacy.find
+    else:
+        router = TouchRouter(lambda: None)
+        layer = router.layer("main")
+        for region in REGIONS:
+            layer.add(*region, lambda: None)
+        router.active = ("main",)
+        find = router.find
+    start = time.perf_counter()
+    for x, y in samples:
+        find(x, y)
+    return 1e6 * (time.perf_counter() - start) / points
+
+
+def check_missing_layer():
+    now = [0.0]
+    point = [None]
+    hits = []
+    router = TouchRouter(lambda: point[0], clock=lambda: now[0])
+    layer = router.layer("main")
+    for index, region in enumerate(REGIONS):
+        layer.add(*region, lambda index=index: hits.append(index))
+    router.active = ("main", "UV")
+    dispatched = []
+    for tap in ((150, 100), (60, 205)):
+        point[0] = tap
+        dispatched.append(router.poll())
+        point[0] = None
+        now[0] += 1
+        router.poll()
+    return {
+        "dispatched": dispatched,
+        "ok": dispatched == [False, True] and hits == [1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--taps", type=int, default=200)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {}
+    for name, legacy in (("legacy", True), ("router", False)):
+        report[name] = {kind: replay(kind, args.taps, legacy)
+                        for kind in ("taps", "double", "bouncy", "short")}
+        report[name]["lookup_us"] = lookup_us(legacy)
+    report["missing_layer"] = check_missing_layer()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not report["missing_layer"]["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
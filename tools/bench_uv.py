@@ -0,0 +1,158 @@
+"""Measure LTR390 I2C traffic per minute, before and after `uv_sampler`.
+
+Usage::
+
+    python tools/bench_uv.py [--minutes 5] [--ltr390-driver DIR] [--json report.json]
+
+The simulated LTR390 is read on a stepped clock, with the driver's sleeps
+advancing the clock, so the time it spends waiting for a conversion is
+counted. The driver is the `pyportal_hal.sim` stand-in, or with
+``--ltr390-driver`` the real ``adafruit_ltr390`` loaded from its source (see
+`pyportal_hal.sim.load_driver`). Two ways of reading it are measured:
+
+* ``before``: the old UV tab, which read ``uvi`` and ``lux`` on every display
+  pass (``DISPLAY_PERIOD``) while the tab was shown,
+* ``after``: `uv_sampler.UVSampler` sampling every ``UV_SAMPLE_PERIOD`` and
+  polled every quarter of that, as code.py's ``uv`` task does, whatever tab
+  is shown.
+
+For each the report gives I2C transactions, seconds blocked in the driver and
+new UV and light values per minute, and ``after`` must make fewer
+transactions and block for less time. Only the real driver sleeps 30 ms
+after each mode change; the ``mode_changes`` figures show how often that
+happens. The exit status is 1 if the check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+from uv_sampler import UVSampler  # noqa: E402
+
+DISPLAY_PERIOD = 0.25  # seconds, the display task's period
+UV_SAMPLE_PERIOD = 0.25  # seconds, as code.py
+MODE_BIT = 0x08
+
+
+class Bench:
+    """A simulated LTR390 on its own bus and clock, counting the bus
+    transactions, sleeps and mode changes made from `start` on. Used as a
+    context manager, which routes the driver's sleeps to the clock."""
+
+    def __init__(self, driver):
+        self.clock = sim.SteppedClock(0.0)
+        self.bus = sim.FakeI2CBus()
+        self.device = self.bus.add(sim.FakeLTR390(self.clock))
+        self.blocked = 0.0
+        self.mode_changes = 0
+        write_register = self.device.write_register
+
+        def counted_write(register, value):
+            if register == 0x00 and (value ^ self.device.registers[register]) & MODE_BIT:
+                self.mode_changes += 1
+            write_register(register, value)
+
+        self.device.write_register = counted_write
+        self.sensor = driver(self.bus)
+        self.sensor.gain = 1  # as code.py sets it
+        # The real driver imports sleep from time, the stand-in calls time.sleep
+        self._module = sys.modules[driver.__module__]
+        self._sleeps = None
+
+    def __enter__(self):
+        self._sleeps = (time.sleep, getattr(self._module, "sleep", None))
+        time.sleep = self.sleep
+        if self._sleeps[1] is not None:
+            self._module.sleep = self.sleep
+        return self
+
+    def __exit__(self, *exc):
+        time.sleep = self._sleeps[0]
+        if self._sleeps[1] is not None:
+            self._module.sleep = self._sleeps[1]
+
+    def sleep(self, seconds):
+        self.blocked += seconds
+        self.clock.advance(seconds)
+
+    def start(self):
+        self.bus.transactions = 0
+        self.blocked = 0.0
+        self.mode_changes = 0
+        return self.clock()
+
+    def report(self, start, values):
+        minutes = (self.clock() - start) / 60
+        return {
+            "i2c_per_minute": self.bus.transactions / minutes,
+            "blocked_seconds_per_minute": self.blocked / minutes,
+            "mode_changes_per_minute": self.mode_changes / minutes,
+            "values_per_minute": values / minutes,
+        }
+
+
+def before(driver, seconds):
+    with Bench(driver) as bench:
+        start = bench.start()
+        values = 0
+        while bench.clock() - start < seconds:
+            pass_start = bench.clock()
+            bench.sensor.uvi  # pylint: disable=pointless-statement
+            bench.sensor.lux  # pylint: disable=pointless-statement
+            values += 2
+            # A pass blocks for as long as the reads take, then the task
+            # waits out the rest of its period.
+            bench.clock.advance(max(0.0, DISPLAY_PERIOD - (bench.clock() - pass_start)))
+        return bench.report(start, values)
+
+
+def after(driver, seconds):
+    with Bench(driver) as bench:
+        sampler = UVSampler(bench.sensor, period=UV_SAMPLE_PERIOD, clock=bench.clock)
+        period = sampler.period / 4
+        start = bench.start()
+        while bench.clock() - start < seconds:
+            sampler.poll()
+            bench.clock.advance(period)
+        return bench.report(start, sampler.samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--ltr390-driver",
+                        help="directory with the adafruit_ltr390 and adafruit_register sources")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    driver = sim.LTR390
+    if args.ltr390_driver:
+        sim.install(ROOT, ltr390_driver=args.ltr390_driver)
+        driver = sys.modules["adafruit_ltr390"].LTR390
+    report = {
+        "driver": driver.__module__,
+        "before": before(driver, args.minutes * 60),
+        "after": after(driver, args.minutes * 60),
+    }
+    before_, after_ = report["before"], report["after"]
+    report["ok"] = (after_["i2c_per_minute"] < before_["i2c_per_minute"]
+                    and after_["blocked_seconds_per_minute"]
+                    < before_["blocked_seconds_per_minute"])
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
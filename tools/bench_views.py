@@ -0,0 +1,134 @@
+"""Measure tab heap and switch latency with the view cache on and off.
+
+Usage::
+
+    python tools/bench_views.py [--switches 60] [--json report.json]
+
+code.py is loaded on the `pyportal_hal.sim` stand-ins. Each tab is then
+built once under ``tracemalloc`` to get the heap it keeps resident, and the
+calibration window too. Then the tabs are cycled ``--switches`` times with
+`view_manager.ViewManager` caching on and off. For each setting the report
+gives the mean and longest switch time, the tab builds, and the heap held by
+tab groups once every tab has been shown.
+
+``released`` builds the Probes tab, hides and releases it, and checks the
+heap it held is freed (within ``RELEASE_SLACK`` bytes) and code.py keeps no
+reference to its bitmaps, so redrawing them does nothing. The exit status
+is 1 if it fails.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+from run_headless import load_app  # noqa: E402
+
+TABS = ("Radiation", "UV", "Probes", "Diag")
+RELEASE_SLACK = 256  # bytes, for dict and list resizes
+
+
+def heap():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def resident_per_tab(app):
+    """Bytes each tab's group keeps on the heap, and the calibration window's."""
+    sizes = {}
+    app.views.cache = True
+    for name in TABS:
+        app.show_view("Diag" if name != "Diag" else "Radiation")
+        app.views.release_hidden()
+        before = heap()
+        app.show_view(name)
+        sizes[name] = heap() - before
+    before = heap()
+    app.show_calibration_window()
+    sizes["Calibration"] = heap() - before
+    app.hide_calibration_window()
+    app.show_view("Radiation")
+    return sizes
+
+
+def switching(app, cache, switches):
+    """Cycle the tabs and time each switch."""
+    views = app.views
+    views.cache = cache
+    views.release_hidden()
+    base = heap()
+    builds = views.builds
+    times = []
+    for i in range(switches):
+        start = time.perf_counter()
+        app.show_view(TABS[(i + 1) % len(TABS)])
+        times.append(time.perf_counter() - start)
+    return {
+        "switch_ms_mean": 1000 * sum(times) / len(times),
+        "switch_ms_max": 1000 * max(times),
+        "builds": views.builds - builds,
+        "tab_heap_bytes": heap() - base,
+    }
+
+
+def check_released(app):
+    app.views.cache = True
+    app.show_view("Radiation")
+    app.views.release_hidden()
+    before = heap()
+    app.show_view("Probes")
+    built = heap() - before
+    app.show_view("Radiation")
+    app.views.release("Probes")
+    kept = heap() - before
+    writes = sim.simulation().display.writes
+    app.redraw_kp_bars()
+    app.redraw_sparkline()
+    redraw_writes = sim.simulation().display.writes - writes
+    return {
+        "built_bytes": built,
+        "kept_bytes": kept,
+        "bitmaps_dropped": app.kp_bitmap is None and app.spark_bitmap is None,
+        "redraw_writes": redraw_writes,
+        "ok": (kept <= RELEASE_SLACK and app.kp_bitmap is None and app.spark_bitmap is None
+               and redraw_writes == 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--switches", type=int, default=60)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    sim.install(ROOT, sd_dir=tempfile.mkdtemp(prefix="pynt-sd-"))
+    app = load_app()
+    tracemalloc.start()
+    report = {
+        "resident_bytes": resident_per_tab(app),
+        "cache_on": switching(app, True, args.switches),
+        "cache_off": switching(app, False, args.switches),
+        "released": check_released(app),
+    }
+    tracemalloc.stop()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not report["released"]["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Exercise the Wi-Fi state machine against the simulated ESP32.
+
+Usage::
+
+    python tools/bench_wifi.py [--hours 24] [--json report.json]
+
+`wifi_manager.WiFiManager` is polled on a simulated clock, at the delays it
+asks for, against `pyportal_hal.sim.FakeESP32` profiles with different
+connect latency, failure and drop rates. The report gives the share of time
+connected, connection attempts, link drops, ESP32 status reads per hour and
+the longest time a single poll took on the host.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal.sim import FakeESP32  # noqa: E402
+from wifi_manager import CONNECTED, WiFiManager  # noqa: E402
+
+# name: (connect latency s, attempt failure rate, drops per hour)
+PROFILES = {
+    "home": (2.0, 0.0, 0.1),
+    "slow_ap": (8.0, 0.1, 0.5),
+    "flaky": (3.0, 0.3, 6.0),
+    "out_of_range": (3.0, 1.0, 0.0),
+}
+
+
+def simulate(latency, fail_rate, drop_rate, seconds):
+    now = [0.0]
+    clock = lambda: now[0]  # noqa: E731
+    esp = FakeESP32(clock, connect_latency=latency, fail_rate=fail_rate, drop_rate=drop_rate)
+    manager = WiFiManager(esp, "sim", "sim", clock=clock)
+    manager.connect()
+    connected_time = 0.0
+    longest = 0.0
+    while now[0] < seconds:
+        start = time.perf_counter()
+        delay = manager.poll()
+        longest = max(longest, time.perf_counter() - start)
+        delay = 1.0 if delay is None else max(0.05, delay)
+        if manager.state == CONNECTED:
+            connected_time += delay
+        now[0] += delay
+    hours = seconds / 3600
+    return {
+        "connected_share": connected_time / seconds,
+        "attempts": manager.attempts,
+        "drops": esp.drops,
+        "status_reads_per_hour": esp.status_reads / hours,
+        "longest_poll_ms": longest * 1000,
+        "final_state": manager.state_name,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {name: simulate(*profile, args.hours * 3600) for name, profile in PROFILES.items()}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Cross-compile the project modules to .mpy and report their size and heap.
+
+Usage::
+
+    python tools/build_mpy.py [--out build] [--mpy-cross PATH] [--check-dir DIR]
+                              [--json report.json] [--compare baseline.json]
+                              [--threshold 10]
+
+Every module of this project under ``lib/`` is compiled with ``mpy-cross``
+(``--mpy-cross``, or the one on ``PATH``) into ``--out``/lib, ready to be
+copied over CIRCUITPY/lib in place of the ``.py`` files. The vendored
+``adafruit_*`` packages already ship as ``.mpy`` and the host-only stand-ins
+are left out. code.py itself always runs from source, which is why the
+helpers it does not need to own live in lib modules such as ``widgets``.
+
+``--check-dir`` (the checkout by default, or a mounted CIRCUITPY) and the
+build are then checked for:
+
+* ``shadowed``: a ``.py`` next to an ``.mpy`` of the same name. CircuitPython
+  imports the ``.py`` first, so the ``.mpy`` is dead weight on flash.
+* ``stale``: such an ``.mpy`` older than its ``.py``.
+* ``incompatible``: an ``.mpy`` whose header is not CircuitPython's, or
+  whose format version differs from the one ``mpy-cross`` emits (or, without
+  it, from the vendored libraries), so importing it fails on the device.
+
+For each module the report gives its source bytes, its ``.mpy`` bytes (the
+bytecode and constants the device loads into RAM when importing it) and the
+heap its import keeps on the host, measured with ``tracemalloc`` on the
+`pyportal_hal.sim` stand-ins with its dependencies already loaded. The host
+figure is CPython's, so it tracks changes rather than device bytes.
+``--compare`` prints the change from an earlier ``--json`` report and exits
+with status 1 if a module grew by more than ``--threshold`` percent and 256
+bytes in either size. The exit status is also 1 if a check fails or a module
+does not compile; without ``mpy-cross`` the build is skipped and the rest
+still runs.
+"""
+
+import argparse
+import ast
+import gc
+import importlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIB = os.path.join(ROOT, "lib")
+sys.path.insert(0, LIB)
+
+from pyportal_hal import sim  # noqa: E402  pylint: disable=wrong-import-position
+
+# lib/ files that only run on the host
+HOST_ONLY = ("pyportal_hal/sim.py",)
+
+# First byte of a CircuitPython .mpy (MicroPython's is "M")
+MPY_MAGIC = ord("C")
+
+# Growth in bytes ignored by --compare, as in tools/bench.py
+SIZE_SLACK = 256
+
+
+def project_modules(lib=LIB):
+    """Paths under ``lib``, relative to it, of the project's ``.py`` modules."""
+    modules = []
+    for directory, subdirectories, files in os.walk(lib):
+        relative = os.path.relpath(directory, lib)
+        if relative == ".":
+            # Vendored packages from the Adafruit bundle
+            subdirectories[:] = [d for d in subdirectories if not d.startswith("adafruit_")]
+        subdirectories[:] = sorted(d for d in subdirectories if d != "__pycache__")
+        for name in sorted(files):
+            path = os.path.normpath(os.path.join(relative, name)).replace(os.sep, "/")
+            if name.endswith(".py") and path not in HOST_ONLY:
+                modules.append(path)
+    return modules
+
+
+def module_name(path):
+    """Import name of the lib-relative ``path``."""
+    name = path[:-3].replace("/", ".")
+    return name[:-len(".__init__")] if name.endswith(".__init__") else name
+
+
+def mpy_header(path):
+    """The magic byte and format version of an ``.mpy`` file."""
+    with open(path, "rb") as file:
+        header = file.read(2)
+    return (header[0], header[1]) if len(header) == 2 else (None, None)
+
+
+def find_mpy_cross(path=None):
+    """The ``mpy-cross`` command and the .mpy version it emits, or None."""
+    command = path or shutil.which("mpy-cross")
+    if not command:
+        return None, None
+    try:
+        output = subprocess.run([command, "--version"], capture_output=True, text=True,
+                                check=False).stdout
+    except OSError:
+        return None, None
+    match = re.search(r"mpy v(\d+)", output)
+    return command, int(match.group(1)) if match else None
+
+
+def vendored_mpy_version(lib=LIB):
+    """The most common format version among the ``.mpy`` files in ``lib``."""
+    versions = {}
+    for directory, _, files in os.walk(lib):
+        for name in files:
+            if name.endswith(".mpy"):
+                magic, version = mpy_header(os.path.join(directory, name))
+                if magic == MPY_MAGIC:
+                    versions[version] = versions.get(version, 0) + 1
+    return max(versions, key=versions.get) if versions else None
+
+
+def check_tree(root, mpy_version):
+    """Shadowed, stale and incompatible ``.mpy`` files under ``root``/lib."""
+    problems = []
+    lib = os.path.join(root, "lib")
+    for directory, subdirectories, files in os.walk(lib):
+        subdirectories[:] = [d for d in subdirectories if d != "__pycache__"]
+        for name in sorted(files):
+            if not name.endswith(".mpy"):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            source = path[:-4] + ".py"
+            if os.path.exists(source):
+                problems.append({"path": relative, "problem": "shadowed",
+                                 "detail": "the .py next to it is imported instead"})
+                if os.path.getmtime(path) < os.path.getmtime(source):
+                    problems.append({"path": relative, "problem": "stale",
+                                     "detail": "older than its .py"})
+            magic, version = mpy_header(path)
+            if magic != MPY_MAGIC:
+                problems.append({"path": relative, "problem": "incompatible",
+                                 "detail": "not a CircuitPython .mpy"})
+            elif mpy_version is not None and version != mpy_version:
+                problems.append({"path": relative, "problem": "incompatible",
+                                 "detail": "mpy v{}, expected v{}".format(version, mpy_version)})
+    return problems
+
+
+def compile_module(command, path, out):
+    """Cross-compile the lib-relative ``path`` into ``out``/lib. Returns the
+    .mpy size, or the compiler's error text."""
+    target = os.path.join(out, "lib", path[:-3] + ".mpy")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    result = subprocess.run([command, "-o", target, "-s", path, os.path.join(LIB, path)],
+                            capture_output=True, text=True, check=False)
+    if result.returncode:
+        return (result.stderr or result.stdout).strip()
+    return os.path.getsize(target)
+
+
+def dependencies(path):
+    """Absolute module names imported by the lib-relative ``path``."""
+    with open(os.path.join(LIB, path)) as file:
+        tree = ast.parse(file.read(), path)
+    name = module_name(path)
+    package = name if path.endswith("__init__.py") else name.rpartition(".")[0]
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = package.split(".")
+                base = ".".join(parts[:len(parts) - node.level + 1] + ([base] if base else []))
+            names.append(base)
+    return names
+
+
+def import_heap(path):
+    """Bytes the import of the lib-relative ``path`` keeps on the host heap,
+    with its dependencies loaded first, or None if it cannot be imported."""
+    for dependency in dependencies(path):
+        try:
+            importlib.import_module(dependency)
+        except Exception:  # pylint: disable=broad-except
+            pass  # device-only modules; the module's own import decides
+    name = module_name(path)
+    spec = importlib.util.spec_from_file_location(
+        "_heap_" + name.replace(".", "_"), os.path.join(LIB, path))
+    module = importlib.util.module_from_spec(spec)
+    # Relative imports resolve against the real package, already loaded
+    module.__package__ = name if path.endswith("__init__.py") else name.rpartition(".")[0]
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        spec.loader.exec_module(module)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    gc.collect()
+    kept = tracemalloc.get_traced_memory()[0] - before
+    del module
+    return kept
+
+
+def compare(report, baseline, threshold):
+    """Print the change from ``baseline`` and return the grown modules."""
+    grown = []
+    for path, result in report["modules"].items():
+        old = baseline.get("modules", {}).get(path)
+        if old is None:
+            print(f"{path:28} new")
+            continue
+        changes = []
+        flag = ""
+        for key in ("mpy_bytes", "import_heap_bytes"):
+            if result.get(key) is None or old.get(key) is None:
+                continue
+            change = result[key] - old[key]
+            changes.append(f"{change:+6d} B {key[:-6]}")
+            if change > max(SIZE_SLACK, old[key] * threshold / 100):
+                flag = "  GREW"
+        if flag:
+            grown.append(path)
+        print(f"{path:28} {'  '.join(changes)}{flag}")
+    return grown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=os.path.join(ROOT, "build"),
+                        help="directory the .mpy files are written under")
+    parser.add_argument("--mpy-cross", help="the CircuitPython mpy-cross to use")
+    parser.add_argument("--check-dir", default=ROOT,
+                        help="tree to check for shadowed, stale and incompatible .mpy files")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="an earlier report to compare with")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="percent growth counted as a regression")
+    args = parser.parse_args()
+
+    command, mpy_version = find_mpy_cross(args.mpy_cross)
+    if command is None:
+        print("mpy-cross not found, skipping the build", file=sys.stderr)
+    if mpy_version is None:
+        mpy_version = vendored_mpy_version()
+
+    sim.install(ROOT)
+    tracemalloc.start()
+    failed = False
+    modules = {}
+    for path in project_modules():
+        mpy = compile_module(command, path, args.out) if command else None
+        if isinstance(mpy, str):
+            print(f"{path}: {mpy}", file=sys.stderr)
+            failed = True
+            mpy = None
+        modules[path] = {
+            "source_bytes": os.path.getsize(os.path.join(LIB, path)),
+            "mpy_bytes": mpy,
+            "import_heap_bytes": import_heap(path),
+        }
+    tracemalloc.stop()
+
+    problems = check_tree(args.check_dir, mpy_version)
+    if command:
+        # Catches an mpy-cross built for MicroPython rather than CircuitPython
+        problems.extend(check_tree(args.out, mpy_version))
+    report = {
+        "mpy_cross": command,
+        "mpy_version": mpy_version,
+        "modules": modules,
+        "total_source_bytes": sum(m["source_bytes"] for m in modules.values()),
+        "total_mpy_bytes": (sum(m["mpy_bytes"] for m in modules.values())
+                            if command and not failed else None),
+        "problems": problems,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(report, baseline, args.threshold):
+            failed = True
+    if failed or problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Check calibration profiles, history resampling and auto-cal on simulated pulses.
+
+Usage::
+
+    python tools/check_calibration.py [--trials 200] [--minutes 120] [--json report.json]
+
+Pulses come from the `pyportal_hal.sim` Geiger source on a stepped clock, so
+hours of counting take a moment. The checks are:
+
+* ``autocal``: ``--trials`` runs of `calibration.AutoCalibration` at a
+  reference dose, each counting ``--minutes`` of pulses drawn at the rate a
+  known K gives. About 95% of the intervals should hold the true K. The
+  report gives that coverage, the mean error of the fit and the minutes
+  counted before the interval was within 10% and 5%.
+* ``resample``: an hour of counts at a 60 s unit resampled by
+  `dose_accumulator.DoseAccumulator.resample` to other units. The total must
+  be kept whenever the new slots cover whole old ones, and the CPM must
+  stay the same. With a unit too short for the one hour window to fit, the
+  window must be capped at the history and report the span it covers.
+* ``store``: `calibration.CalibrationStore` read back from a ``bytearray``,
+  with erased and damaged memory falling back to the defaults, and a save
+  of unchanged profiles writing nothing.
+* ``late_ticks``: code.py loaded on a stepped clock with AUTO on, and its
+  Geiger task run up to ``LATE`` seconds after each unit is due. The fit
+  must be credited with the time that passed, not one unit per run, and
+  its interval must hold the K the simulated source was set to.
+* ``reboot``: code.py loaded, a profile edited and saved from the
+  calibration window's handlers, then code.py loaded again on the same
+  simulated NVM with the saved K and unit in use.
+
+The exit status is 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+from calibration import AutoCalibration, CalibrationStore  # noqa: E402
+from dose_accumulator import DoseAccumulator  # noqa: E402
+from run_headless import load_app  # noqa: E402
+
+K_ALPHA = 53.032
+UNIT = 60
+REFERENCE = 0.5  # µSv/h, a check source on the detector
+RESAMPLE_UNITS = (0.5, 10, 30, 45, 60, 90, 120, 600)
+LATE = 30  # seconds a late Geiger task run may be behind
+
+
+def pulse_counts(cpm, unit, slots, seed):
+    """``slots`` counts of ``unit`` seconds from the simulated Geiger source."""
+    now = [0.0]
+    source = sim.GeigerSource(lambda: now[0], cpm, seed=seed)
+    source.value()
+    counts = []
+    for _ in range(slots):
+        before = source.pulses
+        now[0] += unit
+        source.value()
+        counts.append(source.pulses - before)
+    return counts
+
+
+def check_autocal(trials, minutes):
+    covered = 0
+    errors = []
+    reached = {0.10: [], 0.05: []}
+    for trial in range(trials):
+        fit = AutoCalibration(REFERENCE)
+        for minute, count in enumerate(pulse_counts(K_ALPHA * REFERENCE, UNIT, minutes, trial)):
+            fit.add(count, UNIT)
+            precision = fit.precision()
+            for target, times in reached.items():
+                if precision is not None and precision <= target and len(times) == trial:
+                    times.append(minute + 1)
+        k_alpha, low, high = fit.estimate()
+        covered += low <= K_ALPHA <= high
+        errors.append(abs(k_alpha - K_ALPHA) / K_ALPHA)
+    coverage = covered / trials
+    return {
+        "true_k": K_ALPHA,
+        "reference_usvh": REFERENCE,
+        "coverage": coverage,
+        "mean_error": sum(errors) / trials,
+        "minutes_to_10pct": sum(reached[0.10]) / len(reached[0.10]) if reached[0.10] else None,
+        "minutes_to_5pct": sum(reached[0.05]) / len(reached[0.05]) if reached[0.05] else None,
+        # A 95% interval missing more than 1 in 10 is wrong, not unlucky
+        "ok": coverage >= 0.9,
+    }
+
+
+def check_resample():
+    counts = pulse_counts(300, UNIT, 60, seed=1)
+    results = {}
+    ok = True
+    for unit in RESAMPLE_UNITS:
+        dose = DoseAccumulator(60, UNIT, K_ALPHA)
+        for count in counts:
+            dose.add(count)
+        dose.resample(unit)
+        cpm = sum(dose.counts()) * 60 / (len(dose) * unit) if len(dose) else 0
+        result = {
+            "slots": len(dose),
+            "total": dose.total,
+            "total_matches_counts": dose.total == sum(dose.counts()),
+            "cpm": cpm,
+        }
+        covered = len(dose) * unit
+        if covered % UNIT == 0:
+            # Whole old slots: their counts must all be there
+            result["total_kept"] = dose.total == sum(counts[len(counts) - int(covered // UNIT):])
+        ok = ok and result["total_matches_counts"] and result.get("total_kept", True)
+        # Rounding moves at most one count across each slot edge
+        ok = ok and abs(cpm - 300) <= 300 * 0.1 + 60 / unit
+        results[str(unit)] = result
+    # At half the unit 60 slots hold 30 minutes: the 10 minute window is
+    # whole, the hour is capped at the history and covers the 30 minutes
+    dose = DoseAccumulator(60, UNIT, K_ALPHA)
+    for count in counts:
+        dose.add(count)
+    dose.resample(UNIT / 2)
+    spans = [dose.window_seconds(window) for window in range(3)]
+    capped = (spans == [60, 600, 1800]
+              and abs(dose.window_cpm(2) * len(dose) * dose.unit / 60 - dose.total) < 1e-6)
+    results["short_unit_spans"] = spans
+    results["ok"] = ok and capped
+    return results
+
+
+def check_store():
+    nvm = bytearray(b"\xff" * 256)
+    store = CalibrationStore(nvm, K_ALPHA, UNIT)
+    erased = store.load()
+    store.profiles[1][1:] = [60.5, 30.0]
+    store.profiles[1][0] = "SOURCE"
+    store.select(1)
+    written = store.save()
+    again = store.save()
+    loaded = CalibrationStore(nvm, 1.0, 1.0)
+    read_back = loaded.load()
+    same = (loaded.active == 1 and loaded.profile[0] == "SOURCE"
+            and abs(loaded.profile[1] - 60.5) < 1e-4 and loaded.profile[2] == 30.0)
+    nvm[20] ^= 0xFF
+    damaged = CalibrationStore(nvm, K_ALPHA, UNIT)
+    rejected = not damaged.load() and damaged.profile[1] == K_ALPHA
+    return {
+        "erased_loads": erased,
+        "bytes_written": written,
+        "bytes_rewritten": again,
+        "read_back": read_back and same,
+        "damaged_rejected": rejected,
+        "ok": not erased and written > 0 and again == 0 and read_back and same and rejected,
+    }
+
+
+def check_late_ticks(minutes=240, cpm=600):
+    clock = sim.SteppedClock(0.0)
+    monotonic = time.monotonic
+    time.monotonic = clock
+    try:
+        sim.install(ROOT, clock=clock, geiger_cpm=cpm, sd_dir=tempfile.mkdtemp(prefix="pynt-sd-"))
+        app = load_app()
+        app.open_calibration()
+        app.toggle_autocal()
+        autocal = app.autocal
+        start = clock()
+        rng = random.Random(4)
+        while clock() - start < minutes * 60:
+            clock.advance(app.HISTORY_UNIT + rng.uniform(0, LATE))
+            app.process_radiation()
+        elapsed = clock() - start
+    finally:
+        time.monotonic = monotonic
+    k_alpha, low, high = autocal.estimate()
+    true_k = cpm / autocal.reference
+    return {
+        "seconds_credited": autocal.seconds,
+        "seconds_elapsed": elapsed,
+        "k_alpha": k_alpha,
+        "interval": (low, high),
+        "true_k": true_k,
+        "ok": abs(autocal.seconds - elapsed) < 1e-6 and low <= true_k <= high,
+    }
+
+
+def check_reboot():
+    sd_dir = tempfile.mkdtemp(prefix="pynt-sd-")
+    simulation = sim.install(ROOT, sd_dir=sd_dir)
+    app = load_app()
+    for count in pulse_counts(120, UNIT, 30, seed=2):
+        app.dose.add(count)
+    cpm = app.dose.cpm()
+    app.open_calibration()
+    app.adjust_k(1, 1.5)
+    for _ in range(60):
+        app.adjust_history_unit(-1)
+    app.save_profiles()
+    app.close_calibration()
+    saved = (app.K_ALPHA, app.HISTORY_UNIT)
+    resampled_cpm = app.dose.cpm()
+
+    sim.install(ROOT, nvm=simulation.nvm, sd_dir=sd_dir)
+    rebooted = load_app()
+    loaded = (rebooted.K_ALPHA, rebooted.HISTORY_UNIT)
+    return {
+        "saved": saved,
+        "loaded": loaded,
+        "cpm_before": cpm,
+        "cpm_resampled": resampled_cpm,
+        "ok": (abs(loaded[0] - saved[0]) < 1e-3 and loaded[1] == saved[1]
+               and rebooted.dose.unit == saved[1] and abs(resampled_cpm - cpm) < 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--minutes", type=int, default=120)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "autocal": check_autocal(args.trials, args.minutes),
+        "resample": check_resample(),
+        "store": check_store(),
+        "late_ticks": check_late_ticks(),
+        "reboot": check_reboot(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not all(check["ok"] for check in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Check a Kp refresh stays inside KP_HEAP_BUDGET on the simulated network.
+
+Usage::
+
+    python tools/check_kp_heap.py [--rows 57 480 4800] [--json report.json]
+
+`kp_index.KpHistory` is refreshed as code.py does it, through a
+`noaa_client.NOAAClient` session on the `pyportal_hal.sim` NOAA stand-in,
+with ``KP_HISTORY_LENGTH`` and ``KP_HEAP_BUDGET`` read from code.py.
+``gc.mem_free()`` is replaced by a ``tracemalloc`` figure, so the history's
+own budget check runs as on the device and aborts the refresh with
+``MemoryError`` when the budget is exceeded. The stand-in runs in its own
+process so the server is not traced, and the figure leaves out CPython's
+8 kB socket read buffer, which has no counterpart in the PyPortal's heap. The recorded feed in tools/noaa
+is fetched, then synthetic feeds of each ``--rows`` length, whose peak
+should be no higher since rows are not kept. A last refresh with a budget of
+``TINY_BUDGET`` bytes must abort, to show the check is live. Last, a
+refresh of a filled history is made to fail with ``MemoryError`` half way
+through the feed, and the history must keep the values it had.
+
+Heap is CPython bytes, which run larger than CircuitPython's, so a pass here
+leaves the device some room. The exit status is 1 if a refresh goes over
+the budget, keeps the wrong values, or the tiny budget is not enforced.
+"""
+
+import argparse
+import ast
+import gc
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from kp_index import KpHistory  # noqa: E402
+from noaa_client import NOAAClient  # noqa: E402
+from pyportal_hal import sim  # noqa: E402
+
+FEED = "noaa-planetary-k-index.json"
+KP_URL = "https://services.swpc.noaa.gov/products/" + FEED
+TINY_BUDGET = 256
+# Heap the traced figure is taken from, so "free" falls as memory is used
+HEAP_SIZE = 1 << 30
+HOST_ONLY = (tracemalloc.Filter(True, socket.__file__),)
+
+
+def traced_free():
+    """``gc.mem_free()`` stand-in counting down from `HEAP_SIZE`, or 0 (no
+    figure, as off the device) when not tracing."""
+    if not tracemalloc.is_tracing():
+        return 0
+    # Total first, so the snapshot taken to find the host's share is not in it
+    used = tracemalloc.get_traced_memory()[0]
+    host = tracemalloc.take_snapshot().filter_traces(HOST_ONLY)
+    return HEAP_SIZE - used + sum(trace.size for trace in host.traces)
+
+
+def serve(directory, ports):
+    """Run a NOAA stand-in on ``directory`` and put its port on ``ports``."""
+    stand_in = sim.NOAAStandIn(directory)
+    ports.put(stand_in.port)
+    threading.Event().wait()  # until the process is terminated
+
+
+def app_constants(*names):
+    """Read top-level constants from code.py without running it."""
+    with open(os.path.join(ROOT, "code.py")) as file:
+        tree = ast.parse(file.read())
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Name) and target.id in names:
+                values[target.id] = ast.literal_eval(node.value)
+    return [values[name] for name in names]
+
+
+def synthetic_feed(rows):
+    """A Kp feed of ``rows`` 3-hourly values cycling through 0 to 9."""
+    feed = [["time_tag", "Kp", "a_running", "station_count"]]
+    for i in range(rows):
+        day, hour = divmod(i * 3, 24)
+        feed.append(["2025-{:02d}-{:02d} {:02d}:00:00.000".format(
+            1 + day // 28 % 12, 1 + day % 28, hour),
+            "{:.2f}".format(i % 28 / 3), str(i % 50), "8"])
+    return feed
+
+
+def refresh(port, length, budget, history=None):
+    """Refresh ``history``, or a new one, from the stand-in. Returns
+    (history, error).
+
+    With ``budget`` None nothing is traced."""
+    if history is None:
+        history = KpHistory(length, heap_budget=budget)
+    history.heap_budget = budget
+    client = NOAAClient(sim.Session(port))
+    if budget is None:
+        history.refresh(client, KP_URL)
+        return history, None
+    gc.collect()
+    tracemalloc.start()
+    traced_free()  # compiles and caches the filter patterns
+    try:
+        for _ in history.refresh_steps(client, KP_URL):
+            pass
+        error = None
+    except MemoryError as exc:
+        error = str(exc)
+    finally:
+        tracemalloc.stop()
+    return history, error
+
+
+def check_feed(port, directory, feed, length, budget):
+    with open(os.path.join(directory, FEED), "w") as file:
+        json.dump(feed, file)
+    history, error = refresh(port, length, budget)
+    want = [float(row[1]) for row in feed[1:]][-length:]
+    kept = [round(value, 2) for value in history.values()]
+    ok = error is None and kept == [round(value, 2) for value in want]
+    return {
+        "rows": len(feed) - 1,
+        "peak_heap": history.peak_heap,
+        "budget": budget,
+        "error": error,
+        "ok": ok,
+    }
+
+
+def check_abort(port, length):
+    """Refresh a filled history with a ``MemoryError`` raised half way
+    through the feed served at ``port``."""
+    history, _ = refresh(port, length, None)
+    kept = list(history.values())
+    on_row = history._on_row  # pylint: disable=protected-access
+    rows = [0]
+
+    def failing(row):
+        rows[0] += 1
+        if rows[0] > length // 2:
+            raise MemoryError("out of heap half way")
+        on_row(row)
+
+    history._on_row = failing  # pylint: disable=protected-access
+    try:
+        history.refresh(NOAAClient(sim.Session(port)), KP_URL)
+        error = None
+    except MemoryError as exc:
+        error = str(exc)
+    return {
+        "error": error,
+        "ok": error is not None and list(history.values()) == kept,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[57, 480, 4800])
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    length, budget = app_constants("KP_HISTORY_LENGTH", "KP_HEAP_BUDGET")
+    gc.mem_free = traced_free
+    with open(os.path.join(ROOT, "tools", "noaa", FEED)) as file:
+        recorded = json.load(file)
+    report = {"budget": budget}
+    with tempfile.TemporaryDirectory() as directory:
+        ports = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(directory, ports), daemon=True)
+        server.start()
+        try:
+            port = ports.get(timeout=10)
+            # Untraced first fetch, so lazy imports and caches are not counted
+            check_feed(port, directory, recorded, length, None)
+            report["recorded"] = check_feed(port, directory, recorded, length, budget)
+            for rows in args.rows:
+                report["rows_{}".format(rows)] = check_feed(
+                    port, directory, synthetic_feed(rows), length, budget)
+            tiny = check_feed(port, directory, recorded, length, TINY_BUDGET)
+            report["abort_keeps_history"] = check_abort(port, length)
+        finally:
+            server.terminate()
+    tiny["ok"] = tiny["error"] is not None
+    report["tiny_budget"] = tiny
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not all(check["ok"] for key, check in report.items() if key != "budget"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Replay the recorded NOAA feeds through the stream parser and check it.
+
+Usage::
+
+    python tools/check_noaa.py [--chunks 1 7 64 256 4096] [--json report.json]
+
+Each ``tools/noaa/*.json`` feed is fed to `noaa_stream.NOAAStreamParser` in
+chunks of every ``--chunks`` size, and the header and rows it gives are
+compared with ``json.loads`` of the same file. The recorded feeds quote every
+value, so each one is also replayed re-encoded with bare numbers and some
+``null`` values, the way NOAA sends gaps, to cover bare tokens split across
+chunks. A second pass with ``columns`` set checks the selected columns only.
+
+For every feed the report also gives the peak heap (from ``tracemalloc``,
+the payload itself left out) of streaming it in ``CHUNK`` byte pieces into a
+parser that keeps the newest row, as `noaa_client` does, and of
+``json.loads``, which the sketch used before. Only the streamed peak is
+bounded whatever the feed length, so the difference grows with the feed;
+the stream must peak lower for every feed.
+
+The exit status is 1 if any replay differs from ``json.loads`` or a feed
+fails the peak check.
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+# pylint: disable=wrong-import-position
+from noaa_stream import NOAAStreamParser  # noqa: E402
+
+FEEDS = os.path.join(ROOT, "tools", "noaa", "*.json")
+# Every this many values of the bare variant is null
+NULL_EVERY = 7
+CHUNK = 256  # bytes per read, as noaa_client streams
+
+
+def bare_variant(data):
+    """``data`` with numeric strings made numbers and some values null."""
+    rows = [data[0]]
+    position = 0
+    for row in data[1:]:
+        bare = []
+        for value in row:
+            position += 1
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                bare.append(value)
+                continue
+            if position % NULL_EVERY == 0:
+                bare.append(None)
+            else:
+                bare.append(int(number) if number == int(number) else number)
+        rows.append(bare)
+    return rows
+
+
+def same(parsed, value):
+    """Compare one parsed field (a string or None) with a JSON value."""
+    if value is None or isinstance(value, str):
+        return parsed == value
+    return parsed is not None and float(parsed) == value
+
+
+def replay(body, data, chunk, columns=None):
+    """Stream ``body`` through the parser and compare it with ``data``.
+
+    Returns the first difference as a string, or None."""
+    rows = []
+    parser = NOAAStreamParser(0, columns=columns, on_row=rows.append)
+    for start in range(0, len(body), chunk):
+        parser.feed(body[start:start + chunk])
+    parser.finish()
+    header, want = data[0], data[1:]
+    if columns is not None:
+        header = [header[c] for c in columns]
+        want = [[row[c] for c in columns] for row in want]
+    if parser.header != header:
+        return "header {!r} != {!r}".format(parser.header, header)
+    if len(rows) != len(want) or parser.row_count != len(want):
+        return "{} rows != {}".format(len(rows), len(want))
+    for number, (got, row) in enumerate(zip(rows, want)):
+        if len(got) != len(row) or not all(map(same, got, row)):
+            return "row {}: {!r} != {!r}".format(number, got, row)
+    return None
+
+
+def peak_of(function):
+    """Peak traced bytes above the starting point while ``function`` runs."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        function()
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def stream(body):
+    parser = NOAAStreamParser(1)
+    for start in range(0, len(body), CHUNK):
+        parser.feed(body[start:start + CHUNK])
+    return parser.finish()
+
+
+def check_feed(path, chunks):
+    with open(path, "rb") as file:
+        body = file.read()
+    data = json.loads(body)
+    variants = (("recorded", body, data),)
+    bare = bare_variant(data)
+    variants += (("bare", json.dumps(bare).encode(), bare),)
+    # Every other column, as code.py drops the columns it does not show
+    columns = tuple(range(1, len(data[0]), 2))
+    failures = []
+    for name, variant, want in variants:
+        for chunk in chunks:
+            for cols in (None, columns):
+                problem = replay(variant, want, chunk, cols)
+                if problem:
+                    failures.append("{} chunk={} columns={}: {}".format(
+                        name, chunk, cols, problem))
+    streamed_peak = peak_of(lambda: stream(body))
+    loads_peak = peak_of(lambda: json.loads(body))
+    return {
+        "rows": len(data) - 1,
+        "bytes": len(body),
+        "replays": len(variants) * len(chunks) * 2,
+        "failures": failures,
+        "streamed_peak_bytes": streamed_peak,
+        "json_loads_peak_bytes": loads_peak,
+        "peak_saved_bytes": loads_peak - streamed_peak,
+        "ok": not failures and streamed_peak < loads_peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+",
+                        default=[1, 7, 64, 256, 4096])
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {os.path.basename(path): check_feed(path, args.chunks)
+              for path in sorted(glob.glob(FEEDS))}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not report or not all(feed["ok"] for feed in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Check the scheduler on a simulated clock: a slow fetch and failing tasks.
+
+Usage::
+
+    python tools/check_scheduler.py [--seconds 30] [--link-bps 4096] [--json report.json]
+
+Time comes from a stepped clock that stands in for ``time.monotonic``, so a
+run is repeatable and takes a moment whatever it simulates. The checks are:
+
+* ``slow_fetch``: code.py is loaded on the `pyportal_hal.sim` stand-ins (as
+  `run_headless` does) and connects Wi-Fi, which starts the NOAA fetches.
+  Every chunk read costs its length over ``--link-bps`` of simulated time,
+  as a slow link blocks the socket read on the device, and every tick costs
+  ``TICK_SECONDS``. The run is made twice: with the fetches yielding after
+  every chunk, as they do, and with each fetch drained in one step, as the
+  old main loop did. For each the report gives the time spent fetching, the
+  Geiger task's runs per second inside and outside the fetches, the longest
+  gap between its runs during a fetch, and the pulses counted against the
+  pulses sent. With yielding fetches the longest gap must stay within
+  ``GAP_CHUNKS`` chunk reads.
+* ``task_error``: a task that raises on every run and a generator task that
+  raises part way run next to a counting task. The scheduler must keep
+  ticking, count the errors, close the generator and reschedule both one
+  period later.
+
+The exit status is 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+
+# Installed before code.py and the scheduler are imported, so their clock
+# defaults pick it up.
+CLOCK = sim.SteppedClock()
+time.monotonic = CLOCK
+
+from run_headless import load_app  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+
+CHUNK = 256  # bytes per read, as noaa_client streams
+TICK_SECONDS = 0.001  # simulated cost of one scheduler tick
+# Chunk reads that may fall between two Geiger runs: the solar and Kp
+# fetches can each read one in the same tick, plus one for slack.
+GAP_CHUNKS = 3
+
+
+def slow_link(link_bps):
+    """Make every chunk read from the NOAA stand-in cost simulated time."""
+    iter_content = sim.Response.iter_content
+
+    def slow_iter_content(self, chunk_size=1, decode_unicode=False):
+        for chunk in iter_content(self, chunk_size, decode_unicode):
+            CLOCK.advance(len(chunk) / link_bps)
+            yield chunk
+
+    sim.Response.iter_content = slow_iter_content
+
+
+def timed_fetch(func, windows, blocking):
+    """Wrap a fetch task so the time each fetch takes goes into ``windows``.
+
+    With ``blocking`` the fetch runs to the end in one step."""
+
+    def steps(fetch):
+        start = CLOCK()
+        try:
+            delay = yield from fetch
+        finally:
+            windows.append((start, CLOCK()))
+        return delay
+
+    def drained(fetch):
+        start = CLOCK()
+        try:
+            while True:
+                next(fetch)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            windows.append((start, CLOCK()))
+
+    def run():
+        result = func()
+        if not hasattr(result, "send"):
+            return result
+        return drained(result) if blocking else steps(result)
+
+    return run
+
+
+def merged(windows):
+    """``(start, end)`` windows with overlapping ones joined, in order."""
+    joined = []
+    for begin, end in sorted(windows):
+        if joined and begin <= joined[-1][1]:
+            joined[-1] = (joined[-1][0], max(end, joined[-1][1]))
+        else:
+            joined.append((begin, end))
+    return joined
+
+
+def run_slow_fetch(seconds, cpm, blocking):
+    with tempfile.TemporaryDirectory() as sd_dir:
+        simulation = sim.install(ROOT, clock=CLOCK, geiger_cpm=cpm,
+                                 noaa_dir=os.path.join(ROOT, "tools", "noaa"),
+                                 sd_dir=sd_dir, wifi_latency=0.5)
+        try:
+            app = load_app()
+            scheduler = app.scheduler
+            geiger_runs = []
+            process = app.geiger_task.func
+
+            def geiger():
+                geiger_runs.append(CLOCK())
+                return process()
+
+            app.geiger_task.func = geiger
+            windows = []
+            for task in (app.solar_task, app.kp_task):
+                task.func = timed_fetch(task.func, windows, blocking)
+            app.wifi.connect()
+            scheduler.wake(app.wifi_task)
+            start = CLOCK()
+            pulses = simulation.geiger.pulses
+            counted = app.dose.total
+            while CLOCK() - start < seconds:
+                CLOCK.advance(max(TICK_SECONDS, scheduler.tick()))
+            counted = app.dose.total + app.pulse_counter.take() - counted
+            pulses = simulation.geiger.pulses - pulses
+        finally:
+            if simulation.noaa:
+                simulation.noaa.close()
+    windows = merged(windows)
+    fetching = sum(end - begin for begin, end in windows)
+    inside = [t for t in geiger_runs if any(begin <= t <= end for begin, end in windows)]
+    gaps = [later - earlier for earlier, later in zip(geiger_runs, geiger_runs[1:])
+            if any(begin <= later and earlier <= end for begin, end in windows)]
+    return {
+        "fetches": len(windows),
+        "fetch_seconds": fetching,
+        "geiger_runs_per_second_fetching": len(inside) / fetching if fetching else None,
+        "geiger_runs_per_second_idle": ((len(geiger_runs) - len(inside))
+                                        / (seconds - fetching)),
+        "geiger_max_gap_fetching": max(gaps) if gaps else None,
+        "geiger_late": app.geiger_task.late,
+        "task_errors": {t.name: t.errors for t in scheduler.tasks if t.errors},
+        "geiger_pulses": pulses,
+        "geiger_counted": counted,
+    }
+
+
+def check_slow_fetch(seconds, link_bps, cpm):
+    slow_link(link_bps)
+    yielding = run_slow_fetch(seconds, cpm, blocking=False)
+    blocking = run_slow_fetch(seconds, cpm, blocking=True)
+    gap_limit = GAP_CHUNKS * CHUNK / link_bps + TICK_SECONDS
+    ok = (yielding["fetches"] > 0 and yielding["geiger_max_gap_fetching"] is not None
+          and yielding["geiger_max_gap_fetching"] <= gap_limit
+          and not yielding["task_errors"])
+    return {
+        "link_bps": link_bps,
+        "gap_limit": gap_limit,
+        "yielding": yielding,
+        "blocking": blocking,
+        "ok": ok,
+    }
+
+
+def check_task_error(seconds=10.0):
+    clock = sim.SteppedClock(0.0)
+    scheduler = Scheduler(clock=clock)
+    closed = []
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+
+    def fail():
+        raise ValueError("fail")
+
+    def fail_part_way():
+        try:
+            yield 0.1
+            raise OSError("fail part way")
+        finally:
+            closed.append(clock())
+
+    counting = scheduler.add("count", count, 0.5)
+    failing = scheduler.add("fail", fail, 1)
+    stepping = scheduler.add("steps", fail_part_way, 2)
+    while clock() < seconds:
+        clock.advance(max(TICK_SECONDS, scheduler.tick()))
+    report = {
+        "count_runs": counter[0],
+        "fail_errors": failing.errors,
+        "steps_errors": stepping.errors,
+        "steps_closed": len(closed),
+        "last_error": repr(stepping.last_error),
+    }
+    report["ok"] = (counting.runs == counter[0] >= int(seconds / 0.5)
+                    and failing.errors >= int(seconds) - 1
+                    and stepping.errors >= int(seconds / 2) - 1
+                    and len(closed) == stepping.errors
+                    and not stepping.busy
+                    and isinstance(stepping.last_error, OSError))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--link-bps", type=float, default=4096,
+                        help="simulated download speed in bytes per second")
+    parser.add_argument("--cpm", type=float, default=60)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "slow_fetch": check_slow_fetch(args.seconds, args.link_bps, args.cpm),
+        "task_error": check_task_error(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not all(check["ok"] for check in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
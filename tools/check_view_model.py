@@ -0,0 +1,183 @@
+"""Count display writes through `view_model` bindings on the simulated displayio.
+
+Usage::
+
+    python tools/check_view_model.py [--passes 100] [--json report.json]
+
+Every text or color assignment to a `pyportal_hal.sim` label counts as a
+display write, as relaying out the label does on the device. The checks are:
+
+* ``unchanged``: setting a binding to the value it already shows writes
+  nothing.
+* ``rate_limited``: a binding with ``min_interval`` set every 50 ms on a
+  stepped clock writes at most once per interval, and `ViewModel.flush`
+  still lands the last value.
+* ``detached``: values set while a binding has no widget are kept without a
+  write and pushed once when a widget is attached.
+* ``pushes``: `ViewModel.pushes` and ``pushes_per_second`` agree with the
+  writes counted by the display.
+* ``update_display``: code.py's Radiation tab redrawn ``--passes`` times
+  with no new counts. Before the bindings every pass assigned every label,
+  so the report gives those writes (one per `Binding.set` call) next to the
+  writes made now, which must be none after the first pass.
+
+The exit status is 1 if a check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# pylint: disable=wrong-import-position
+from pyportal_hal import sim  # noqa: E402
+
+SIMULATION = sim.install(ROOT)
+
+from adafruit_display_text.label import Label  # noqa: E402
+from run_headless import load_app  # noqa: E402
+import view_model  # noqa: E402
+from view_model import ViewModel  # noqa: E402
+
+
+def writes():
+    return sim.simulation().display.writes
+
+
+def check_unchanged():
+    model = ViewModel(sim.SteppedClock())
+    label = Label(text="CPM: --")
+    binding = model.bind(label)
+    start = writes()
+    for _ in range(100):
+        binding.set("CPM: 12.0")
+    made = writes() - start
+    return {"sets": 100, "writes": made, "ok": made == 1 and label.text == "CPM: 12.0"}
+
+
+def check_rate_limited(interval=0.5, step=0.05, seconds=5.0):
+    clock = sim.SteppedClock()
+    model = ViewModel(clock)
+    label = Label(text="")
+    binding = model.bind(label, min_interval=interval)
+    start = writes()
+    sets = int(seconds / step)
+    for i in range(sets):
+        binding.set(str(i))
+        model.flush()
+        clock.advance(step)
+    clock.advance(interval)
+    model.flush()
+    made = writes() - start
+    limit = int(seconds / interval) + 2
+    return {
+        "sets": sets,
+        "writes": made,
+        "limit": limit,
+        "ok": made <= limit and label.text == str(sets - 1),
+    }
+
+
+def check_detached():
+    model = ViewModel(sim.SteppedClock())
+    binding = model.bind(None)
+    start = writes()
+    binding.set("Connecting...")
+    while_detached = writes() - start
+    first = Label(text="")
+    binding.attach(first)
+    binding.detach()
+    binding.set("Reconnect")
+    second = Label(text="")
+    binding.attach(second)
+    made = writes() - start
+    return {
+        "writes_while_detached": while_detached,
+        "writes": made,
+        "ok": (while_detached == 0 and made == 2 and first.text == "Connecting..."
+               and second.text == "Reconnect" and binding.value == "Reconnect"),
+    }
+
+
+def check_pushes():
+    clock = sim.SteppedClock()
+    model = ViewModel(clock)
+    bindings = [model.bind(Label(text="")) for _ in range(4)]
+    start = writes()
+    for second in range(3):
+        for i, binding in enumerate(bindings):
+            binding.set("{} {}".format(second, i))
+        clock.advance(1)
+        model.flush()
+    made = writes() - start
+    return {
+        "writes": made,
+        "pushes": model.pushes,
+        "pushes_per_second": model.pushes_per_second,
+        "ok": model.pushes == made == 12 and model.pushes_per_second == 4,
+    }
+
+
+def check_update_display(passes):
+    app = load_app()
+    app.switch_view("Radiation")
+    for count in (3, 5, 4):
+        app.dose.add(count)
+    app.update_display()
+    sets = [0]
+    set_value = view_model.Binding.set
+
+    def counted_set(binding, value):
+        sets[0] += 1
+        set_value(binding, value)
+
+    view_model.Binding.set = counted_set
+    try:
+        start = writes()
+        for _ in range(passes):
+            app.update_display()
+        unchanged = writes() - start
+        legacy = sets[0]
+        app.dose.add(9)
+        start = writes()
+        app.update_display()
+        changed = writes() - start
+    finally:
+        view_model.Binding.set = set_value
+    return {
+        "passes": passes,
+        "legacy_writes": legacy,
+        "writes": unchanged,
+        "writes_after_new_count": changed,
+        "ok": legacy > 0 and unchanged == 0 and 0 < changed <= legacy / passes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--passes", type=int, default=100)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "unchanged": check_unchanged(),
+        "rate_limited": check_rate_limited(),
+        "detached": check_detached(),
+        "pushes": check_pushes(),
+        "update_display": check_update_display(args.passes),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+    if not all(check["ok"] for check in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Print the records of a radiation log written by code.py as CSV.
+
+Usage::
+
+    python tools/read_log.py /media/SD/radiation.log [--kind counts] [--tail 60]
+
+Copy ``radiation.log`` (and ``radiation.log.1`` for older records) off the SD
+card first. Columns are the record time (UTC, from the board's clock), the
+kind, the span in seconds and the three values described in
+``lib/radiation_log.py``.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+import radiation_log  # noqa: E402  pylint: disable=wrong-import-position
+
+COLUMNS = {
+    radiation_log.COUNTS: ("count", "usvh", ""),
+    radiation_log.UV: ("uvi", "lux", ""),
+    radiation_log.SOLAR: ("speed", "density", "bt"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--kind", choices=sorted(radiation_log.KIND_NAMES.values()),
+                        help="only print records of this kind")
+    parser.add_argument("--tail", type=int, help="only print the newest N records")
+    parser.add_argument("--with-rotated", action="store_true",
+                        help="read PATH.1 before PATH")
+    args = parser.parse_args()
+
+    paths = [args.path + ".1", args.path] if args.with_rotated else [args.path]
+    rows = []
+    for path in paths:
+        for stamp, kind, span, a, b, c in radiation_log.read_records(path):
+            name = radiation_log.KIND_NAMES.get(kind, str(kind))
+            if args.kind and name != args.kind:
+                continue
+            rows.append((time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(stamp)),
+                         name, span, a, b, c))
+    if args.tail:
+        rows = rows[-args.tail:]
+    writer = csv.writer(sys.stdout)
+    if args.kind:
+        kind = next(k for k, v in radiation_log.KIND_NAMES.items() if v == args.kind)
+        writer.writerow(("time", "kind", "span") + tuple(c or "-" for c in COLUMNS[kind]))
+    else:
+        writer.writerow(("time", "kind", "span", "a", "b", "c"))
+    writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Run code.py headless on the simulated PyPortal and report loop metrics.
+
+Usage::
+
+    python tools/run_headless.py --seconds 20 --cpm 120
+
+The sketch is imported with the `pyportal_hal.sim` stand-ins installed, then
+its scheduler runs for the requested time. Every tick is timed. The report
+covers loop rate, tick latency, Geiger task lateness, heap growth (from
+``tracemalloc``), display writes and Geiger capture efficiency.
+"""
+
+import argparse
+import asyncio  # noqa: F401  imported up front so Scheduler.run's import is not counted as heap growth
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "lib"))
+
+from pyportal_hal import sim  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def load_app(path=os.path.join(ROOT, "code.py"), *, finish_boot=True):
+    """Import code.py as module ``app`` without starting its main loop.
+
+    With ``finish_boot`` the boot stages code.py leaves to its scheduler are
+    run too, so the network, log and sensors exist when this returns.
+    """
+    spec = importlib.util.spec_from_file_location("app", path)
+    app = importlib.util.module_from_spec(spec)
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        spec.loader.exec_module(app)
+        if finish_boot:
+            app.boot.finish()
+    finally:
+        os.chdir(cwd)
+    return app
+
+
+# Centres of the Radiation, UV and Probes tab buttons
+TAB_POINTS = ((90, 215), (187, 215), (277, 215))
+CONTENT_POINT = (150, 100)  # inside every tab's content, on no button
+
+
+def tab_taps(seconds, interval=1.0):
+    """Touch trace tapping through the tabs every ``interval`` seconds, with
+    a tap on each tab's content in between."""
+    taps = []
+    for i in range(int(seconds / interval)):
+        x, y = TAB_POINTS[(i + 1) % len(TAB_POINTS)]
+        taps.append((0.5 + i * interval, 0.1, x, y))
+        taps.append((0.5 + (i + 0.5) * interval, 0.1) + CONTENT_POINT)
+    return taps
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def app_heap():
+    """Bytes traced by tracemalloc, leaving out this harness's own records."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def run(app, seconds, *, connect=False):
+    """Drive ``app.scheduler`` for ``seconds`` and return the measurements."""
+    scheduler = app.scheduler
+    tick = scheduler.tick
+    durations = []
+
+    def timed_tick():
+        start = time.perf_counter()
+        delay = tick()
+        durations.append(time.perf_counter() - start)
+        return delay
+
+    scheduler.tick = timed_tick
+    scheduler.add("bench-stop", scheduler.stop, None, delay=seconds).enabled = True
+    if connect:
+        app.wifi.connect()
+        scheduler.wake(app.wifi_task)
+    heap_start = app_heap()
+    started = time.perf_counter()
+    scheduler.run()
+    elapsed = time.perf_counter() - started
+    heap_end = app_heap()
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    return durations, elapsed, heap_start, heap_end, heap_peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--cpm", type=float, default=60)
+    parser.add_argument("--connect", action="store_true", help="connect Wi-Fi at start")
+    parser.add_argument("--wifi-latency", type=float, default=2.0,
+                        help="seconds the access point takes to accept")
+    parser.add_argument("--wifi-drop-rate", type=float, default=0.0,
+                        help="mean Wi-Fi link drops per hour")
+    parser.add_argument("--instrument", action="store_true",
+                        help="enable the sketch's instrumentation and include it in the report")
+    parser.add_argument("--no-countio", action="store_true",
+                        help="leave out the countio stand-in, so the Geiger pin is polled")
+    parser.add_argument("--ltr390-driver",
+                        help="directory with the adafruit_ltr390 and adafruit_register "
+                        "sources, to read the simulated sensor with the real driver")
+    parser.add_argument("--tap-tabs", action="store_true",
+                        help="tap through the tabs once a second, and on each tab's content")
+    parser.add_argument("--sd-dir", help="directory standing in for the SD card "
+                        "(a temporary one by default)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+    sd_dir = args.sd_dir or tempfile.mkdtemp(prefix="pynt-sd-")
+    os.makedirs(sd_dir, exist_ok=True)
+
+    tracemalloc.start()
+    touches = tab_taps(args.seconds) if args.tap_tabs else ()
+    simulation = sim.install(ROOT, geiger_cpm=args.cpm, touches=touches,
+                             noaa_dir=os.path.join(ROOT, "tools", "noaa"), sd_dir=sd_dir,
+                             wifi_latency=args.wifi_latency,
+                             wifi_drop_rate=args.wifi_drop_rate,
+                             countio=not args.no_countio,
+                             ltr390_driver=args.ltr390_driver)
+    app = load_app()
+    app.instrumentation.enabled = args.instrument
+    display_writes = simulation.display.writes
+    durations, elapsed, heap_start, heap_end, heap_peak = run(app, args.seconds,
+                                                              connect=args.connect)
+    app.radiation_log.flush()
+    counted = app.dose.total + app.pulse_counter.take()
+    report = {
+        "seconds": elapsed,
+        "ticks": len(durations),
+        "ticks_per_second": len(durations) / elapsed,
+        "tick_ms_p50": percentile(durations, 0.5) * 1000,
+        "tick_ms_p99": percentile(durations, 0.99) * 1000,
+        "tick_ms_max": max(durations) * 1000 if durations else 0,
+        "tasks": {t.name: {"runs": t.runs, "late": t.late, "errors": t.errors}
+                  for t in app.scheduler.tasks},
+        "heap_growth_bytes": heap_end - heap_start,
+        "heap_peak_bytes": heap_peak,
+        "display_writes": simulation.display.writes - display_writes,
+        "display_dirty_area": simulation.display.dirty_area,
+        "geiger_pulses": simulation.geiger.pulses,
+        "geiger_counted": counted,
+        "geiger_efficiency": counted / simulation.geiger.pulses if simulation.geiger.pulses else 1,
+        "i2c_transactions": simulation.i2c_bus.transactions,
+        "clips_played": app.audio.played,
+        "wifi": {
+            "state": app.wifi.state_name,
+            "attempts": app.wifi.attempts,
+            "drops": simulation.esp.drops,
+            "status_reads": simulation.esp.status_reads,
+        },
+        "log_records": app.radiation_log.records,
+        "log_blocks_written": app.radiation_log.blocks_written,
+        "log_error": str(app.radiation_log.error) if app.radiation_log.error else None,
+    }
+    if app.noaa is not None:
+        report["noaa"] = {
+            "requests": app.noaa.requests,
+            "not_modified": app.noaa.not_modified,
+            "bytes_received": app.noaa.bytes_received,
+            "connections": simulation.wifi.requests.connections,
+        }
+    if args.instrument:
+        report["instrumentation"] = app.instrumentation.report()
+    if simulation.noaa:
+        simulation.noaa.close()
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, "w") as file:
+            file.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()